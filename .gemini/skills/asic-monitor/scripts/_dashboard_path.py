@@ -0,0 +1,11 @@
+"""
+Puts miners-dashboard on sys.path so these scripts use the dashboard's own
+history store and analytics. Import it before any dashboard module.
+"""
+import os
+import sys
+
+DASHBOARD_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', 'miners-dashboard'))
+
+if DASHBOARD_DIR not in sys.path:
+    sys.path.insert(0, DASHBOARD_DIR)
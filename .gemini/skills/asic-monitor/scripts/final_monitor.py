@@ -4,13 +4,17 @@ import os
 import datetime
 import sys
 
+import _dashboard_path  # noqa: F401
+import fleet_watch
+from analytics import efficiency, expected_hashrate
+
 def get_args():
-    args_dict = {"ip": None, "refresh": 10}
+    args_dict = {"ip": None, "ips": None, "fleet": None, "refresh": 10}
     for arg in sys.argv[1:]:
         if "=" in arg:
             key, value = arg.split("=", 1)
             if key in args_dict:
-                args_dict[key] = value if key == "ip" else int(value)
+                args_dict[key] = value if key in ("ip", "ips", "fleet") else int(value)
     return args_dict
 
 def format_val(val, unit="", decimals=2):
@@ -24,8 +28,21 @@ def format_val(val, unit="", decimals=2):
         return str(val)
 
 params = get_args()
+
+# Several miners (ips=a,b,c or fleet=fleet.json): poll them all concurrently every
+# `refresh` seconds and show one combined table until Ctrl+C
+if params["ips"] or params["fleet"]:
+    targets = fleet_watch.load_targets(params["ips"], params["fleet"])
+    if not targets:
+        print("No miners found in ips/fleet")
+        sys.exit(1)
+    fleet_watch.watch(targets, params["refresh"])
+    sys.exit(0)
+
 if not params["ip"]:
-    print("Usage: python monitor.py ip=192.168.x.x")
+    print("Usage: python final_monitor.py ip=192.168.x.x")
+    print("       python final_monitor.py ips=192.168.x.x,192.168.x.y [refresh=10]")
+    print("       python final_monitor.py fleet=fleet.json [refresh=10]")
     sys.exit(1)
 
 URL = f"http://{params['ip']}/api/system/info"
@@ -40,9 +57,9 @@ try:
     # --- Auto-Detection Logic ---
     chips = d.get("asicCount", 4) # Default to 4 for NerdQaxe++
     freq = d.get("frequency", 0)
-    expected_gh = freq * 2.04 * chips
+    expected_gh = expected_hashrate(freq, chips)
     actual_gh = d.get("hashRate", 0)
-    efficiency = (actual_gh / expected_gh * 100) if expected_gh > 0 else 0
+    eff = efficiency(actual_gh, expected_gh) or 0
 
     # --- Update Top 10 Shares ---
     best_diff = d.get("bestDiff", 0)
@@ -62,7 +79,7 @@ try:
 
     # Performance Section
     print(f"[PERFORMANCE]")
-    print(f" Hashrate (Actual)  : {format_val(actual_gh, ' GH/s')} (Eff: {efficiency:.1f}%)")
+    print(f" Hashrate (Actual)  : {format_val(actual_gh, ' GH/s')} (Eff: {eff:.1f}%)")
     print(f" Hashrate (Expected): {format_val(expected_gh, ' GH/s')} @ {freq}MHz")
     print(f" Power Consumption  : {format_val(d.get('power'), ' W')} ({format_val(d.get('voltage')/1000, ' V', 3)})")
     
@@ -0,0 +1,152 @@
+import datetime
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import _dashboard_path  # noqa: F401
+from analytics import EXPECTED_GHS_PER_MHZ, efficiency, expected_hashrate, joules_per_th
+
+
+def load_targets(ips=None, fleet=None):
+    """
+    Builds the miner list from `ips` (comma separated) and/or a fleet file.
+    The fleet file is JSON: a list of {"ip", "name", "chips"} objects, or an
+    object with a "miners" list in the same shape. Plain text with one IP per
+    line also works.
+    """
+    targets = []
+    for ip in (ips or "").split(","):
+        if ip.strip():
+            targets.append({"ip": ip.strip()})
+
+    if fleet:
+        with open(fleet) as f:
+            text = f.read()
+        try:
+            data = json.loads(text)
+            miners = data.get("miners", []) if isinstance(data, dict) else data
+        except ValueError:
+            miners = [{"ip": line.strip()} for line in text.splitlines()
+                      if line.strip() and not line.startswith("#")]
+        for m in miners:
+            if m.get("ip"):
+                targets.append({"ip": m["ip"], "name": m.get("name"), "chips": m.get("chips")})
+
+    # Same IP listed twice would just double the load on the board
+    seen = set()
+    return [t for t in targets if not (t["ip"] in seen or seen.add(t["ip"]))]
+
+
+class MinerState:
+    """What we remember about one miner across refreshes."""
+
+    def __init__(self, target):
+        self.ip = target["ip"]
+        self.name = target.get("name")
+        self.chips = target.get("chips")
+        self.data = {}
+        self.error = None
+        self.top_shares = []
+        self.last_ok = None
+
+    def update(self, data):
+        self.data = data
+        self.error = None
+        self.last_ok = datetime.datetime.now()
+
+        # --- Update Top 10 Shares ---
+        best_diff = data.get("bestDiff", 0)
+        if isinstance(best_diff, (int, float)) and best_diff > 0 and best_diff not in self.top_shares:
+            self.top_shares.append(best_diff)
+            self.top_shares = sorted(self.top_shares, reverse=True)[:10]
+
+
+def make_session(pool_size):
+    """One shared session; its connection pool must fit every miner at once."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    return session
+
+
+def poll(session, state, timeout):
+    try:
+        response = session.get(f"http://{state.ip}/api/system/info", timeout=timeout)
+        state.update(response.json())
+    except Exception as e:
+        state.error = str(e)
+
+
+def format_share(s):
+    return f"{s/1e9:.1f}G" if s >= 1e9 else str(int(s))
+
+
+def render(states, expected_factor, session_start):
+    """Prints one combined table for the whole fleet."""
+    header = f"{'Miner':<18} {'Hashrate':>10} {'Expected':>10} {'Eff':>7} {'Power':>7} {'ASIC':>6} {'VRM':>6} {'Fan':>6}  Best (session)"
+    uptime = str(datetime.datetime.now() - session_start).split('.')[0]
+    online = sum(1 for s in states if s.error is None and s.data)
+
+    print(f"* Fleet Monitor | {online}/{len(states)} online | Session Uptime: {uptime}")
+    print("=" * len(header))
+    print(header)
+    print("-" * len(header))
+
+    total_gh = 0.0
+    total_w = 0.0
+    for s in states:
+        label = (s.name or s.data.get("hostname") or s.ip)[:18]
+        if s.error is not None or not s.data:
+            print(f"{label:<18} {'OFFLINE':>10}  {(s.error or 'waiting...')[:60]}")
+            continue
+
+        d = s.data
+        chips = s.chips or d.get("asicCount", 1)
+        freq = d.get("frequency", 0) or 0
+        expected_gh = expected_hashrate(freq, chips, expected_factor)
+        actual_gh = d.get("hashRate", 0) or 0
+        eff = efficiency(actual_gh, expected_gh) or 0
+        power = d.get("power", 0) or 0
+        total_gh += actual_gh
+        total_w += power
+
+        best = format_share(s.top_shares[0]) if s.top_shares else "-"
+        print(f"{label:<18} {actual_gh:>10.1f} {expected_gh:>10.1f} {eff:>6.1f}% {power:>6.1f}W "
+              f"{d.get('temp', 0) or 0:>5.1f}C {d.get('vrTemp', 0) or 0:>5.1f}C {d.get('fanSpeed', 0) or 0:>6}  {best}")
+
+    print("-" * len(header))
+    jth = joules_per_th(total_w, total_gh) or 0
+    print(f"{'TOTAL':<18} {total_gh:>10.1f} GH/s | {total_w:.1f} W | {jth:.2f} J/TH")
+
+
+def watch(targets, refresh, expected_factor=EXPECTED_GHS_PER_MHZ, timeout=5, clear=True):
+    """
+    Polls every target concurrently each `refresh` seconds and redraws the table
+    until interrupted. Rounds never overlap: a slow board delays the next
+    redraw by at most `timeout`.
+    """
+    states = [MinerState(t) for t in targets]
+    session = make_session(len(states))
+    session_start = datetime.datetime.now()
+
+    pool = ThreadPoolExecutor(max_workers=min(32, len(states)))
+    try:
+        while True:
+            started = time.monotonic()
+            list(pool.map(lambda s: poll(session, s, timeout), states))
+
+            if clear:
+                os.system('cls' if os.name == 'nt' else 'clear')
+            render(states, expected_factor, session_start)
+
+            time.sleep(max(0, refresh - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        # Don't wait on a board that is mid-timeout when the user hits Ctrl+C
+        pool.shutdown(wait=False, cancel_futures=True)
+        session.close()
@@ -1,12 +1,22 @@
 
 import os
-import csv
 import datetime
 import time
 import random
 
-# The log file is located in the `logs` directory, relative to this script.
-LOG_FILE = os.path.join(os.path.dirname(__file__), '..', 'logs', 'miner_stats.csv')
+# The history store lives with the dashboard so the server and this skill share one format.
+import _dashboard_path  # noqa: F401
+from history_tiers import TieredHistory
+
+# History is stored in the `logs` directory, relative to this script, with the
+# same raw / 1-minute / 1-hour retention tiers as the dashboard server.
+# The old per-sample CSV log can be imported with:
+#   python miners-dashboard/history_tiers.py --root <logs/history> import-csv <logs/miner_stats.csv> --miner nerdqaxe
+HISTORY_DIR = os.path.join(os.path.dirname(__file__), '..', 'logs', 'history')
+MINER_ID = 'nerdqaxe'
+
+# Samples are written to disk in batches rather than one file append per sample
+FLUSH_INTERVAL = 15 * 60
 
 def get_hashrate():
     """
@@ -20,26 +30,25 @@ def get_hashrate():
 
 def main():
     """
-    Monitors the ASIC hashrate and logs it to a CSV file.
+    Monitors the ASIC hashrate and records it in the history store.
     """
-    # Create the log file with a header if it doesn't exist
-    if not os.path.exists(LOG_FILE):
-        with open(LOG_FILE, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['timestamp', 'hashrate'])
+    store = TieredHistory(HISTORY_DIR)
+    store.raw.flush_interval = FLUSH_INTERVAL
 
     # Start monitoring
-    while True:
-        hashrate = get_hashrate()
-        timestamp = datetime.datetime.now().isoformat()
-        
-        with open(LOG_FILE, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([timestamp, hashrate])
-        
-        print(f"Logged: {timestamp}, {hashrate} MH/s")
-        
-        time.sleep(60)
+    try:
+        while True:
+            hashrate = get_hashrate()
+            now = datetime.datetime.now()
+            
+            store.append(MINER_ID, now.timestamp(), {'hashRate': hashrate})
+            
+            print(f"Logged: {now.isoformat()}, {hashrate} MH/s")
+            
+            time.sleep(60)
+    finally:
+        # Don't lose the samples still buffered in memory
+        store.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,349 @@
+"""
+Alert rules evaluated over the fleet poller's results.
+
+Each poll round is fed to AlertEngine (a poller listener, like
+HistoryRecorder). Every rule keeps a small fixed-size state per miner (a
+breach streak, plus a ring of the last `window` share counters for the
+reject-ratio rule), so a round costs O(rules x miners) and memory doesn't
+grow with time. A rule fires after `samples` consecutive breaching polls
+and resolves after as many clean ones, or when the miner leaves the fleet.
+
+Notifications are deduplicated per (rule, miner): one when an alert fires,
+one when it resolves, and a reminder every `repeat` seconds while it stays
+firing. Each round's notifications are appended to the sink (alerts.jsonl,
+one JSON object per line) in a single write and logged to dashboard.alerts.
+
+Rules come from alerts.json next to fleet.json when it exists, otherwise
+DEFAULT_RULES:
+
+    {"repeat": 3600, "rules": [
+        {"id": "asic-hot", "type": "threshold", "metric": "temp", "above": 70, "samples": 3},
+        {"id": "slow", "type": "efficiency", "below": 80, "samples": 12, "miners": ["nerdqaxe"]},
+        {"id": "rejects", "type": "reject_ratio", "above": 2.0, "window": 60, "min_shares": 20},
+        {"id": "offline", "type": "offline", "samples": 3}]}
+"""
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from analytics import EXPECTED_GHS_PER_MHZ, THERMAL_LIMITS, efficiency, expected_hashrate
+from fleet_config import FLEET_FILE
+
+log = logging.getLogger('dashboard.alerts')
+
+RULES_FILE = os.path.join(os.path.dirname(FLEET_FILE), 'alerts.json')
+ALERTS_LOG = 'alerts.jsonl'
+
+# Seconds between reminders for an alert that stays firing
+REPEAT_SECONDS = 3600
+
+DEFAULT_RULES = [
+    {'id': 'asic-hot', 'type': 'threshold', 'metric': 'temp', 'above': THERMAL_LIMITS['temp'], 'samples': 3},
+    {'id': 'vr-hot', 'type': 'threshold', 'metric': 'vrTemp', 'above': THERMAL_LIMITS['vrTemp'], 'samples': 3},
+    {'id': 'low-efficiency', 'type': 'efficiency', 'below': 80, 'samples': 12},
+    {'id': 'rejects', 'type': 'reject_ratio', 'above': 2.0, 'window': 60, 'min_shares': 20},
+    {'id': 'offline', 'type': 'offline', 'samples': 3},
+]
+
+
+def _number(data, *keys):
+    for key in keys:
+        value = data.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+    return None
+
+
+class Rule(ABC):
+    """
+    Base rule. check(state, data) returns the observed value when the poll
+    breaches the rule, False when it doesn't, and None when the poll says
+    nothing either way (e.g. a temperature rule while the miner is offline).
+    """
+
+    def __init__(self, spec):
+        self.id = spec['id']
+        self.samples = max(1, int(spec.get('samples', 1)))
+        self.severity = spec.get('severity', 'warning')
+        self.miners = frozenset(spec['miners']) if spec.get('miners') else None
+
+    def applies_to(self, miner_id):
+        return self.miners is None or miner_id in self.miners
+
+    def new_state(self):
+        return None
+
+    @abstractmethod
+    def check(self, state, data):
+        pass
+
+    def describe(self, value):
+        return f"{self.id}: {value}"
+
+
+class ThresholdRule(Rule):
+    """A metric above `above` (or below `below`)."""
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.metric = spec['metric']
+        self.above = spec.get('above')
+        self.below = spec.get('below')
+        if self.above is None and self.below is None:
+            raise ValueError(f"Rule {self.id}: needs 'above' or 'below'")
+
+    def check(self, state, data):
+        if data.get('status') != 'online':
+            return None
+        value = _number(data, self.metric)
+        if value is None:
+            return None
+        if (self.above is not None and value > self.above) or (self.below is not None and value < self.below):
+            return value
+        return False
+
+    def describe(self, value):
+        limit = f"> {self.above}" if self.above is not None else f"< {self.below}"
+        return f"{self.metric} {value:g} {limit}"
+
+
+class EfficiencyRule(Rule):
+    """
+    Hashrate below `below` percent of expected. Uses the poller's
+    expectedHashRate (analytics.derive, with the fleet's chip count) unless the
+    rule sets its own `factor`.
+    """
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.below = float(spec['below'])
+        self.factor = float(spec['factor']) if 'factor' in spec else None
+
+    def check(self, state, data):
+        if data.get('status') != 'online':
+            return None
+        hashrate = _number(data, 'hashRate', 'hashrate')
+        if hashrate is None:
+            return None
+        expected = _number(data, 'expectedHashRate') if self.factor is None else None
+        if expected is None:
+            frequency = _number(data, 'frequency', 'freq')
+            if not frequency:
+                return None
+            expected = expected_hashrate(frequency, _number(data, 'asicCount') or 1,
+                                         self.factor or EXPECTED_GHS_PER_MHZ)
+        value = efficiency(hashrate, expected)
+        if value is None:
+            return None
+        return round(value, 1) if value < self.below else False
+
+    def describe(self, value):
+        return f"hashrate at {value:g}% of expected (< {self.below:g}%)"
+
+
+class _ShareWindow:
+    """Ring of the last `size` (accepted, rejected) counter readings."""
+    __slots__ = ('accepted', 'rejected', 'next', 'count')
+
+    def __init__(self, size):
+        self.accepted = [0] * size
+        self.rejected = [0] * size
+        self.next = 0
+        self.count = 0
+
+
+class RejectRatioRule(Rule):
+    """Rejected shares above `above` percent over the last `window` polls."""
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.above = float(spec['above'])
+        self.window = max(2, int(spec.get('window', 60)))
+        self.min_shares = int(spec.get('min_shares', 20))
+
+    def new_state(self):
+        return _ShareWindow(self.window)
+
+    def check(self, ring, data):
+        if data.get('status') != 'online':
+            return None
+        accepted = _number(data, 'sharesAccepted', 'accepted')
+        rejected = _number(data, 'sharesRejected', 'rejected')
+        if accepted is None or rejected is None:
+            return None
+
+        size = self.window
+        newest = (ring.next - 1) % size
+        if ring.count and (accepted < ring.accepted[newest] or rejected < ring.rejected[newest]):
+            # Counters went backwards: the miner rebooted, start over
+            ring.count = 0
+        # Once full, the slot about to be overwritten holds the oldest reading
+        oldest = ring.next if ring.count == size else (ring.next - ring.count) % size
+        old_accepted, old_rejected = ring.accepted[oldest], ring.rejected[oldest]
+        have_history = ring.count > 0
+
+        ring.accepted[ring.next] = accepted
+        ring.rejected[ring.next] = rejected
+        ring.next = (ring.next + 1) % size
+        ring.count = min(ring.count + 1, size)
+
+        if not have_history:
+            return None
+        new_rejected = rejected - old_rejected
+        total = (accepted - old_accepted) + new_rejected
+        if total < self.min_shares:
+            return None
+        ratio = new_rejected / total * 100
+        return round(ratio, 2) if ratio > self.above else False
+
+    def describe(self, value):
+        return f"{value:g}% of recent shares rejected (> {self.above:g}%)"
+
+
+class OfflineRule(Rule):
+    """The poller couldn't reach the miner."""
+
+    def check(self, state, data):
+        if data.get('status') != 'offline':
+            return False
+        return data.get('error') or 'offline'
+
+    def describe(self, value):
+        return f"offline ({value})"
+
+
+RULE_TYPES = {
+    'threshold': ThresholdRule,
+    'efficiency': EfficiencyRule,
+    'reject_ratio': RejectRatioRule,
+    'offline': OfflineRule,
+}
+
+
+def build_rules(specs):
+    rules = []
+    for spec in specs:
+        rule_type = RULE_TYPES.get(spec.get('type'))
+        if rule_type is None:
+            raise ValueError(f"Rule {spec.get('id')}: unknown type {spec.get('type')!r}")
+        rules.append(rule_type(spec))
+    return rules
+
+
+def load_rules(path=RULES_FILE):
+    """(rules, repeat seconds) from `path`, or the defaults when it doesn't exist."""
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    return build_rules(config.get('rules', DEFAULT_RULES)), config.get('repeat', REPEAT_SECONDS)
+
+
+class _AlertState:
+    __slots__ = ('rule_state', 'streak', 'clean', 'firing', 'since', 'notified', 'value')
+
+    def __init__(self, rule_state):
+        self.rule_state = rule_state
+        self.streak = 0
+        self.clean = 0
+        self.firing = False
+        self.since = None
+        self.notified = 0.0
+        self.value = None
+
+
+class AlertEngine:
+    """Fleet poller listener: evaluates every rule against every miner each round."""
+
+    def __init__(self, rules, sink=ALERTS_LOG, repeat=REPEAT_SECONDS):
+        self.rules = rules
+        self.sink = sink
+        self.repeat = repeat
+        self._states = {}  # (rule id, miner id) -> _AlertState
+        self._lock = threading.Lock()
+
+    def __call__(self, miners):
+        notifications = self.evaluate(miners)
+        if notifications:
+            self.write(notifications)
+
+    def evaluate(self, miners, now=None):
+        """Updates rule state from one poll round; returns the notifications it produced."""
+        now = time.time() if now is None else now
+        notifications = []
+        with self._lock:
+            for miner_id, data in miners.items():
+                for rule in self.rules:
+                    if not rule.applies_to(miner_id):
+                        continue
+                    key = (rule.id, miner_id)
+                    state = self._states.get(key)
+                    if state is None:
+                        state = self._states[key] = _AlertState(rule.new_state())
+
+                    value = rule.check(state.rule_state, data)
+                    if value is None:
+                        continue
+                    if value is not False:
+                        state.streak += 1
+                        state.clean = 0
+                        state.value = value
+                        if not state.firing and state.streak >= rule.samples:
+                            state.firing, state.since, state.notified = True, now, now
+                            notifications.append(self._notice('firing', rule, miner_id, state, now))
+                        elif state.firing and self.repeat and now - state.notified >= self.repeat:
+                            state.notified = now
+                            notifications.append(self._notice('repeat', rule, miner_id, state, now))
+                    else:
+                        state.streak = 0
+                        if state.firing:
+                            state.clean += 1
+                            if state.clean >= rule.samples:
+                                state.firing = False
+                                notifications.append(self._notice('resolved', rule, miner_id, state, now))
+
+            # Miners dropped from the fleet (or by a federated site) take their state with them
+            rules = {rule.id: rule for rule in self.rules}
+            for key in [key for key in self._states if key[1] not in miners]:
+                state = self._states.pop(key)
+                if state.firing:
+                    notice = self._notice('resolved', rules[key[0]], key[1], state, now)
+                    notice['message'] = "Miner no longer in the fleet"
+                    notifications.append(notice)
+        return notifications
+
+    @staticmethod
+    def _notice(event, rule, miner_id, state, now):
+        return {'time': round(now, 3), 'event': event, 'rule': rule.id, 'miner': miner_id,
+                'severity': rule.severity, 'value': state.value, 'since': state.since,
+                'message': rule.describe(state.value)}
+
+    def write(self, notifications):
+        for n in notifications:
+            level = logging.INFO if n['event'] == 'resolved' else logging.WARNING
+            log.log(level, "  -> Alert %s %s on %s: %s", n['event'], n['rule'], n['miner'], n['message'])
+        if self.sink:
+            lines = ''.join(json.dumps(n, separators=(',', ':')) + '\n' for n in notifications)
+            with open(self.sink, 'a', encoding='utf-8') as f:
+                f.write(lines)
+
+    def active(self):
+        """Alerts currently firing, oldest first."""
+        rules = {rule.id: rule for rule in self.rules}
+        with self._lock:
+            firing = [(key, state) for key, state in self._states.items() if state.firing]
+        return sorted(({'rule': rule_id, 'miner': miner_id, 'severity': rules[rule_id].severity,
+                        'since': state.since, 'value': state.value,
+                        'message': rules[rule_id].describe(state.value)}
+                       for (rule_id, miner_id), state in firing), key=lambda a: a['since'])
+
+
+def alerts_response(engine):
+    """(status, payload) for GET /api/alerts."""
+    if engine is None:
+        return 503, {'error': "Alerting is disabled", 'status': 'offline'}
+    return 200, {'alerts': engine.active()}
@@ -0,0 +1,414 @@
+"""
+Derived miner health figures: expected hashrate, efficiency, J/TH, rejected
+share ratio, thermal headroom and rolling statistics.
+
+This is the one place these are defined. The fleet poller adds the per-poll
+figures to every online miner (so /api/fleet, the dashboard cards and the
+alert rules all see the same numbers), the asic-monitor skill scripts import
+the helpers, and `report` computes them over stored history.
+
+The per-poll helpers take plain numbers. The column helpers take whole
+history columns, as returned by HistoryStore.query (array('d'), NaN for a
+missing value), and work a column at a time: map() over operator functions
+and itertools.accumulate for running sums, so the arithmetic runs in C
+rather than a Python loop per row per figure. A year of the 1-hour tier
+reports in milliseconds per miner; a year of 1-minute samples (~525k rows)
+in under two seconds, most of it sorting for the percentiles.
+
+Usage:
+    python analytics.py report                      # last 24 hours, every miner
+    python analytics.py report --since 365d         # a year, from the 1-hour tier
+    python analytics.py report --miner nerdqaxe --since 30d --json report.json
+"""
+import argparse
+import json
+import math
+import time
+from array import array
+from itertools import accumulate
+from operator import add, mul, sub, truediv
+
+from fleet_config import FLEET_FILE, load_fleet
+from history_store import HISTORY_DIR
+from history_tiers import TieredHistory
+
+NAN = float('nan')
+
+# GH/s per MHz per ASIC for the BM1366/BM1370 boards in the fleet. bitaxe-reader.py
+# used 2.06666 and final_monitor.py / the dashboard 2.04; this is the one to use.
+EXPECTED_GHS_PER_MHZ = 2.06666
+
+# Temperatures (°C) the boards are run below; headroom is measured against these
+THERMAL_LIMITS = {'temp': 70.0, 'vrTemp': 85.0}
+
+# Seconds per rolling window in a report
+ROLLING_WINDOW = 24 * 3600
+
+# Percentiles reported for each metric
+PERCENTILES = (5, 50, 95)
+
+
+def _number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value == value:
+        return value
+    return None
+
+
+# --- One poll ----------------------------------------------------------------
+
+def expected_hashrate(frequency, chips, factor=EXPECTED_GHS_PER_MHZ):
+    """GH/s a board should make at `frequency` MHz with `chips` ASICs."""
+    return frequency * chips * factor
+
+
+def efficiency(hashrate, expected):
+    """Hashrate as a percentage of expected, or None when expected is unknown."""
+    return hashrate / expected * 100 if expected and expected > 0 else None
+
+
+def joules_per_th(power, hashrate):
+    """Watts per TH/s (= J/TH) from watts and GH/s, or None when not hashing."""
+    return power / (hashrate / 1000) if hashrate and hashrate > 0 else None
+
+
+def reject_ratio(accepted, rejected):
+    """Rejected shares as a percentage of all shares, or None before the first share."""
+    total = accepted + rejected
+    return rejected / total * 100 if total > 0 else None
+
+
+def thermal_headroom(temp, limit):
+    """Degrees left before `limit`; negative once over it."""
+    return limit - temp
+
+
+def derive(data, chips=None, factor=EXPECTED_GHS_PER_MHZ):
+    """
+    The derived figures for one poll result, as a dict to merge into it:
+    expectedHashRate, efficiency, jPerTh, rejectRatio and a <metric>Headroom
+    per THERMAL_LIMITS entry. Figures whose inputs are missing are left out.
+    `chips` (from the fleet inventory) wins over the board's asicCount.
+    """
+    out = {}
+    hashrate = _number(data.get('hashRate', data.get('hashrate')))
+    power = _number(data.get('power'))
+    frequency = _number(data.get('frequency', data.get('freq')))
+    chips = chips or _number(data.get('asicCount')) or 1
+
+    if frequency:
+        out['expectedHashRate'] = round(expected_hashrate(frequency, chips, factor), 1)
+        if hashrate is not None:
+            out['efficiency'] = round(efficiency(hashrate, out['expectedHashRate']), 1)
+    if power is not None and hashrate:
+        jth = joules_per_th(power, hashrate)
+        if jth is not None:
+            out['jPerTh'] = round(jth, 2)
+
+    accepted = _number(data.get('sharesAccepted', data.get('accepted')))
+    rejected = _number(data.get('sharesRejected', data.get('rejected')))
+    if accepted is not None and rejected is not None:
+        ratio = reject_ratio(accepted, rejected)
+        if ratio is not None:
+            out['rejectRatio'] = round(ratio, 2)
+
+    for metric, limit in THERMAL_LIMITS.items():
+        temp = _number(data.get(metric))
+        if temp is not None:
+            out[f'{metric}Headroom'] = round(thermal_headroom(temp, limit), 1)
+    return out
+
+
+# --- Whole columns -----------------------------------------------------------
+
+def _positive(column):
+    """`column` with zero and negative values replaced by NaN, so they can divide."""
+    return array('d', [v if v > 0 else NAN for v in column])
+
+
+def ratio_column(numerator, denominator, scale=1.0):
+    """numerator / denominator * scale per row; NaN where either is missing or denominator <= 0."""
+    out = array('d', map(truediv, numerator, _positive(denominator)))
+    if scale != 1.0:
+        out = array('d', map(mul, out, [scale] * len(out)))
+    return out
+
+
+def expected_column(frequency, chips, factor=EXPECTED_GHS_PER_MHZ):
+    """Expected GH/s per row from a frequency column (or one frequency for all rows)."""
+    per_mhz = chips * factor
+    if isinstance(frequency, (int, float)):
+        return per_mhz * frequency
+    return array('d', map(mul, frequency, [per_mhz] * len(frequency)))
+
+
+def efficiency_column(hashrate, expected):
+    """Percent of expected per row; `expected` is a column or a single number."""
+    if isinstance(expected, (int, float)):
+        expected = [expected] * len(hashrate)
+    return ratio_column(hashrate, expected, 100.0)
+
+
+def jth_column(power, hashrate):
+    return ratio_column(power, hashrate, 1000.0)
+
+
+def headroom_column(temp, limit):
+    return array('d', map(sub, [limit] * len(temp), temp))
+
+
+def counter_deltas(counter):
+    """
+    Per-row increase of a counter that resets when the miner reboots (a drop
+    means the new value is all new). Missing values carry the last reading
+    forward; the first row gives 0.
+    """
+    filled = array('d', counter)
+    last = NAN
+    for i, v in enumerate(filled):
+        if v != v:
+            filled[i] = last
+        else:
+            last = v
+    deltas = array('d', [0.0] * min(1, len(filled)))
+    deltas.extend(map(sub, filled[1:], filled[:-1]))
+    for i, d in enumerate(deltas):
+        if d != d:
+            # Nothing read yet
+            deltas[i] = 0.0
+        elif d < 0:
+            deltas[i] = filled[i]
+    return deltas
+
+
+def reject_ratio_column(accepted, rejected, window):
+    """Rolling rejected-share percentage over the last `window` rows of two counter columns."""
+    new_accepted = counter_deltas(accepted)
+    new_rejected = counter_deltas(rejected)
+    rejected_sum = rolling_sum(new_rejected, window)
+    total_sum = rolling_sum(array('d', map(add, new_accepted, new_rejected)), window)
+    return ratio_column(rejected_sum, total_sum, 100.0)
+
+
+def _windowed(prefix, window, n):
+    """Differences prefix[i + 1] - prefix[i + 1 - window], clamped at the start."""
+    lower = [0.0] * min(window, n)
+    if n > window:
+        lower += prefix[1:n - window + 1]
+    return array('d', map(sub, prefix[1:], lower))
+
+
+def rolling_sum(column, window):
+    """Sum of the last `window` rows at every row (fewer at the start). Assumes no NaN."""
+    return _windowed(list(accumulate(column, initial=0.0)), window, len(column))
+
+
+def rolling(column, window):
+    """
+    (mean, stdev) columns over the last `window` rows at every row, ignoring
+    NaN. A row whose window holds no values is NaN in both.
+    """
+    n = len(column)
+    present = [0.0 if v != v else 1.0 for v in column]
+    values = [0.0 if v != v else v for v in column]
+    counts = _windowed(list(accumulate(present, initial=0.0)), window, n)
+    sums = _windowed(list(accumulate(values, initial=0.0)), window, n)
+    squares = _windowed(list(accumulate(map(mul, values, values), initial=0.0)), window, n)
+
+    means = ratio_column(sums, counts)
+    mean_squares = ratio_column(squares, counts)
+    # Rounding in the running sums can leave a tiny negative variance
+    stdevs = array('d', [math.sqrt(v) if v > 0 else (0.0 if v == v else NAN)
+                         for v in map(sub, mean_squares, map(mul, means, means))])
+    return means, stdevs
+
+
+def summary(column):
+    """{'count', 'mean', 'min', 'max', 'p5', 'p50', 'p95'} of the finite values, or None."""
+    values = sorted(filter(math.isfinite, column))
+    if not values:
+        return None
+    out = {'count': len(values), 'mean': math.fsum(values) / len(values),
+           'min': values[0], 'max': values[-1]}
+    for p in PERCENTILES:
+        out[f'p{p}'] = values[min(len(values) - 1, round(p / 100 * (len(values) - 1)))]
+    return out
+
+
+# --- History report ----------------------------------------------------------
+
+# Metrics a report reads; rollup tiers give gauges as bucket averages and counters as maxima
+GAUGES = ('hashRate', 'power', 'temp', 'vrTemp')
+COUNTERS = ('sharesAccepted', 'sharesRejected')
+
+
+def load_columns(history, tier, miner_id, start, end):
+    """
+    The report's input columns for one miner from one tier, named like the raw
+    metrics: rollup tiers give the bucket average for gauges and the bucket
+    maximum for share counters.
+    """
+    store = history.stores[tier.name]
+    if tier.step == 0:
+        return store.query(miner_id, start, end, GAUGES + COUNTERS)
+    names = {f'{m}_avg': m for m in GAUGES}
+    names.update({f'{m}_max': m for m in COUNTERS})
+    data = store.query(miner_id, start, end, list(names))
+    return {'timestamp': data['timestamp'], **{m: data[c] for c, m in names.items()}}
+
+
+def miner_report(columns, chips=1, frequency=None, window=ROLLING_WINDOW, step=0,
+                 factor=EXPECTED_GHS_PER_MHZ):
+    """
+    Summary figures for one miner's columns (see load_columns). `step` is the
+    tier's bucket width; raw samples use their average spacing to turn the
+    `window` seconds into a number of rows.
+    """
+    timestamps = columns['timestamp']
+    if not timestamps:
+        return None
+    if not step and len(timestamps) > 1:
+        step = (timestamps[-1] - timestamps[0]) / (len(timestamps) - 1)
+    rows = max(1, round(window / step)) if step else 1
+    hashrate, power = columns['hashRate'], columns['power']
+
+    report = {'samples': len(timestamps), 'from': timestamps[0], 'to': timestamps[-1],
+              'hashRate': summary(hashrate), 'power': summary(power),
+              'jPerTh': summary(jth_column(power, hashrate))}
+
+    # Energy over work, rather than the mean of per-sample ratios
+    both = [(p, h) for p, h in zip(power, hashrate) if p == p and h == h and h > 0]
+    report['jPerThOverall'] = (math.fsum(p for p, _ in both) / math.fsum(h for _, h in both) * 1000
+                               if both else None)
+
+    if frequency:
+        expected = expected_column(frequency, chips, factor)
+        report['expectedHashRate'] = expected
+        report['efficiency'] = summary(efficiency_column(hashrate, expected))
+
+    # Partial windows at the start would make the worst case a single sample
+    full = rows - 1 if len(timestamps) >= rows else 0
+    means, stdevs = rolling(hashrate, rows)
+    report['rolling'] = {'window': window, 'rows': rows,
+                         'worstMeanHashRate': min(filter(math.isfinite, means[full:]), default=None),
+                         'typicalStdev': (summary(stdevs[full:]) or {}).get('p50')}
+
+    accepted = math.fsum(counter_deltas(columns['sharesAccepted']))
+    rejected = math.fsum(counter_deltas(columns['sharesRejected']))
+    report['shares'] = {'accepted': int(accepted), 'rejected': int(rejected),
+                        'rejectRatio': reject_ratio(accepted, rejected)}
+    rolling_rejects = reject_ratio_column(columns['sharesAccepted'], columns['sharesRejected'], rows)
+    report['shares']['worstRollingRejectRatio'] = max(filter(math.isfinite, rolling_rejects[full:]), default=None)
+
+    for metric, limit in THERMAL_LIMITS.items():
+        temps = summary(columns[metric])
+        report[metric] = temps
+        report[f'{metric}Headroom'] = thermal_headroom(temps['max'], limit) if temps else None
+        report[f'{metric}OverLimit'] = sum(1 for v in columns[metric] if v > limit)
+    return report
+
+
+def fleet_report(history, miners, start, end, tier=None, window=ROLLING_WINDOW, frequency=None):
+    """
+    {'tier', 'miners': {id: miner_report}} for every miner in `miners` (fleet
+    entries; an entry's 'frequency' overrides `frequency`). With no `tier` the
+    finest one whose retention reaches back to `start` is used.
+    """
+    tier = tier or history.choose_tier(start, end, now=end)
+    out = {}
+    for miner in miners:
+        columns = load_columns(history, tier, miner['id'], start, end)
+        report = miner_report(columns, miner.get('chips') or 1, miner.get('frequency') or frequency,
+                              window, tier.step)
+        if report is not None:
+            out[miner['id']] = report
+    return {'tier': tier.name, 'from': start, 'to': end, 'miners': out}
+
+
+def parse_duration(text):
+    """Seconds from '3600', '90m', '12h', '30d' or '52w'."""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def _span(seconds):
+    for unit, size in (('d', 86400), ('h', 3600), ('m', 60)):
+        if seconds >= size and seconds % size == 0:
+            return f"{seconds // size:.0f}{unit}"
+    return f"{seconds:.0f}s"
+
+
+def _fmt(value, spec='.1f', unit=''):
+    return f"{value:{spec}}{unit}" if value is not None else "--"
+
+
+def format_report(result, names):
+    lines = [f"Tier {result['tier']}, {time.strftime('%Y-%m-%d %H:%M', time.localtime(result['from']))}"
+             f" to {time.strftime('%Y-%m-%d %H:%M', time.localtime(result['to']))}"]
+    for miner_id, r in sorted(result['miners'].items()):
+        hr, eff, shares = r['hashRate'] or {}, r.get('efficiency') or {}, r['shares']
+        lines.append(f"{miner_id} ({names.get(miner_id, miner_id)}): {r['samples']} samples")
+        lines.append(f"    hashrate  mean {_fmt(hr.get('mean'))} GH/s, p5 {_fmt(hr.get('p5'))}, "
+                     f"worst {_span(r['rolling']['window'])} mean {_fmt(r['rolling']['worstMeanHashRate'])}, "
+                     f"typical stdev {_fmt(r['rolling']['typicalStdev'])}")
+        if 'efficiency' in r:
+            lines.append(f"    efficiency mean {_fmt(eff.get('mean'))}% of {r['expectedHashRate']:.0f} GH/s, "
+                         f"p5 {_fmt(eff.get('p5'))}%")
+        lines.append(f"    power     mean {_fmt((r['power'] or {}).get('mean'))} W, "
+                     f"{_fmt(r['jPerThOverall'], '.2f')} J/TH overall, "
+                     f"p95 {_fmt((r['jPerTh'] or {}).get('p95'), '.2f')} J/TH")
+        lines.append(f"    shares    {shares['accepted']} accepted, {shares['rejected']} rejected "
+                     f"({_fmt(shares['rejectRatio'], '.2f', '%')}), worst window "
+                     f"{_fmt(shares['worstRollingRejectRatio'], '.2f', '%')}")
+        for metric, limit in THERMAL_LIMITS.items():
+            temps = r[metric] or {}
+            lines.append(f"    {metric:<9} max {_fmt(temps.get('max'))}°C, p95 {_fmt(temps.get('p95'))}°C, "
+                         f"headroom {_fmt(r[f'{metric}Headroom'])}°C to {limit:g}°C, "
+                         f"{r[f'{metric}OverLimit']} samples over")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Efficiency and health figures over stored miner history")
+    parser.add_argument("--root", default=HISTORY_DIR, help="History directory")
+    sub_commands = parser.add_subparsers(dest="command", required=True)
+
+    report = sub_commands.add_parser("report", help="Per-miner summary over a period")
+    report.add_argument("--since", default="24h", help="How far back, e.g. 3600, 12h, 30d, 52w (default: 24h)")
+    report.add_argument("--miner", action="append", help="Miner id, repeatable (default: every miner)")
+    report.add_argument("--tier", help="raw, 1m or 1h (default: the finest that covers --since)")
+    report.add_argument("--window", default="24h", help="Rolling window, e.g. 1h, 24h, 7d (default: 24h)")
+    report.add_argument("--frequency", type=float,
+                        help="ASIC frequency in MHz for efficiency, unless the fleet entry has one")
+    report.add_argument("--fleet", default=FLEET_FILE, help="Fleet inventory, for names and chip counts")
+    report.add_argument("--json", help="Also write the figures here")
+    args = parser.parse_args()
+
+    history = TieredHistory(args.root)
+    fleet = {m['id']: m for m in load_fleet(args.fleet)}
+    ids = args.miner or sorted(set(history.miners()) | set(fleet))
+    miners = [fleet.get(miner_id, {'id': miner_id}) for miner_id in ids]
+    tier = None
+    if args.tier:
+        tier = next((t for t in history.tiers if t.name == args.tier), None)
+        if tier is None:
+            parser.error(f"unknown tier {args.tier!r}")
+
+    end = time.time()
+    started = time.perf_counter()
+    result = fleet_report(history, miners, end - parse_duration(args.since), end, tier,
+                          parse_duration(args.window), args.frequency)
+    elapsed = time.perf_counter() - started
+
+    names = {miner_id: m.get('name', miner_id) for miner_id, m in fleet.items()}
+    print('\n'.join(format_report(result, names)) if result['miners'] else "No history in that period")
+    print(f"{sum(r['samples'] for r in result['miners'].values())} samples in {elapsed:.2f}s")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
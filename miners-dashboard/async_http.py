@@ -0,0 +1,155 @@
+import asyncio
+
+from content_coding import ACCEPT_ENCODING, CHUNK_SIZE, Decoder
+
+USER_AGENT = 'miners-dashboard-proxy'
+
+# Responses that never carry a body, whatever their headers say
+NO_BODY_STATUSES = (204, 304)
+
+# Miner responses are a few KB; anything with headers bigger than this is junk
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class HTTPResponseError(Exception):
+    """The upstream sent something that isn't a valid HTTP/1.x response."""
+
+
+def split_host(host, default_port=80):
+    """Splits 'ip' or 'ip:port' into (hostname, port)."""
+    hostname, _, port = host.partition(':')
+    return hostname, int(port) if port else default_port
+
+
+async def fetch(host, path, timeout=3.0, headers=None):
+    """
+    Performs a GET request for http://<host>/<path> without blocking the loop.
+    Returns (status_code, headers, body) with header names lower-cased and
+    the body already decoded (see read_response).
+    Raises asyncio.TimeoutError, OSError, HTTPResponseError or
+    content_coding.DecodingError on failure.
+    """
+    hostname, port = split_host(host)
+
+    async def _request():
+        reader, writer = await asyncio.open_connection(hostname, port)
+        try:
+            writer.write(build_request(host, path, headers))
+            await writer.drain()
+            return await read_response(reader)
+        finally:
+            writer.close()
+
+    return await asyncio.wait_for(_request(), timeout)
+
+
+def build_request(host, path, headers=None, keep_alive=False):
+    lines = [
+        f"GET /{path.lstrip('/')} HTTP/1.1",
+        f"Host: {host}",
+        f"User-Agent: {USER_AGENT}",
+        "Accept: */*",
+        f"Accept-Encoding: {ACCEPT_ENCODING}",
+        "Connection: keep-alive" if keep_alive else "Connection: close",
+    ]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+
+async def read_head(reader):
+    """Reads a status line and headers, returning (status_code, headers)."""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.LimitOverrunError:
+        raise HTTPResponseError("Response headers too large")
+    except asyncio.IncompleteReadError:
+        raise HTTPResponseError("Connection closed before response headers")
+
+    if len(head) > MAX_HEADER_BYTES:
+        raise HTTPResponseError("Response headers too large")
+
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    parts = status_line.split(' ', 2)
+    if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+        raise HTTPResponseError(f"Bad status line: {status_line[:40]!r}")
+    try:
+        status_code = int(parts[1])
+    except ValueError:
+        raise HTTPResponseError(f"Bad status code: {parts[1][:10]!r}")
+
+    headers = {}
+    for line in header_lines:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return status_code, headers
+
+
+async def read_response(reader):
+    """
+    Reads one response. The body comes back with its Content-Encoding
+    undone, so that header is dropped from the returned headers.
+    """
+    status_code, headers = await read_head(reader)
+    body = await read_body(reader, headers, status_code)
+    headers.pop('content-encoding', None)
+    return status_code, headers, body
+
+
+async def read_body(reader, headers, status_code=200):
+    """Reads the body, decoding each chunk as it arrives."""
+    decoder = Decoder(headers.get('content-encoding'))
+    parts = [decoder.feed(chunk) async for chunk in iter_body(reader, headers, status_code=status_code)]
+    parts.append(decoder.flush())
+    return b''.join(parts)
+
+
+async def iter_body(reader, headers, chunk_size=CHUNK_SIZE, status_code=200):
+    """Yields the raw (still encoded) body in pieces of at most `chunk_size`."""
+    if status_code in NO_BODY_STATUSES or status_code < 200:
+        return
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        async for chunk in _iter_chunked(reader, chunk_size):
+            yield chunk
+        return
+
+    length = headers.get('content-length')
+    if length is not None:
+        remaining = int(length)
+        while remaining:
+            try:
+                chunk = await reader.readexactly(min(remaining, chunk_size))
+            except asyncio.IncompleteReadError as e:
+                raise HTTPResponseError(
+                    f"Body truncated at {int(length) - remaining + len(e.partial)} of {length} bytes")
+            remaining -= len(chunk)
+            yield chunk
+        return
+
+    # No framing - the server closes the connection when it's done
+    while chunk := await reader.read(chunk_size):
+        yield chunk
+
+
+async def _iter_chunked(reader, chunk_size):
+    while True:
+        size_line = await reader.readline()
+        try:
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+        except ValueError:
+            raise HTTPResponseError("Bad chunk size")
+        if size == 0:
+            # Skip trailers up to the blank line
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            return
+        while size:
+            try:
+                chunk = await reader.readexactly(min(size, chunk_size))
+            except asyncio.IncompleteReadError:
+                raise HTTPResponseError("Chunked body truncated")
+            size -= len(chunk)
+            yield chunk
+        await reader.readline()
@@ -0,0 +1,465 @@
+import asyncio
+import contextlib
+import http
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import urllib.parse
+
+import async_http
+from alerting import alerts_response
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from content_coding import DecodingError, ResponseEncoder, compressible
+from federation import SYNC_PATH, federation_response, sync_response
+from fleet_stream import PING_EVENT, PING_INTERVAL
+from history_api import history_response
+from projection import ProjectionCache, split_fields
+from proxy_metrics import METRICS_CONTENT_TYPE, ProxyMetrics, render as render_metrics
+from proxy_relay import CONDITIONAL_HEADERS, RELAY_BUFFER, is_relayed, preview, relay_plan
+from upstream_pool import AsyncConnectionPool
+
+log = logging.getLogger('dashboard.proxy')
+
+PROXY_PATH = re.compile(r'^/proxy/([^/]+)/([^?]*)\??(.*)')
+
+# Browsers keep dashboard connections open between 5s ticks
+KEEPALIVE_TIMEOUT = 15
+MAX_REQUEST_HEAD = 16 * 1024
+
+
+class AsyncProxyServer:
+    """
+    Single-threaded asyncio version of CORSProxyRequestHandler.
+
+    Serves the same routes (/proxy/<ip>/<path>, /api/fleet, the fleet event
+    stream, /api/history and static files) but waits on miners without tying up an OS thread
+    per connection, so a few boards rebooting at once no longer pile up
+    hundreds of blocked threads.
+    Each miner gets at most `miner_concurrency` upstream requests at a time.
+    The fleet poller runs in its own thread on the threaded ConnectionPool;
+    pass it as `poller_pool` so its statistics are reported too.
+    """
+
+    def __init__(self, response_cache, fleet_poller=None, fleet_stream=None, history=None, alerts=None,
+                 sync_log=None, federation=None, directory=None, miner_concurrency=2, upstream_timeout=3.0, pool_size=4,
+                 pool_idle_timeout=30.0, metrics=None, breaker=None, encoder=None, poller_pool=None):
+        self.response_cache = response_cache
+        self.fleet_poller = fleet_poller
+        self.fleet_stream = fleet_stream
+        self.history = history
+        self.alerts = alerts
+        self.sync_log = sync_log
+        self.federation = federation
+        self.directory = os.path.abspath(directory or os.getcwd())
+        self.miner_concurrency = max(1, miner_concurrency)
+        self.upstream_timeout = upstream_timeout
+        self._miner_limits = {}  # ip -> asyncio.Semaphore
+        self.connection_pool = AsyncConnectionPool(pool_size, pool_idle_timeout, upstream_timeout)
+        self.poller_pool = poller_pool
+        self.metrics = metrics or ProxyMetrics()
+        self.breaker = breaker or CircuitBreaker()
+        self.projections = ProjectionCache()
+        self.encoder = encoder or ResponseEncoder()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port,
+                                            limit=MAX_REQUEST_HEAD)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        asyncio.TimeoutError, ConnectionError):
+                    break
+
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                parts = request_line.split(' ')
+                if len(parts) != 3:
+                    self.write_response(writer, *error_json(400, "Bad Request"), keep_alive=False)
+                    break
+                method, target, version = parts
+
+                headers = {}
+                for line in header_lines:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = (version == 'HTTP/1.1' and connection != 'close') or connection == 'keep-alive'
+
+                if method == 'GET' and target.split('?', 1)[0] == '/api/fleet/stream':
+                    await self.stream_fleet(writer)
+                    break
+
+                match = PROXY_PATH.match(target) if method in ('GET', 'HEAD') else None
+                if match and is_relayed(match.group(2)):
+                    # Web UI files and the like: streamed, never buffered whole or cached
+                    target_ip, target_path, _ = proxy_target(match)
+                    keep_alive = await self.relay(writer, target_ip, target_path, headers,
+                                                  keep_alive, head_only=(method == 'HEAD'))
+                    if not keep_alive:
+                        break
+                    continue
+
+                if method not in ('GET', 'HEAD'):
+                    status, content_type, body = error_json(501, f"Unsupported method ({method})")
+                else:
+                    status, content_type, body = await self.dispatch(target)
+
+                self.write_response(writer, status, content_type, body,
+                                    keep_alive=keep_alive, head_only=(method == 'HEAD'),
+                                    accept_encoding=headers.get('accept-encoding'))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass  # Browser went away mid-response
+        finally:
+            writer.close()
+
+    async def stream_fleet(self, writer):
+        """Server-Sent Events: a full snapshot, then per-miner deltas after each poll."""
+        if self.fleet_stream is None:
+            self.write_response(writer, *error_json(503, "Fleet poller is disabled"), keep_alive=False)
+            return
+
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        # The broadcaster runs on the poller thread, so hop onto the loop
+        def send(event):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        initial = self.fleet_stream.subscribe(send)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-store\r\n"
+                         b"Access-Control-Allow-Origin: *\r\n"
+                         b"Connection: close\r\n\r\n")
+            writer.write(initial)
+            while True:
+                # A tab that stops reading gets dropped rather than buffered forever
+                await asyncio.wait_for(writer.drain(), PING_INTERVAL)
+                try:
+                    event = await asyncio.wait_for(events.get(), PING_INTERVAL)
+                except asyncio.TimeoutError:
+                    event = PING_EVENT
+                writer.write(event)
+        except (ConnectionError, asyncio.TimeoutError):
+            pass  # Tab closed or stalled
+        finally:
+            self.fleet_stream.unsubscribe(send)
+
+    async def dispatch(self, target):
+        """Routes one request and returns (status, content_type, body)."""
+        route = target.split('?', 1)[0]
+        if route == '/api/fleet':
+            if self.fleet_poller is None:
+                return error_json(503, "Fleet poller is disabled")
+            fields, _ = split_fields(target.partition('?')[2])
+            if fields is not None:
+                return 200, 'application/json', self.projections.fleet(self.fleet_poller.snapshot(), fields)
+            return 200, 'application/json', self.fleet_poller.document()
+
+        if route == '/api/history':
+            query = target.split('?', 1)[1] if '?' in target else ''
+            # Reads may touch disk, keep them off the event loop
+            status, payload = await asyncio.to_thread(history_response, self.history, query)
+            return status, 'application/json', json.dumps(payload).encode('utf-8')
+
+        if route == '/api/alerts':
+            status, payload = alerts_response(self.alerts)
+            return status, 'application/json', json.dumps(payload).encode('utf-8')
+
+        if route == SYNC_PATH:
+            status, payload = sync_response(self.sync_log, target.partition('?')[2])
+            return status, 'application/json', json.dumps(payload).encode('utf-8')
+
+        if route == '/api/federation':
+            status, payload = federation_response(self.federation)
+            return status, 'application/json', json.dumps(payload).encode('utf-8')
+
+        if route == '/api/proxy/stats':
+            stats = {'cache': self.response_cache.stats(), 'pool': self.connection_pool.stats_dict(),
+                     'breaker': self.breaker.states()}
+            if self.poller_pool is not None:
+                stats['poller_pool'] = self.poller_pool.stats_dict()
+            return 200, 'application/json', json.dumps(stats).encode('utf-8')
+
+        if route == '/metrics':
+            fleet = self.fleet_poller.snapshot() if self.fleet_poller is not None else None
+            poller_pool = self.poller_pool.stats_dict() if self.poller_pool is not None else None
+            text = render_metrics(self.metrics, self.response_cache.stats(),
+                                  self.connection_pool.stats_dict(), fleet, self.breaker.states(), poller_pool)
+            return 200, METRICS_CONTENT_TYPE, text.encode('utf-8')
+
+        if route == '/fleet.json' and self.fleet_poller is not None:
+            # The inventory actually being polled, which --fleet may have moved,
+            # plus any miners synced from collectors
+            return 200, 'application/json', json.dumps({'miners': self.fleet_poller.inventory()}).encode('utf-8')
+
+        match = PROXY_PATH.match(target)
+        if match:
+            return await self.proxy(*proxy_target(match))
+
+        return await self.static_file(target)
+
+    async def proxy(self, target_ip, target_path, fields=None):
+        self.metrics.proxy_started(target_ip)
+        response = None
+        try:
+            response = await self._proxy(target_ip, target_path, fields)
+            return response
+        finally:
+            self.metrics.proxy_finished(target_ip, response[0] if response else 500)
+
+    async def _proxy(self, target_ip, target_path, fields):
+        target_url = f"http://{target_ip}/{target_path}"
+        log.debug("Proxying: %s", target_url)
+
+        try:
+            # Identical requests from other tabs share one upstream fetch
+            status_code, content = await self.response_cache.get_or_fetch_async(
+                (target_ip, target_path),
+                lambda: self.fetch_upstream(target_ip, target_path)
+            )
+            if fields is not None and status_code == 200:
+                content = self.projections.miner((target_ip, target_path), content, fields)
+            return status_code, 'application/json', content
+        except DecodingError as e:
+            log.warning("  -> Failed %s: %s", target_url, e)
+            return error_json(502, str(e))
+        except ValueError:
+            log.warning("  -> Failed %s: response is not JSON", target_url)
+            return error_json(502, "Miner sent invalid JSON")
+        except CircuitOpenError as e:
+            log.debug("  -> Offline %s: %s", target_url, e)
+            return error_json(503, str(e))
+        except asyncio.TimeoutError:
+            log.warning("  -> Timeout %s", target_url)
+            return error_json(504, "Connection Timed Out")
+        except (OSError, async_http.HTTPResponseError) as e:
+            error_msg = str(e) or type(e).__name__
+            log.warning("  -> Failed %s: %s", target_url, error_msg)
+            return error_json(502, f"Connection Failed: {error_msg}")
+        except Exception as e:
+            log.error("  -> Error %s: %s", target_url, e)
+            return error_json(500, f"Proxy Error: {str(e)}")
+
+    async def relay(self, writer, target_ip, target_path, request_headers, keep_alive, head_only=False):
+        """
+        Streams an upstream response to the browser chunk by chunk, waiting
+        for the browser whenever more than RELAY_BUFFER bytes are queued, and
+        forwards Content-Length, ETag and friends. Returns whether the
+        connection can be kept alive; once the headers have gone out a
+        failure can only be reported by closing it.
+        """
+        target_url = f"http://{target_ip}/{target_path}"
+        log.debug("Proxying: %s", target_url)
+        self.metrics.proxy_started(target_ip)
+        status_code = 500
+        started = False
+        try:
+            upstream_headers = {name: request_headers[name] for name in CONDITIONAL_HEADERS
+                                if name in request_headers}
+            with self.metrics.upstream(target_ip) as timer:
+                async with self.stream_upstream(target_ip, target_path, upstream_headers) as (
+                        status_code, headers, body):
+                    decoder, relay_headers = relay_plan(headers, request_headers.get('accept-encoding'))
+                    has_body = not head_only and status_code not in async_http.NO_BODY_STATUSES
+                    sized = any(name == 'Content-Length' for name, _ in relay_headers)
+                    # Decoded bodies have no known length: chunk them, or close to end them
+                    chunked = has_body and not sized and keep_alive
+                    keep_alive = keep_alive and (sized or chunked or not has_body)
+
+                    head = [f"HTTP/1.1 {status_code} {_reason(status_code)}",
+                            *(f"{name}: {value}" for name, value in relay_headers),
+                            "Access-Control-Allow-Origin: *",
+                            "Connection: keep-alive" if keep_alive else "Connection: close"]
+                    if chunked:
+                        head.append("Transfer-Encoding: chunked")
+                    writer.transport.set_write_buffer_limits(high=RELAY_BUFFER)
+                    writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1'))
+                    started = True
+
+                    first, size = b'', 0
+                    while has_body:
+                        chunk = await body.read()
+                        size += len(chunk)
+                        tail = chunk == b''
+                        if decoder is not None:
+                            chunk = decoder.flush() if tail else decoder.feed(chunk)
+                        first = first or chunk
+                        if chunk:
+                            writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk) if chunked else chunk)
+                        if tail:
+                            break
+                        # A browser that stops reading gets dropped rather than buffered
+                        await asyncio.wait_for(writer.drain(), KEEPALIVE_TIMEOUT)
+                    if chunked:
+                        writer.write(b'0\r\n\r\n')
+                    timer.status, timer.size = status_code, size
+
+            encoded = any(name == 'Content-Encoding' for name, _ in relay_headers)
+            log.info("  -> Relayed: %s [len=%d] Preview: %s", target_url, size,
+                     '(encoded)' if encoded else preview(first), extra={'sample': True})
+            return keep_alive
+        except CircuitOpenError as e:
+            status_code = 503
+            log.debug("  -> Offline %s: %s", target_url, e)
+            self.write_response(writer, *error_json(503, str(e)), keep_alive=keep_alive)
+            return keep_alive
+        except (OSError, async_http.HTTPResponseError, DecodingError) as e:
+            error_msg = str(e) or type(e).__name__
+            if started:
+                status_code = 502
+                log.warning("  -> Relay aborted %s: %s", target_url, error_msg)
+                return False
+            if isinstance(e, asyncio.TimeoutError):
+                status_code = 504
+                log.warning("  -> Timeout %s", target_url)
+                self.write_response(writer, *error_json(504, "Connection Timed Out"), keep_alive=keep_alive)
+            else:
+                status_code = 502
+                log.warning("  -> Failed %s: %s", target_url, error_msg)
+                self.write_response(writer, *error_json(502, f"Connection Failed: {error_msg}"),
+                                    keep_alive=keep_alive)
+            return keep_alive
+        finally:
+            self.metrics.proxy_finished(target_ip, status_code)
+
+    @contextlib.asynccontextmanager
+    async def stream_upstream(self, target_ip, target_path, headers=None):
+        """
+        connection_pool.stream() behind the circuit breaker and the per-miner
+        limit. Only failing to get a response head counts against the miner.
+        """
+        limit = await self._acquire(target_ip)
+        opened = False
+        try:
+            async with self.connection_pool.stream(target_ip, target_path, headers) as response:
+                opened = True
+                self.breaker.success(target_ip)
+                yield response
+        except (OSError, async_http.HTTPResponseError) as e:
+            if not opened:
+                self.breaker.failure(target_ip, e)
+            raise
+        finally:
+            limit.release()
+
+    def _miner_limit(self, target_ip):
+        limit = self._miner_limits.get(target_ip)
+        if limit is None:
+            limit = self._miner_limits[target_ip] = asyncio.Semaphore(self.miner_concurrency)
+        return limit
+
+    async def _acquire(self, target_ip):
+        """
+        Takes one of the miner's request slots, then asks the circuit breaker,
+        and returns the semaphore to release. In that order a request that
+        times out queueing for a slot never becomes a probe that can't report.
+        """
+        limit = self._miner_limit(target_ip)
+        # Don't queue forever behind a miner that isn't answering
+        await asyncio.wait_for(limit.acquire(), self.upstream_timeout)
+        try:
+            self.breaker.before(target_ip)
+        except BaseException:
+            limit.release()
+            raise
+        return limit
+
+    async def fetch_upstream(self, target_ip, target_path):
+        target_url = f"http://{target_ip}/{target_path}"
+        limit = await self._acquire(target_ip)
+        try:
+            # Reuses a keep-alive socket to the miner when one is idle
+            with self.metrics.upstream(target_ip) as timer:
+                status_code, headers, content = await self.connection_pool.request(target_ip, target_path)
+                timer.status, timer.size = status_code, len(content)
+        except (OSError, async_http.HTTPResponseError, DecodingError) as e:
+            self.breaker.failure(target_ip, e)
+            raise
+        finally:
+            limit.release()
+        self.breaker.success(target_ip)
+        # Any gzip/deflate/br Content-Encoding was undone by the pool as the body arrived
+
+        preview = content[:100].decode('utf-8', errors='ignore').replace('\n', ' ')
+        log.info("  -> Success: %s [len=%d] [%.0fms] Preview: %s", target_url, len(content),
+                 timer.elapsed * 1000, preview, extra={'sample': True})
+        return status_code, content
+
+    async def static_file(self, target):
+        path = urllib.parse.unquote(urllib.parse.urlsplit(target).path)
+        # Drop '.' and '..' so requests can't escape the served directory
+        parts = [p for p in posixpath.normpath(path).split('/') if p not in ('', '.', '..')]
+        full_path = os.path.join(self.directory, *parts)
+        if os.path.isdir(full_path):
+            full_path = os.path.join(full_path, 'index.html')
+
+        content = await asyncio.to_thread(_read_file, full_path)
+        if content is None:
+            return error_json(404, "File not found")
+
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        return 200, content_type, content
+
+    def write_response(self, writer, status, content_type, body, keep_alive=True,
+                       head_only=False, accept_encoding=None):
+        body, encoding = self.encoder.encode(body, content_type, accept_encoding)
+        head = [
+            f"HTTP/1.1 {status} {_reason(status)}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            "Access-Control-Allow-Origin: *",
+            "Connection: keep-alive" if keep_alive else "Connection: close",
+        ]
+        if encoding:
+            head.append(f"Content-Encoding: {encoding}")
+        if compressible(content_type):
+            head.append("Vary: Accept-Encoding")
+        if content_type == 'application/json':
+            head.append("Cache-Control: no-store")
+
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1'))
+        if not head_only:
+            writer.write(body)
+
+
+def proxy_target(match):
+    """(target_ip, target_path, fields) for a PROXY_PATH match."""
+    # ?fields= is ours, anything else in the query goes to the miner
+    fields, query = split_fields(match.group(3))
+    # Encode spaces in path just in case, though unlikely for API
+    target_path = urllib.parse.quote(match.group(2)) + (f"?{query}" if query else "")
+    return match.group(1), target_path, fields
+
+
+def _reason(status):
+    try:
+        return http.HTTPStatus(status).phrase
+    except ValueError:
+        return ''
+
+
+def error_json(code, message):
+    return code, 'application/json', json.dumps({'error': message, 'status': 'offline'}).encode('utf-8')
+
+
+def _read_file(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
@@ -0,0 +1,273 @@
+"""
+Load test for server.py against emulated miners.
+
+Starts miner_emulator.py and server.py as subprocesses, then runs N
+concurrent dashboard clients for a fixed time. Each client behaves like an
+open tab: every tick it requests every miner through /proxy/ (stats too for
+useStats miners), or /api/fleet with --mode fleet. Reports throughput,
+latency percentiles, errors and the server's resident memory.
+
+Usage:
+    python bench_proxy.py --miners 50 --clients 20 --duration 20
+    python bench_proxy.py --engine threaded --json bench_threaded.json
+    python bench_proxy.py --baseline bench_asyncio.json   # exit 1 on a regression
+
+With --interval 0 (the default) clients send the next tick as soon as the
+last one finishes, which measures capacity; --interval 5 reproduces the
+real dashboard's polling load. The clients share this process, so for very
+high rates the numbers are a lower bound on what the server can do.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from fleet_config import load_fleet
+from upstream_pool import AsyncConnectionPool
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# A browser opens at most 6 connections per host; requests beyond that queue
+CLIENT_CONNECTIONS = 6
+CLIENT_TIMEOUT = 10.0
+
+STARTUP_TIMEOUT = 15.0
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def wait_for_port(port, timeout=STARTUP_TIMEOUT, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{process.args[1]} exited with code {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+
+def read_rss(pid):
+    """Returns (VmRSS, VmHWM) in KiB from /proc, or (None, None) off Linux."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(fields['VmRSS'].split()[0]), int(fields['VmHWM'].split()[0])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+class Results:
+    def __init__(self):
+        self.latencies = []
+        self.errors = {}
+        self.bytes = 0
+
+    def record(self, seconds, status=None, size=0, error=None):
+        if error is None and status == 200:
+            self.latencies.append(seconds)
+            self.bytes += size
+        else:
+            key = error or f"HTTP {status}"
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+
+async def client(host, paths, deadline, interval, results):
+    pool = AsyncConnectionPool(CLIENT_CONNECTIONS, timeout=CLIENT_TIMEOUT)
+    connections = asyncio.Semaphore(CLIENT_CONNECTIONS)
+
+    async def get(path):
+        async with connections:
+            started = time.perf_counter()
+            try:
+                status, _, body = await pool.request(host, path)
+                results.record(time.perf_counter() - started, status, len(body))
+            except Exception as e:
+                results.record(time.perf_counter() - started, error=type(e).__name__)
+
+    try:
+        while time.monotonic() < deadline:
+            tick = time.monotonic()
+            # Like the dashboard: every miner at once, then wait for the next tick
+            await asyncio.gather(*(get(p) for p in paths))
+            if interval:
+                await asyncio.sleep(max(0, interval - (time.monotonic() - tick)))
+    finally:
+        pool.close()
+
+
+async def drive(port, paths, clients, duration, interval, server_pid=None):
+    results = Results()
+    deadline = time.monotonic() + duration
+    memory = []
+
+    async def sample_memory():
+        while time.monotonic() < deadline:
+            rss, _ = read_rss(server_pid)
+            if rss is not None:
+                memory.append(rss)
+            await asyncio.sleep(0.5)
+
+    started = time.perf_counter()
+    tasks = [client(f"127.0.0.1:{port}", paths, deadline, interval, results) for _ in range(clients)]
+    if server_pid is not None:
+        tasks.append(sample_memory())
+    await asyncio.gather(*tasks)
+    return results, time.perf_counter() - started, memory
+
+
+def summarise(results, elapsed, memory, server_pid, config):
+    latencies = sorted(results.latencies)
+    total = len(latencies) + sum(results.errors.values())
+    ms = lambda v: None if v is None else round(v * 1000, 2)
+    summary = {
+        'config': config,
+        'requests': total,
+        'ok': len(latencies),
+        'errors': results.errors,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'mb_per_s': round(results.bytes / elapsed / 1e6, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': ms(percentile(latencies, 50)),
+            'p90': ms(percentile(latencies, 90)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1] if latencies else None),
+        },
+    }
+    if server_pid is not None:
+        _, peak = read_rss(server_pid)
+        summary['server_rss_kib'] = {
+            'start': memory[0] if memory else None,
+            'end': memory[-1] if memory else None,
+            'peak': peak,
+        }
+    return summary
+
+
+def print_summary(s):
+    c = s['config']
+    print(f"\n{c['engine']} engine, {c['miners']} miners, {c['clients']} clients, mode={c['mode']}, "
+          f"interval={c['interval']}s, miner latency={c['latency_ms']}ms")
+    print(f"  Requests   : {s['requests']} ({s['ok']} ok) in {s['elapsed_s']}s")
+    print(f"  Throughput : {s['throughput_rps']} req/s, {s['mb_per_s']} MB/s")
+    lat = s['latency_ms']
+    print(f"  Latency    : p50 {lat['p50']} ms | p90 {lat['p90']} ms | p99 {lat['p99']} ms | max {lat['max']} ms")
+    if s['errors']:
+        print("  Errors     : " + ", ".join(f"{k} x{v}" for k, v in sorted(s['errors'].items())))
+    mem = s.get('server_rss_kib')
+    if mem and mem['peak']:
+        print(f"  Server RSS : start {mem['start']} KiB, end {mem['end']} KiB, peak {mem['peak']} KiB")
+
+
+def compare(summary, baseline, tolerance):
+    """Returns a list of regressions against a previous --json result."""
+    problems = []
+    if summary['throughput_rps'] < baseline['throughput_rps'] * (1 - tolerance):
+        problems.append(f"throughput {summary['throughput_rps']} < baseline {baseline['throughput_rps']} req/s")
+    for key in ('p50', 'p99'):
+        now, then = summary['latency_ms'][key], baseline['latency_ms'][key]
+        if now is not None and then and now > then * (1 + tolerance):
+            problems.append(f"{key} {now} ms > baseline {then} ms")
+    base_errors = sum(baseline['errors'].values()) / max(1, baseline['requests'])
+    errors = sum(summary['errors'].values()) / max(1, summary['requests'])
+    if errors > base_errors + 0.01:
+        problems.append(f"error rate {errors:.1%} > baseline {base_errors:.1%}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard proxy against emulated miners")
+    parser.add_argument("--miners", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=10, help="Concurrent dashboard tabs")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds to run the load for")
+    parser.add_argument("--interval", type=float, default=0.0,
+                        help="Seconds between a client's ticks (0 = as fast as possible)")
+    parser.add_argument("--mode", choices=("proxy", "fleet"), default="proxy",
+                        help="proxy: /proxy/<ip>/... per miner; fleet: one /api/fleet per tick")
+    parser.add_argument("--engine", choices=("asyncio", "threaded"), default="asyncio")
+    parser.add_argument("--latency", type=float, default=100, help="Emulated miner latency in ms")
+    parser.add_argument("--jitter", type=float, default=50, help="Emulated miner jitter in ms")
+    parser.add_argument("--junk", type=float, default=0.1, help="Probability of stray bytes after the JSON")
+    parser.add_argument("--down", type=float, default=0.0, help="Fraction of emulated miners offline")
+    parser.add_argument("--port", type=int, default=8600, help="Port for the server under test")
+    parser.add_argument("--miner-port", type=int, default=9300, help="First emulated miner port")
+    parser.add_argument("--server-args", default="",
+                        help="Extra server.py arguments, e.g. \"--cache-ttl 0\"")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Compare against a previous --json result")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative regression against the baseline")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-proxy-")
+    fleet_path = os.path.join(workdir, "fleet.json")
+    emulator = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "miner_emulator.py"), "--count", str(args.miners),
+         "--base-port", str(args.miner_port), "--latency", str(args.latency),
+         "--jitter", str(args.jitter), "--junk", str(args.junk), "--down", str(args.down),
+         "--seed", "1", "--fleet-out", fleet_path],
+        stdout=subprocess.DEVNULL)
+    server = None
+    try:
+        wait_for_port(args.miner_port + args.miners - 1, process=emulator)
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, "server.py"), "--port", str(args.port),
+             "--engine", args.engine, "--fleet", fleet_path, "--history-dir", "",
+             "--log-file", "", "--log-level", "WARNING", *args.server_args.split()],
+            cwd=workdir, stdout=subprocess.DEVNULL)
+        wait_for_port(args.port, process=server)
+
+        if args.mode == "fleet":
+            paths = ["/api/fleet"]
+        else:
+            paths = []
+            for miner in load_fleet(fleet_path):
+                paths.append(f"/proxy/{miner['ip']}/api/system/info")
+                if miner.get('useStats'):
+                    paths.append(f"/proxy/{miner['ip']}/api/system/stats")
+
+        print(f"Running {args.clients} clients for {args.duration}s against {args.engine} "
+              f"({len(paths)} requests per tick)...")
+        results, elapsed, memory = asyncio.run(
+            drive(args.port, paths, args.clients, args.duration, args.interval, server.pid))
+        config = {'engine': args.engine, 'miners': args.miners, 'clients': args.clients,
+                  'mode': args.mode, 'interval': args.interval, 'latency_ms': args.latency,
+                  'server_args': args.server_args}
+        summary = summarise(results, elapsed, memory, server.pid, config)
+    finally:
+        for process in (server, emulator):
+            if process is not None:
+                process.terminate()
+                process.wait(5)
+
+    print_summary(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Wrote {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(summary, json.load(f), args.tolerance)
+        if problems:
+            print("REGRESSION: " + "; ".join(problems))
+            sys.exit(1)
+        print(f"No regression against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
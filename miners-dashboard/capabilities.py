@@ -0,0 +1,72 @@
+"""
+Per-firmware capability map written by probe_miner.py.
+
+The map is keyed by firmware (device model + version), since that is what
+decides which endpoints a board serves. It doubles as the prober's cache:
+a firmware already in the file is never probed again. server.py applies it
+to the fleet so miners whose firmware serves /api/system/stats get
+useStats without anyone editing fleet.json; src/main.js does the same when
+it loads the inventory without the server's poller.
+"""
+import json
+import os
+
+from fleet_config import FLEET_FILE
+
+CAPABILITIES_FILE = os.path.join(os.path.dirname(FLEET_FILE), 'capabilities.json')
+
+
+def firmware_key(model, version):
+    """'<deviceModel>@<version>', e.g. 'NerdQAxe++@v1.0.29'."""
+    return f"{model or 'unknown'}@{version or 'unknown'}"
+
+
+def load_capabilities(path=CAPABILITIES_FILE):
+    """The saved map, or an empty one when nothing has been probed yet."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        data = {}
+    data.setdefault('firmware', {})
+    data.setdefault('miners', {})
+    return data
+
+
+def save_capabilities(capabilities, path=CAPABILITIES_FILE):
+    """Writes atomically, like save_fleet."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(capabilities, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def miner_firmware(miner, capabilities, info=None):
+    """
+    The capability entry for a fleet miner, or None if its firmware wasn't
+    probed. The version the miner reports now (`info`, its /api/system/info)
+    or has in fleet.json wins over the one recorded when it was probed, so
+    an upgraded board follows its new firmware.
+    """
+    if info and info.get('version'):
+        key = firmware_key(info.get('deviceModel') or info.get('boardVersion'), info['version'])
+    elif miner.get('version'):
+        key = firmware_key(miner.get('deviceModel'), miner['version'])
+    else:
+        key = capabilities['miners'].get(miner['id'])
+    return capabilities['firmware'].get(key)
+
+
+def apply_capabilities(miners, capabilities):
+    """
+    Returns the miners with useStats set from the probed firmware, where
+    known. Miners on firmware that wasn't probed keep their own setting.
+    """
+    applied = []
+    for miner in miners:
+        firmware = miner_firmware(miner, capabilities)
+        if firmware is not None and 'useStats' in firmware:
+            miner = {**miner, 'useStats': firmware['useStats']}
+        applied.append(miner)
+    return applied
@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger('dashboard.proxy')
+
+# Consecutive network failures before a miner is treated as offline
+FAILURE_THRESHOLD = 3
+
+# First wait before probing an offline miner again; doubles per failed probe
+BASE_BACKOFF = 5.0
+MAX_BACKOFF = 300.0
+
+CLOSED = 'closed'        # Healthy, every request goes through
+OPEN = 'open'            # Offline, requests fail fast until the next probe
+HALF_OPEN = 'half_open'  # One probe request is in flight
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of contacting a miner that is known to be offline."""
+
+    def __init__(self, host, retry_in, last_error):
+        self.host = host
+        self.retry_in = retry_in
+        self.last_error = last_error
+        super().__init__(f"Miner offline ({last_error}), retrying in {retry_in:.0f}s")
+
+
+class _Circuit:
+    __slots__ = ('state', 'failures', 'backoff', 'retry_at', 'probe_started', 'last_error', 'trips')
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.backoff = 0.0
+        self.retry_at = 0.0
+        self.probe_started = 0.0
+        self.last_error = None
+        self.trips = 0
+
+
+class CircuitBreaker:
+    """
+    Per-miner circuit breaker for upstream fetches.
+
+    After `failure_threshold` consecutive network failures a miner's circuit
+    opens and before() raises CircuitOpenError straight away, so a dead board
+    costs no socket, thread or timeout. Once the backoff has passed a single
+    request is let through as a probe: success closes the circuit, failure
+    reopens it with the backoff doubled (up to `max_backoff`).
+
+    Only network errors count as failures; an HTTP 404 still means the board
+    is alive. Thread-safe, and cheap enough to call on every request.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, base_backoff=BASE_BACKOFF,
+                 max_backoff=MAX_BACKOFF, probe_timeout=10.0):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        # A probe that never reports back (e.g. its thread died) is replaced after this long
+        self.probe_timeout = probe_timeout
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def before(self, host):
+        """Call before contacting `host`; raises CircuitOpenError to fail fast."""
+        if self.failure_threshold <= 0:
+            return
+        circuit = self._circuits.get(host)
+        if circuit is None or circuit.state == CLOSED:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if circuit.state == OPEN and now >= circuit.retry_at:
+                circuit.state = HALF_OPEN
+                circuit.probe_started = now
+                return
+            if circuit.state == HALF_OPEN and now - circuit.probe_started > self.probe_timeout:
+                circuit.probe_started = now
+                return
+            if circuit.state == CLOSED:
+                return
+            raise CircuitOpenError(host, max(0.0, circuit.retry_at - now), circuit.last_error)
+
+    def success(self, host):
+        circuit = self._circuits.get(host)
+        if circuit is None or (circuit.state == CLOSED and circuit.failures == 0):
+            return
+        with self._lock:
+            if circuit.state != CLOSED:
+                log.warning("  -> %s is back online", host)
+            circuit.state = CLOSED
+            circuit.failures = 0
+            circuit.backoff = 0.0
+
+    def failure(self, host, error):
+        if self.failure_threshold <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                circuit = self._circuits[host] = _Circuit()
+            circuit.failures += 1
+            circuit.last_error = str(error) or type(error).__name__
+
+            if circuit.state == HALF_OPEN:
+                circuit.backoff = min(self.max_backoff, circuit.backoff * 2)
+            elif circuit.state == CLOSED and circuit.failures >= self.failure_threshold:
+                circuit.backoff = self.base_backoff
+                circuit.trips += 1
+                log.warning("  -> %s marked offline after %d failures (%s), retrying in %.0fs",
+                            host, circuit.failures, circuit.last_error, circuit.backoff)
+            else:
+                return
+            circuit.state = OPEN
+            circuit.retry_at = now + circuit.backoff
+
+    def states(self):
+        """{host: {...}} for every miner that has failed at least once."""
+        now = time.monotonic()
+        with self._lock:
+            return {host: {'state': c.state,
+                           'failures': c.failures,
+                           'retry_in': round(max(0.0, c.retry_at - now), 1) if c.state == OPEN else 0.0,
+                           'trips': c.trips,
+                           'last_error': c.last_error}
+                    for host, c in self._circuits.items()}
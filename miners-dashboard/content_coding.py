@@ -0,0 +1,262 @@
+"""
+HTTP content codings for the proxy.
+
+Decoder undoes a miner's Content-Encoding (gzip, deflate, and br when the
+optional `brotli` package is installed) chunk by chunk as the body arrives,
+so the compressed copy is never held alongside the decoded one.
+ResponseEncoder compresses what we send back to browsers according to their
+Accept-Encoding; JSON shrinks 5-10x, which is what makes remote viewing over
+a VPN bearable.
+"""
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install brotli
+    brotli = None
+
+_STAGE_ERRORS = (zlib.error, brotli.error) if brotli is not None else (zlib.error,)
+
+# Bytes read from the socket per decode step
+CHUNK_SIZE = 16 * 1024
+
+# A miner document is a few KB; refuse to inflate anything past this
+MAX_DECODED_BYTES = 16 * 1024 * 1024
+
+# Bodies smaller than this go out as-is, the headers would eat the saving
+MIN_COMPRESS_BYTES = 512
+
+# zlib level 6 and brotli quality 5 are the usual speed/size points for dynamic content
+COMPRESS_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Distinct (body, coding) pairs whose compressed form is remembered
+MAX_ENCODED_ENTRIES = 128
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+# Preferred first when a browser accepts several equally
+DECODINGS = ('br', 'gzip', 'deflate') if brotli is not None else ('gzip', 'deflate')
+
+# Sent upstream so miners that can compress are allowed to
+ACCEPT_ENCODING = ', '.join(DECODINGS)
+
+
+class DecodingError(Exception):
+    """The upstream body doesn't match its Content-Encoding."""
+
+
+class _ZlibStage:
+    def __init__(self, wbits):
+        self.wbits = wbits
+        self._d = zlib.decompressobj(wbits)
+
+    def feed(self, data, limit):
+        out = self._d.decompress(data, limit)
+        if self._d.unconsumed_tail:
+            raise DecodingError("Decoded body too large")
+        # gzip allows several members back to back
+        while self._d.eof and self._d.unused_data:
+            rest = self._d.unused_data
+            self._d = zlib.decompressobj(self.wbits)
+            out += self._d.decompress(rest, max(1, limit - len(out)))
+        return out
+
+    def flush(self):
+        return self._d.flush()
+
+
+class _DeflateStage(_ZlibStage):
+    """'deflate' is meant to be zlib-wrapped, but some servers send raw deflate."""
+
+    def __init__(self):
+        super().__init__(zlib.MAX_WBITS)
+        self._started = False
+
+    def feed(self, data, limit):
+        if not self._started:
+            self._started = True
+            try:
+                return super().feed(data, limit)
+            except zlib.error:
+                self.wbits = -zlib.MAX_WBITS
+                self._d = zlib.decompressobj(self.wbits)
+        return super().feed(data, limit)
+
+
+class _BrotliStage:
+    # Input per process() call on brotli releases that can't cap the output
+    # (before 1.2); stops a few bytes of bomb inflating far past `limit`
+    SLICE = 256
+
+    def __init__(self):
+        self._d = brotli.Decompressor()
+        self._capped = hasattr(self._d, 'can_accept_more_data')
+
+    def feed(self, data, limit):
+        if self._capped:
+            out = self._d.process(data, output_buffer_limit=limit)
+            while len(out) < limit and not self._d.can_accept_more_data():
+                out += self._d.process(b'', output_buffer_limit=limit - len(out))
+            return out
+        out = b''
+        for start in range(0, len(data), self.SLICE):
+            out += self._d.process(data[start:start + self.SLICE])
+            if len(out) >= limit:
+                break  # Over the limit already; Decoder refuses the body
+        return out
+
+    def flush(self):
+        return b''
+
+
+def _stage(coding):
+    if coding in ('gzip', 'x-gzip'):
+        return _ZlibStage(16 + zlib.MAX_WBITS)
+    if coding == 'deflate':
+        return _DeflateStage()
+    if coding == 'br' and brotli is not None:
+        return _BrotliStage()
+    raise DecodingError(f"Unsupported Content-Encoding: {coding}")
+
+
+class Decoder:
+    """
+    Incremental decoder for a Content-Encoding header value. Codings are
+    undone in reverse order of application; identity passes bytes through.
+    """
+
+    def __init__(self, content_encoding, max_size=MAX_DECODED_BYTES):
+        codings = [c.strip().lower() for c in (content_encoding or '').split(',')]
+        self.codings = [c for c in codings if c and c != 'identity']
+        self._stages = [_stage(c) for c in reversed(self.codings)]
+        self.max_size = max_size
+        self.size = 0
+
+    def feed(self, data):
+        try:
+            for stage in self._stages:
+                data = stage.feed(data, self.max_size - self.size + 1)
+        except _STAGE_ERRORS as e:
+            raise DecodingError(f"Bad {'+'.join(self.codings)} body: {e}")
+        return self._count(data)
+
+    def flush(self):
+        out = b''
+        try:
+            for stage in self._stages:
+                # Whatever an outer stage flushes still has to go through the inner ones
+                out = (stage.feed(out, self.max_size - self.size + 1) if out else b'') + stage.flush()
+        except _STAGE_ERRORS as e:
+            raise DecodingError(f"Bad {'+'.join(self.codings)} body: {e}")
+        return self._count(out)
+
+    def _count(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise DecodingError(f"Decoded body larger than {self.max_size} bytes")
+        return data
+
+
+def decode(body, content_encoding):
+    """Decodes a complete body in one go."""
+    decoder = Decoder(content_encoding)
+    return decoder.feed(body) + decoder.flush()
+
+
+def compressible(content_type):
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _weights(accept_encoding):
+    """Accept-Encoding as {coding: q}."""
+    weights = {}
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            weights[coding] = q
+    return weights
+
+
+def accepts(accept_encoding, coding):
+    """Whether a client sending `accept_encoding` takes `coding` (q > 0, or via '*')."""
+    weights = _weights(accept_encoding)
+    return weights.get(coding.lower(), weights.get('*', 0.0)) > 0
+
+
+def choose_encoding(accept_encoding):
+    """
+    Picks the best coding we support from an Accept-Encoding header, or None
+    for identity. Honours q-values, including q=0 and '*'.
+    """
+    weights = _weights(accept_encoding)
+    wildcard = weights.get('*', 0.0)
+    best, best_q = None, 0.0
+    for coding in DECODINGS:
+        q = weights.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body, coding, level=COMPRESS_LEVEL):
+    if coding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if coding == 'gzip':
+        c = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    else:
+        c = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS)
+    return c.compress(body) + c.flush()
+
+
+class ResponseEncoder:
+    """
+    Compresses response bodies for the client. Cached miner responses,
+    projections and the fleet document are shared bytes objects, so the
+    compressed form is memoised by body identity (the body is kept in the
+    entry so its id can't be reused) and each one is compressed once per
+    coding however many tabs fetch it.
+    """
+
+    def __init__(self, level=COMPRESS_LEVEL, min_size=MIN_COMPRESS_BYTES,
+                 max_entries=MAX_ENCODED_ENTRIES):
+        self.level = level
+        self.min_size = min_size
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, body, content_type, accept_encoding):
+        """Returns (body, content_encoding), with content_encoding None when sent as-is."""
+        if self.level <= 0 or len(body) < self.min_size or not compressible(content_type):
+            return body, None
+        coding = choose_encoding(accept_encoding)
+        if coding is None:
+            return body, None
+
+        key = (id(body), coding)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is body:
+                self._entries.move_to_end(key)
+                return entry[1], entry[2]
+
+        encoded = compress(body, coding, self.level)
+        if len(encoded) >= len(body):
+            encoded, coding = body, None
+        with self._lock:
+            self._entries[key] = (body, encoded, coding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return encoded, coding
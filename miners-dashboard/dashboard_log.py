@@ -0,0 +1,119 @@
+"""
+Logging for the dashboard server.
+
+Request threads and the event loop only put records on an in-memory queue;
+a single background thread formats them and writes the console and
+dashboard.log. The log file rotates when it passes a size limit or gets
+older than a time limit, whichever comes first, and rotated files are
+gzipped (dashboard.log.1.gz is the newest).
+
+Routine successes (e.g. every proxied miner response) are logged with
+extra={'sample': True} and only 1 in `sample_every` of them is kept.
+Warnings and errors are never sampled.
+"""
+import gzip
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import time
+
+LOG_FILE = 'dashboard.log'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_ROTATE_INTERVAL = 24 * 3600
+LOG_BACKUPS = 7
+
+# Keep 1 in this many sampled records (proxy successes)
+LOG_SAMPLE_EVERY = 10
+
+CONSOLE_FORMAT = '%(message)s'
+FILE_FORMAT = '%(asctime)s %(levelname)-7s %(name)s %(message)s'
+
+
+class SampleFilter(logging.Filter):
+    """Passes 1 in `every` records marked with extra={'sample': True}."""
+
+    def __init__(self, every=LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.every = max(1, every)
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if not getattr(record, 'sample', False) or record.levelno >= logging.WARNING:
+            return True
+        # count() is atomic under the GIL, so no lock on the hot path
+        return next(self._counter) % self.every == 0
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler that also rolls over every `interval` seconds and
+    gzips the files it rotates out.
+    """
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, interval=LOG_ROTATE_INTERVAL,
+                 backups=LOG_BACKUPS):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        self.interval = interval
+        # An existing file keeps its age across restarts
+        try:
+            opened = os.path.getmtime(self.baseFilename) if os.path.getsize(self.baseFilename) else time.time()
+        except OSError:
+            opened = time.time()
+        self.rollover_at = opened + interval if interval else None
+
+    def namer(self, default_name):
+        return default_name + '.gz'
+
+    def rotator(self, source, dest):
+        with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+
+
+def setup_logging(path=LOG_FILE, level=logging.INFO, sample_every=LOG_SAMPLE_EVERY,
+                  max_bytes=LOG_MAX_BYTES, interval=LOG_ROTATE_INTERVAL, backups=LOG_BACKUPS):
+    """
+    Routes the root logger through a queue to the console and `path` (None
+    for console only). Returns the started QueueListener; call stop() on it
+    at shutdown to flush what's still queued.
+    """
+    handlers = [logging.StreamHandler(sys.stdout)]
+    handlers[0].setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    if path:
+        file_handler = CompressingRotatingFileHandler(path, max_bytes, interval, backups)
+        file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+        handlers.append(file_handler)
+
+    # Unbounded: put_nowait never blocks a request, and the writer keeps up easily
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    # Filtered before enqueueing, so dropped samples cost nothing downstream
+    queue_handler.addFilter(SampleFilter(sample_every))
+
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    # DEBUG is for our own loggers; asyncio and friends stay at INFO
+    root.setLevel(max(level, logging.INFO))
+    logging.getLogger('dashboard').setLevel(level)
+
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -3,11 +3,9 @@ import json
 import socket
 import sys
 
-miners = [
-    {'name': 'nerdqaxe++', 'ip': '192.168.0.154'},
-    {'name': 'ak-bitaxe', 'ip': '192.168.0.157'},
-    {'name': 'ck-bitaxe', 'ip': '192.168.0.156'},
-]
+from fleet_config import load_fleet
+
+miners = load_fleet()
 
 log_file = open("connectivity_log.txt", "w", buffering=1)
 
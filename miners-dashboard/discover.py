@@ -0,0 +1,161 @@
+"""
+Finds AxeOS miners on the network and writes the fleet inventory.
+
+Every address in the range is probed concurrently: a short TCP connect to
+port 80, then GET /api/system/info on the same connection. Hosts that answer
+with AxeOS JSON are fingerprinted (hostname, deviceModel, ASIC model and
+count, firmware version) and merged into fleet.json. Names, ids and useStats
+set by hand on miners already in the inventory are kept.
+
+Usage:
+    python discover.py 192.168.0.0/24
+    python discover.py 192.168.0.0/24 10.0.1.0/24 --concurrency 512 --dry-run
+"""
+import argparse
+import asyncio
+import ipaddress
+import time
+
+from async_http import HTTPResponseError, build_request, read_response
+from fleet_config import FLEET_FILE, load_fleet, miner_id, normalise_miner, save_fleet
+from fleet_poller import parse_miner_json
+
+# Most of a sweep is waiting on addresses nobody answers for, so this is the
+# number that decides how long a /24 takes
+CONNECT_TIMEOUT = 1.0
+
+# ESP32s are slow to build the info JSON while hashing
+API_TIMEOUT = 4.0
+
+CONCURRENCY = 256
+
+# Keys only AxeOS (Bitaxe, NerdQAxe, ...) puts in /api/system/info
+AXEOS_KEYS = ('ASICModel', 'hashRate', 'frequency')
+
+
+async def probe(ip, port=80, connect_timeout=CONNECT_TIMEOUT, api_timeout=API_TIMEOUT):
+    """Returns the parsed /api/system/info of an AxeOS device at `ip`, or None."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), connect_timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+    host = ip if port == 80 else f"{ip}:{port}"
+    try:
+        writer.write(build_request(host, '/api/system/info'))
+        await writer.drain()
+        status, _, body = await asyncio.wait_for(read_response(reader), api_timeout)
+    except (OSError, asyncio.TimeoutError, HTTPResponseError):
+        return None
+    finally:
+        writer.close()
+
+    if status != 200:
+        return None
+    try:
+        info = parse_miner_json(body)
+    except ValueError:
+        return None
+    if not isinstance(info, dict) or not all(k in info for k in AXEOS_KEYS):
+        return None
+    return info
+
+
+def fingerprint(ip, info, port=80):
+    hostname = info.get('hostname') or ip
+    return {
+        'name': hostname,
+        'ip': ip if port == 80 else f"{ip}:{port}",
+        'id': miner_id(hostname),
+        'chips': info.get('asicCount') or 1,
+        'useStats': False,
+        'deviceModel': info.get('deviceModel') or info.get('boardVersion'),
+        'asicModel': info.get('ASICModel'),
+        'version': info.get('version'),
+        'mac': info.get('macAddr'),
+    }
+
+
+async def scan(networks, port=80, concurrency=CONCURRENCY,
+               connect_timeout=CONNECT_TIMEOUT, api_timeout=API_TIMEOUT):
+    """Probes every host address of `networks` and returns fingerprints sorted by IP."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check(ip):
+        async with semaphore:
+            info = await probe(ip, port, connect_timeout, api_timeout)
+        return None if info is None else fingerprint(ip, info, port)
+
+    hosts = []
+    for network in networks:
+        net = ipaddress.ip_network(network, strict=False)
+        hosts.extend(str(ip) for ip in (net.hosts() if net.num_addresses > 1 else [net.network_address]))
+
+    found = await asyncio.gather(*(check(ip) for ip in dict.fromkeys(hosts)))
+    return sorted((f for f in found if f), key=lambda f: ipaddress.ip_address(f['ip'].split(':')[0]))
+
+
+def merge_inventory(existing, found):
+    """
+    Updates the inventory with freshly discovered miners. Miners are matched by
+    MAC (DHCP may have moved them) and then by IP; hand-edited names, ids and
+    useStats survive. Miners that weren't seen this time are kept as they are.
+    """
+    merged = [dict(m) for m in existing]
+    by_mac = {m['mac']: m for m in merged if m.get('mac')}
+    by_ip = {m['ip']: m for m in merged}
+    used_ids = {m['id'] for m in merged}
+
+    for miner in found:
+        current = by_mac.get(miner['mac']) if miner.get('mac') else None
+        current = current or by_ip.get(miner['ip'])
+        if current is not None:
+            for key in ('ip', 'chips', 'deviceModel', 'asicModel', 'version', 'mac'):
+                if miner.get(key) is not None:
+                    current[key] = miner[key]
+            continue
+
+        # Two boards with the same default hostname still need distinct ids
+        base, n = miner['id'], 2
+        while miner['id'] in used_ids:
+            miner['id'] = f"{base}-{n}"
+            n += 1
+        used_ids.add(miner['id'])
+        merged.append(normalise_miner({k: v for k, v in miner.items() if v is not None}))
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discover AxeOS miners and write the fleet inventory")
+    parser.add_argument("networks", nargs="+", help="CIDR ranges or single addresses to sweep")
+    parser.add_argument("--port", type=int, default=80)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="Hosts probed at the same time")
+    parser.add_argument("--connect-timeout", type=float, default=CONNECT_TIMEOUT)
+    parser.add_argument("--api-timeout", type=float, default=API_TIMEOUT)
+    parser.add_argument("--output", default=FLEET_FILE, help="Inventory file to update")
+    parser.add_argument("--replace", action="store_true",
+                        help="Write only the miners found now instead of merging")
+    parser.add_argument("--dry-run", action="store_true", help="Print the results without writing")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    found = asyncio.run(scan(args.networks, args.port, args.concurrency,
+                             args.connect_timeout, args.api_timeout))
+    elapsed = time.monotonic() - started
+
+    for m in found:
+        print(f"  {m['ip']:<21} {m['name']:<20} {m['deviceModel'] or '?':<12} "
+              f"{m['asicModel'] or '?'} x{m['chips']}  fw {m['version'] or '?'}")
+    print(f"Found {len(found)} miners in {elapsed:.1f}s")
+
+    if args.dry_run:
+        return
+    existing = [] if args.replace else load_fleet(args.output)
+    miners = merge_inventory(existing, found)
+    save_fleet(miners, args.output, discovered=int(time.time()))
+    print(f"Wrote {len(miners)} miners to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Federation: one central dashboard for miners spread over several sites.
+
+Every server.py is also a collector. SyncLog is a fleet poller listener
+that keeps the last round's results plus the per-field changes of the last
+RETAIN_ROUNDS rounds, and /api/federation/sync?epoch=E&since=N answers
+with everything that changed after round N, merged into one batch:
+
+    {"epoch": "3f2a...", "seq": 42, "updated": 1767225600.0,
+     "miners": {"nerdqaxe": {"hashRate": 4810.2, "temp": 61.5}}}
+
+A field that disappeared is sent as null, as in the browser event stream,
+and a miner that was removed is null itself. A miner that was added (or
+removed and added again) in that span is listed in "replaced": its entry
+is the whole record, to replace rather than update what the central has.
+When the collector restarted (new epoch) or N is older than what it still
+retains, the answer is the full state instead, with "full": true and the
+collector's inventory. The body is gzip-compressed like any other response,
+so a steady-state sync of a shed of boards is a few hundred bytes.
+
+The central server (--collector shed1=http://10.1.0.5:8000, repeatable;
+use an https:// URL for a collector reached over the internet) runs a
+Federation thread that syncs every collector concurrently each
+interval. Remote miners are merged into the central poller's rounds as
+"<site>-<id>", so /api/fleet, the event stream, /fleet.json, history, alerts
+and /metrics cover the whole farm and the browser never talks to a remote
+site. A site that can't be reached for STALE_AFTER intervals shows its
+miners offline. /api/federation reports the state of each link.
+
+A collector only needs the poller, so it can run lean:
+
+    python server.py --port 8101 --fleet shed1.json --history-dir "" --alerts-log ""
+    python server.py --fleet central.json --collector shed1=http://10.1.0.5:8101
+"""
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from content_coding import decode
+from fleet_config import miner_id as safe_name
+from fleet_stream import diff_miner
+
+log = logging.getLogger('dashboard.federation')
+
+SYNC_PATH = '/api/federation/sync'
+
+# Rounds of changes a collector keeps; a central that falls further behind gets a full sync
+RETAIN_ROUNDS = 120
+
+# Intervals without a successful sync before a site's miners are shown offline
+STALE_AFTER = 3
+
+SYNC_TIMEOUT = 5.0
+
+
+class SyncLog:
+    """
+    Fleet poller listener keeping what /api/federation/sync serves. Each
+    round costs one diff per miner, the same as FleetBroadcaster.
+    `inventory()` returns the fleet entries sent with a full sync.
+    """
+
+    def __init__(self, inventory=list, retain=RETAIN_ROUNDS):
+        self.epoch = os.urandom(8).hex()
+        self.inventory = inventory
+        self._lock = threading.Lock()
+        self._miners = {}
+        self._rounds = deque(maxlen=retain)  # (seq, {miner id: changed fields or None}, added ids)
+        self.seq = 0
+        self.updated = None
+
+    def publish(self, miners):
+        with self._lock:
+            deltas = {}
+            for miner_id, data in miners.items():
+                delta = diff_miner(self._miners.get(miner_id, {}), data)
+                if delta:
+                    deltas[miner_id] = delta
+            for miner_id in self._miners.keys() - miners.keys():
+                deltas[miner_id] = None
+            added = miners.keys() - self._miners.keys()
+            self._miners = miners
+            self.updated = time.time()
+            if deltas:
+                self.seq += 1
+                self._rounds.append((self.seq, deltas, added))
+
+    def changes(self, epoch=None, since=None):
+        """The sync payload for a central that last saw round `since` of `epoch`."""
+        with self._lock:
+            payload = {'epoch': self.epoch, 'seq': self.seq, 'updated': self.updated}
+            oldest = self._rounds[0][0] if self._rounds else self.seq + 1
+            if epoch != self.epoch or since is None or since > self.seq or since + 1 < oldest:
+                payload.update(full=True, miners=self._miners, inventory=self.inventory())
+                return payload
+
+            merged = {}
+            replaced = []
+            settled = set()  # Removed or added: older rounds don't matter for these
+            for seq, deltas, added in reversed(self._rounds):
+                if seq <= since:
+                    break
+                # Newest first, so the first value seen for a field is the one that counts
+                for miner_id, delta in deltas.items():
+                    if miner_id in settled:
+                        continue
+                    if delta is None:
+                        merged[miner_id] = None
+                        settled.add(miner_id)
+                        continue
+                    fields = merged.setdefault(miner_id, {})
+                    for key, value in delta.items():
+                        fields.setdefault(key, value)
+                    if miner_id in added:
+                        # The diff against nothing is the whole record
+                        settled.add(miner_id)
+                        replaced.append(miner_id)
+            payload['miners'] = merged
+            payload['replaced'] = replaced
+            return payload
+
+
+def sync_response(sync_log, query):
+    """(status, payload) for GET /api/federation/sync."""
+    if sync_log is None:
+        return 503, {'error': "Fleet poller is disabled", 'status': 'offline'}
+    params = urllib.parse.parse_qs(query)
+    epoch = params.get('epoch', [None])[0]
+    try:
+        since = int(params['since'][0]) if 'since' in params else None
+    except ValueError:
+        return 400, {'error': "since must be a round number", 'status': 'offline'}
+    return 200, sync_log.changes(epoch, since)
+
+
+def parse_collector(spec):
+    """('shed1', 'http://10.1.0.5:8000') from 'shed1=http://10.1.0.5:8000'."""
+    name, sep, url = spec.partition('=')
+    if not sep or not url:
+        raise ValueError(f"Collector {spec!r}: expected NAME=URL")
+    if '://' not in url:
+        url = 'http://' + url
+    if urllib.parse.urlsplit(url).scheme not in ('http', 'https'):
+        raise ValueError(f"Collector {spec!r}: only http:// and https:// URLs are supported")
+    return safe_name(name), url.rstrip('/')
+
+
+class RemoteSite:
+    """One collector as seen from the central server. Only touched with Federation._lock held."""
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        parsed = urllib.parse.urlsplit(url)
+        # Collectors reached over the internet should be behind https
+        self.https = parsed.scheme == 'https'
+        self.host, self.port = parsed.hostname, parsed.port or (443 if self.https else 80)
+        self.prefix = parsed.path
+        self.epoch = None
+        self.seq = None
+        self.miners = {}      # remote id -> data
+        self.inventory = []   # remote fleet entries
+        self.updated = None   # collector's last poll round
+        self.last_sync = None
+        self.error = None
+        self.syncs = 0
+        self.full_syncs = 0
+        self.bytes = 0
+
+    def local_id(self, remote_id):
+        return f"{self.name}-{remote_id}"
+
+    def apply(self, payload):
+        if payload.get('full') or payload['epoch'] != self.epoch:
+            self.miners = {miner_id: dict(data) for miner_id, data in payload['miners'].items()}
+            self.inventory = payload.get('inventory') or self.inventory
+            self.full_syncs += 1
+        else:
+            replaced = set(payload.get('replaced') or ())
+            for miner_id, delta in payload['miners'].items():
+                if delta is None:
+                    self.miners.pop(miner_id, None)
+                    continue
+                if miner_id in replaced:
+                    self.miners[miner_id] = {key: value for key, value in delta.items() if value is not None}
+                    continue
+                data = self.miners.setdefault(miner_id, {})
+                for key, value in delta.items():
+                    if value is None:
+                        data.pop(key, None)
+                    else:
+                        data[key] = value
+        self.epoch, self.seq = payload['epoch'], payload['seq']
+        self.updated = payload.get('updated')
+
+
+class Federation:
+    """
+    Central side: syncs every collector each `interval` from a background
+    thread. Register it with FleetPoller.add_source so its miners are merged
+    into each poll round.
+    """
+
+    def __init__(self, collectors, interval=5.0, timeout=SYNC_TIMEOUT):
+        self.sites = [RemoteSite(name, url) for name, url in collectors]
+        self.interval = interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._local = threading.local()
+        self._thread = threading.Thread(target=self.run, name="federation", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=len(self.sites) or 1, thread_name_prefix="federation-sync") as pool:
+            while not self._stop_event.is_set():
+                started = time.monotonic()
+                list(pool.map(self.sync, self.sites))
+                self._stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def sync(self, site):
+        with self._lock:
+            query = urllib.parse.urlencode({'epoch': site.epoch, 'since': site.seq}
+                                           if site.epoch is not None else {})
+        body = None
+        try:
+            body = self._fetch(site, f"{site.prefix}{SYNC_PATH}" + (f"?{query}" if query else ""))
+            payload = json.loads(body)
+            if (not isinstance(payload, dict) or not isinstance(payload.get('miners'), dict)
+                    or 'epoch' not in payload or 'seq' not in payload):
+                raise ValueError("Not a federation sync response")
+            with self._lock:
+                full = payload.get('full') or payload['epoch'] != site.epoch
+                site.apply(payload)
+        except Exception as e:
+            error_msg = str(e) or type(e).__name__
+            with self._lock:
+                if site.error is None:
+                    log.warning("  -> Collector %s (%s) sync failed: %s", site.name, site.url, error_msg)
+                site.error = error_msg
+                if body is not None:
+                    # A bad or half-applied batch can't be trusted, start over with a full sync
+                    site.epoch = site.seq = None
+            return
+
+        with self._lock:
+            if site.error is not None:
+                log.info("  -> Collector %s (%s) back", site.name, site.url)
+            site.error = None
+            site.last_sync = time.time()
+            site.syncs += 1
+            site.bytes += len(body)
+        if full:
+            log.info("  -> Full sync from %s: %d miners, %d bytes", site.name, len(payload['miners']), len(body))
+
+    def _fetch(self, site, path):
+        """GETs `path` from the site over a keep-alive connection kept per sync thread."""
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        conn = connections.get(site.name)
+        for attempt in (0, 1):
+            if conn is None:
+                connection_class = http.client.HTTPSConnection if site.https else http.client.HTTPConnection
+                conn = connections[site.name] = connection_class(site.host, site.port, timeout=self.timeout)
+            try:
+                conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+                response = conn.getresponse()
+                body = response.read()
+                if response.status != 200:
+                    raise OSError(f"HTTP {response.status}")
+                return decode(body, response.getheader('Content-Encoding'))
+            except (ConnectionError, http.client.CannotSendRequest):
+                # The collector closed an idle keep-alive socket; retry once on a fresh one
+                conn.close()
+                conn = connections[site.name] = None
+                if attempt:
+                    raise
+            except Exception:
+                conn.close()
+                connections[site.name] = None
+                raise
+
+    # --- FleetPoller source ----------------------------------------------------
+
+    def miners(self):
+        """Every remote miner's latest data under its central id."""
+        now = time.time()
+        out = {}
+        with self._lock:
+            for site in self.sites:
+                stale = site.last_sync is None or now - site.last_sync > STALE_AFTER * self.interval
+                for miner_id, data in site.miners.items():
+                    if stale:
+                        error = f"Collector {site.name} unreachable" + (f": {site.error}" if site.error else "")
+                        out[site.local_id(miner_id)] = {'status': 'offline', 'error': error,
+                                                        'polledAt': site.updated}
+                    else:
+                        out[site.local_id(miner_id)] = {**data, 'polledAt': site.updated}
+        return out
+
+    def inventory(self):
+        """Fleet entries for the remote miners, as served in /fleet.json."""
+        with self._lock:
+            return [{**entry, 'id': site.local_id(entry['id']), 'name': f"{site.name}/{entry['name']}",
+                     'site': site.name}
+                    for site in self.sites for entry in site.inventory]
+
+    def status(self):
+        now = time.time()
+        with self._lock:
+            return [{'site': site.name, 'url': site.url, 'miners': len(site.miners),
+                     'epoch': site.epoch, 'seq': site.seq, 'error': site.error,
+                     'lastSync': site.last_sync,
+                     'age': round(now - site.last_sync, 1) if site.last_sync else None,
+                     'syncs': site.syncs, 'fullSyncs': site.full_syncs, 'bytes': site.bytes}
+                    for site in self.sites]
+
+
+def federation_response(federation):
+    """(status, payload) for GET /api/federation."""
+    if federation is None:
+        return 503, {'error': "No collectors configured", 'status': 'offline'}
+    return 200, {'sites': federation.status()}
@@ -1,56 +1,47 @@
-import urllib.request
-import re
-import os
+"""
+Lists the API paths each miner's web UI scripts reference, one section per
+firmware, in miner_analysis.txt. The index page and scripts of every
+firmware are fetched concurrently (see probe_miner.py, which also probes
+the paths found and caches the result per firmware).
+
+Usage:
+    python fetch_miner_js.py                  # every miner in fleet.json
+    python fetch_miner_js.py 192.168.0.154    # just these addresses
+"""
+import asyncio
+import sys
+
+from capabilities import firmware_key
+from fleet_config import load_fleet
+from probe_miner import Prober
 
-PROXY_BASE = "http://localhost:8000/proxy/192.168.0.154"
 OUTPUT_FILE = "miner_analysis.txt"
 
-def fetch(url):
+
+async def analyze(hosts):
+    prober = Prober()
     try:
-        req = urllib.request.Request(
-            url, 
-            headers={'User-Agent': 'miners-dashboard-probe'}
-        )
-        with urllib.request.urlopen(req, timeout=5) as response:
-            return response.read().decode('utf-8', errors='ignore')
-    except Exception as e:
-        return f"Error: {e}"
-
-def analyze():
+        infos = await asyncio.gather(*(prober.info(host) for host in hosts))
+        by_firmware = {}
+        for host, info in zip(hosts, infos):
+            key = firmware_key(info.get('deviceModel') or info.get('boardVersion'),
+                               info.get('version')) if info else None
+            by_firmware.setdefault(key, []).append(host)
+
+        keys = [key for key in by_firmware if key is not None]
+        scans = await asyncio.gather(*(prober.scan_scripts(by_firmware[key]) for key in keys))
+    finally:
+        prober.close()
+
     with open(OUTPUT_FILE, "w") as f:
-        f.write(f"Analyzing {PROXY_BASE}...\n")
-        
-        # 1. Fetch Index
-        html = fetch(PROXY_BASE + "/")
-        f.write(f"Index Length: {len(html)}\n")
-        
-        # 2. Find scripts
-        scripts = re.findall(r'<script[^>]+src=["\']([^"\']+)["\']', html)
-        f.write(f"Found scripts: {scripts}\n")
-        
-        # 3. Analyze scripts
-        for script in scripts:
-            if script.startswith("http"): continue # Skip external
-            
-            # Handle relative paths
-            script_url = PROXY_BASE + "/" + script.lstrip("/")
-            f.write(f"Fetching {script_url}...\n")
-            js_content = fetch(script_url)
-            
-            f.write(f"  Length: {len(js_content)}\n")
-            
-            # Look for API patterns
-            matches = re.findall(r'["\'](/api/[^"\']+)["\']', js_content)
-            matches += re.findall(r'["\'](api/[^"\']+)["\']', js_content)
-            
-            if matches:
-                f.write(f"  Found potential endpoints: {matches}\n")
-            
-            # Simple keyword search
-            if "stats" in js_content:
-                f.write("  'stats' keyword found.\n")
-                # Context
-                idx = js_content.find("stats")
-                f.write(f"  Context: {js_content[max(0, idx-20):min(len(js_content), idx+50)]}\n")
-
-analyze()
+        for key, (scripts, references) in zip(keys, scans):
+            f.write(f"{key} ({', '.join(by_firmware[key])})\n")
+            f.write(f"  Found scripts: {scripts}\n")
+            f.write(f"  Found potential endpoints: {references}\n")
+        if None in by_firmware:
+            f.write(f"No answer from: {', '.join(by_firmware[None])}\n")
+    print(f"Wrote {OUTPUT_FILE} ({len(keys)} firmware)")
+
+
+if __name__ == "__main__":
+    asyncio.run(analyze(sys.argv[1:] or [m['ip'] for m in load_fleet()]))
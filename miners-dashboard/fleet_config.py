@@ -0,0 +1,53 @@
+import json
+import os
+import re
+
+# Written by discover.py, read by server.py, the debug scripts and src/main.js
+# (served as /fleet.json)
+FLEET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fleet.json')
+
+# Used when there is no inventory yet
+DEFAULT_MINERS = [
+    {'name': 'nerdqaxe++', 'ip': '192.168.0.154', 'id': 'nerdqaxe', 'chips': 4, 'useStats': False},
+    {'name': 'ak-bitaxe', 'ip': '192.168.0.157', 'id': 'ak-bitaxe', 'chips': 1, 'useStats': False},
+    {'name': 'ck-bitaxe', 'ip': '192.168.0.156', 'id': 'ck-bitaxe', 'chips': 1, 'useStats': False},
+]
+
+
+def miner_id(name):
+    """Turns a hostname into an id that is safe in DOM ids and history paths."""
+    return re.sub(r'[^a-z0-9-]+', '-', name.lower()).strip('-') or 'miner'
+
+
+def normalise_miner(entry):
+    """Fills in the fields every consumer expects (name, id, chips, useStats)."""
+    miner = dict(entry)
+    miner.setdefault('name', miner['ip'])
+    miner.setdefault('id', miner_id(miner['name']))
+    miner.setdefault('chips', 1)
+    miner.setdefault('useStats', False)
+    return miner
+
+
+def load_fleet(path=FLEET_FILE):
+    """
+    Returns the miner list from the inventory file, or DEFAULT_MINERS when the
+    file doesn't exist. The file is {"miners": [...]} or a bare list.
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return [dict(m) for m in DEFAULT_MINERS]
+
+    miners = data.get('miners', []) if isinstance(data, dict) else data
+    return [normalise_miner(m) for m in miners if m.get('ip')]
+
+
+def save_fleet(miners, path=FLEET_FILE, **extra):
+    """Writes the inventory atomically so a running server never reads half a file."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({**extra, 'miners': miners}, f, indent=2)
+        f.write('\n')
+    os.replace(tmp_path, path)
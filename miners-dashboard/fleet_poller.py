@@ -0,0 +1,144 @@
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from analytics import derive
+from capabilities import miner_firmware
+
+log = logging.getLogger('dashboard.poller')
+
+# Same rule as safeFetch in src/main.js: keep printable ASCII and whitespace.
+# Some AxeOS builds append \0 and other binary junk after the JSON body.
+NON_PRINTABLE = re.compile(rb'[^\x20-\x7e\t\n\r]')
+
+
+def parse_miner_json(content):
+    """Strips non-printable bytes from a miner response and parses the JSON."""
+    return json.loads(NON_PRINTABLE.sub(b'', content))
+
+
+class FleetPoller(threading.Thread):
+    """
+    Polls every configured miner on a fixed cadence and keeps the latest
+    merged info/stats snapshot in memory, with the analytics.derive figures
+    (expectedHashRate, efficiency, jPerTh, ...) added to each online miner.
+
+    `fetch(ip, path)` must return (status_code, content) for a miner endpoint,
+    which lets the poller share the proxy's cache and upstream plumbing.
+    The fleet document is serialised once per round, so serving /api/fleet is
+    a plain memory read regardless of how many clients ask for it.
+    Listeners registered with add_listener are called with the per-miner
+    results after every round. Sources registered with add_source (the
+    federation's remote sites) contribute miners polled elsewhere: their
+    `miners()` is merged into every round and their `inventory()` into
+    inventory(). With `capabilities` (probe_miner.py's map), whether to fetch
+    stats follows the firmware version each miner reports.
+    """
+
+    def __init__(self, miners, fetch, interval=5.0, max_workers=32, capabilities=None):
+        super().__init__(name="fleet-poller", daemon=True)
+        self.miners = miners
+        self.fetch = fetch
+        self.interval = interval
+        self.capabilities = capabilities
+        self.max_workers = max(1, min(max_workers, len(miners) or 1))
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._snapshot = {'updated': None, 'interval': interval, 'miners': {}}
+        self._document = json.dumps(self._snapshot).encode('utf-8')
+        self._listeners = []
+        self._sources = []
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="fleet-poll") as pool:
+            while not self._stop_event.is_set():
+                started = time.monotonic()
+                self.poll_once(pool)
+                elapsed = time.monotonic() - started
+                self._stop_event.wait(max(0.0, self.interval - elapsed))
+
+    def add_listener(self, listener):
+        """Registers `listener(miners)`, called from the poller thread after each round."""
+        self._listeners.append(listener)
+
+    def add_source(self, source):
+        """Registers a source of already-polled miners (see Federation)."""
+        self._sources.append(source)
+
+    def inventory(self):
+        """Fleet entries for every miner in the rounds, local ones first."""
+        return self.miners + [entry for source in self._sources for entry in source.inventory()]
+
+    def stop(self):
+        self._stop_event.set()
+
+    def poll_once(self, pool):
+        results = pool.map(self.poll_miner, self.miners)
+        miners = {miner['id']: data for miner, data in zip(self.miners, results)}
+        for source in self._sources:
+            miners.update(source.miners())
+        self.publish(miners)
+
+    def poll_miner(self, miner):
+        """Fetches and merges one miner's endpoints, mirroring fetchMinerData."""
+        try:
+            info = self._fetch_json(miner['ip'], 'api/system/info')
+
+            # Skip stats for miners that don't support it to avoid 404s
+            use_stats = miner.get('useStats', False)
+            firmware = miner_firmware(miner, self.capabilities, info) if self.capabilities else None
+            if firmware is not None and 'useStats' in firmware:
+                use_stats = firmware['useStats']
+            stats = {}
+            if use_stats:
+                stats = self._fetch_json(miner['ip'], 'api/system/stats')
+
+            # Merge data, prioritising info but allowing stats to fill gaps
+            data = {**stats, **info}
+            if not data:
+                raise ValueError("No data received")
+
+            data['status'] = 'online'
+            data.update(derive(data, miner.get('chips')))
+        except Exception as e:
+            error_msg = str(getattr(e, 'reason', e)) or type(e).__name__
+            # An open circuit breaker is already logged once when the miner goes offline
+            level = logging.DEBUG if getattr(e, 'retry_in', None) is not None else logging.WARNING
+            log.log(level, "  -> Poll failed %s (%s): %s", miner['name'], miner['ip'], error_msg)
+            data = {'status': 'offline', 'error': error_msg}
+
+        data['polledAt'] = time.time()
+        return data
+
+    def _fetch_json(self, ip, path):
+        status_code, content = self.fetch(ip, path)
+        if status_code != 200:
+            return {}
+        data = parse_miner_json(content)
+        return data if isinstance(data, dict) else {}
+
+    def publish(self, miners):
+        snapshot = {'updated': time.time(), 'interval': self.interval, 'miners': miners}
+        document = json.dumps(snapshot, separators=(',', ':')).encode('utf-8')
+        with self._lock:
+            self._snapshot = snapshot
+            self._document = document
+
+        for listener in self._listeners:
+            try:
+                listener(miners)
+            except Exception as e:
+                log.error("  -> Fleet listener %s failed: %s", getattr(listener, '__qualname__', listener), e)
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot
+
+    def document(self):
+        """The latest snapshot as pre-serialised JSON bytes."""
+        with self._lock:
+            return self._document
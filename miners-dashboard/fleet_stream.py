@@ -0,0 +1,82 @@
+import json
+import threading
+
+# Changes every poll and isn't shown anywhere, so it would turn every tick
+# into a non-empty delta
+VOLATILE_FIELDS = ('polledAt',)
+
+# Sent when a client has been idle this long so dead connections get noticed
+PING_INTERVAL = 15.0
+PING_EVENT = b': ping\n\n'
+
+
+def diff_miner(previous, current):
+    """
+    Returns the fields of `current` that differ from `previous`.
+    Fields that disappeared are included with a None value so clients can drop them.
+    """
+    delta = {}
+    for key, value in current.items():
+        if key not in VOLATILE_FIELDS and previous.get(key, delta) != value:
+            delta[key] = value
+    for key in previous.keys() - current.keys():
+        if key not in VOLATILE_FIELDS:
+            delta[key] = None
+    return delta
+
+
+def format_event(event, payload):
+    data = json.dumps(payload, separators=(',', ':'))
+    return f"event: {event}\ndata: {data}\n\n".encode('utf-8')
+
+
+class FleetBroadcaster:
+    """
+    Fans fleet poller results out to Server-Sent Events subscribers.
+
+    New subscribers get one `snapshot` event with every miner, then only
+    `delta` events holding the fields that changed since the previous poll.
+    Subscribers are plain callables taking the encoded event bytes. A
+    subscriber that raises (e.g. its queue is full) is dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._miners = {}
+        self.seq = 0
+
+    def publish(self, miners):
+        """Poller listener: diffs a new round of results against the last one."""
+        with self._lock:
+            deltas = {}
+            for miner_id, data in miners.items():
+                delta = diff_miner(self._miners.get(miner_id, {}), data)
+                if delta:
+                    deltas[miner_id] = delta
+            self._miners = miners
+            if not deltas:
+                return
+            self.seq += 1
+            event = format_event('delta', {'seq': self.seq, 'miners': deltas})
+            subscribers = list(self._subscribers)
+
+        for send in subscribers:
+            try:
+                send(event)
+            except Exception:
+                self.unsubscribe(send)
+
+    def subscribe(self, send):
+        """Registers `send` and returns the snapshot event to write first."""
+        with self._lock:
+            self._subscribers.add(send)
+            return format_event('snapshot', {'seq': self.seq, 'miners': self._miners})
+
+    def unsubscribe(self, send):
+        with self._lock:
+            self._subscribers.discard(send)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
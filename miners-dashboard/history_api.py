@@ -0,0 +1,154 @@
+import bisect
+import math
+import time
+import urllib.parse
+
+from history_store import METRICS
+
+DEFAULT_RANGE = 3600
+DEFAULT_POINTS = 300
+MAX_POINTS = 2000
+
+
+def bucket_series(timestamps, mins, avgs, maxs, start, end, points):
+    """
+    Aggregates a sorted series into exactly `points` equal-width buckets over
+    [start, end). Each bucket reports min of mins, mean of avgs and max of
+    maxes; empty buckets are None. Boundaries are found by bisecting the
+    timestamps, so the work per bucket is a slice plus builtin min/max/sum.
+    """
+    width = (end - start) / points
+    bounds = [bisect.bisect_left(timestamps, start + i * width) for i in range(points)]
+    bounds.append(bisect.bisect_left(timestamps, end))
+
+    out_min, out_avg, out_max = [], [], []
+    for i in range(points):
+        lo, hi = bounds[i], bounds[i + 1]
+        if lo >= hi:
+            out_min.append(None)
+            out_avg.append(None)
+            out_max.append(None)
+            continue
+        # NaN marks a sample where the miner didn't report this metric
+        bucket_avg = [v for v in avgs[lo:hi] if v == v]
+        if not bucket_avg:
+            out_min.append(None)
+            out_avg.append(None)
+            out_max.append(None)
+            continue
+        out_min.append(min(v for v in mins[lo:hi] if v == v))
+        out_avg.append(sum(bucket_avg) / len(bucket_avg))
+        out_max.append(max(v for v in maxs[lo:hi] if v == v))
+
+    bucket_starts = [start + i * width for i in range(points)]
+    return bucket_starts, out_min, out_avg, out_max
+
+
+def lttb(timestamps, values, points):
+    """
+    Largest-Triangle-Three-Buckets decimation: picks `points` real samples that
+    keep the visual shape of the series. Returns (timestamps, values).
+    """
+    data = [(t, v) for t, v in zip(timestamps, values) if v == v]
+    n = len(data)
+    if points >= n:
+        return [t for t, _ in data], [v for _, v in data]
+    if points < 3:
+        # Never more than asked for: the endpoints, or just the first sample
+        data = [data[0], data[-1]][:max(points, 0)]
+        return [t for t, _ in data], [v for _, v in data]
+
+    sampled = [data[0]]
+    every = (n - 2) / (points - 2)
+    a = 0
+    for i in range(points - 2):
+        # Average of the next bucket is the third point of the triangle
+        next_lo = int((i + 1) * every) + 1
+        next_hi = min(int((i + 2) * every) + 1, n)
+        span = data[next_lo:next_hi]
+        avg_t = sum(t for t, _ in span) / len(span)
+        avg_v = sum(v for _, v in span) / len(span)
+
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        at, av = data[a]
+        best_area = -1.0
+        best = lo
+        for j in range(lo, hi):
+            t, v = data[j]
+            area = abs((at - avg_t) * (v - av) - (at - t) * (avg_v - av))
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(data[best])
+        a = best
+
+    sampled.append(data[-1])
+    return [t for t, _ in sampled], [v for _, v in sampled]
+
+
+def _round(values, digits=3):
+    return [None if v is None else round(v, digits) for v in values]
+
+
+def history_response(history, query_string, now=None):
+    """
+    Handles /api/history?miner=&metric=&from=&to=&points=[&mode=lttb] and
+    returns (status_code, payload). `from`/`to` are epoch seconds; by default
+    the last hour is returned in 300 min/avg/max buckets.
+    """
+    if history is None:
+        return 503, {'error': "History is disabled", 'status': 'offline'}
+
+    params = urllib.parse.parse_qs(query_string)
+
+    def param(name, default=None):
+        return params.get(name, [default])[0]
+
+    miner = param('miner')
+    metric = param('metric', 'hashRate')
+    mode = param('mode', 'minmax')
+    if not miner:
+        return 400, {'error': "miner is required"}
+    if metric not in METRICS:
+        return 400, {'error': f"Unknown metric {metric!r}, expected one of {', '.join(METRICS)}"}
+    if mode not in ('minmax', 'lttb'):
+        return 400, {'error': "mode must be minmax or lttb"}
+
+    try:
+        now = time.time() if now is None else now
+        end = float(param('to', now))
+        start = float(param('from', end - DEFAULT_RANGE))
+        points = int(param('points', DEFAULT_POINTS))
+    except ValueError:
+        return 400, {'error': "from, to and points must be numbers"}
+    if not (math.isfinite(start) and math.isfinite(end)) or end <= start:
+        return 400, {'error': "to must be after from"}
+    # LTTB always keeps the first and last sample, so it needs a bucket in between
+    points = max(3 if mode == 'lttb' else 1, min(points, MAX_POINTS))
+
+    series = history.query(miner, metric, start, end, points, now=now)
+    payload = {
+        'miner': miner,
+        'metric': metric,
+        'from': start,
+        'to': end,
+        'points': points,
+        'tier': series['tier'],
+        'mode': mode,
+    }
+
+    if mode == 'lttb':
+        timestamps, values = lttb(series['timestamp'], series['avg'], points)
+        payload['timestamps'] = _round(timestamps, 0)
+        payload['values'] = _round(values)
+        return 200, payload
+
+    timestamps, mins, avgs, maxs = bucket_series(
+        series['timestamp'], series['min'], series['avg'], series['max'], start, end, points)
+    payload['step'] = (end - start) / points
+    payload['timestamps'] = _round(timestamps, 0)
+    payload['min'] = _round(mins)
+    payload['avg'] = _round(avgs)
+    payload['max'] = _round(maxs)
+    return 200, payload
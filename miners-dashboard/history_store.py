@@ -0,0 +1,442 @@
+"""
+Embedded time-series store for miner telemetry.
+
+Samples are buffered in memory per miner and written in batches as compressed,
+column-oriented chunks. Each chunk is one record appended to a per-day segment
+file (<root>/<miner>/<YYYYMMDD>.seg). A record is a fixed header
+(payload length, first/last timestamp, row count) followed by a zlib payload
+holding one array of doubles per column, timestamps first. Only the headers
+are read to build the time-range index, so a query seeks straight to the
+chunks it needs.
+
+Usage:
+    python history_store.py import-csv ../.gemini/skills/asic-monitor/logs/miner_stats.csv --miner nerdqaxe
+    python history_store.py query --miner nerdqaxe --since 3600
+"""
+import argparse
+import bisect
+import csv
+import datetime
+import math
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+
+# Fleet metrics we keep for every miner, named as AxeOS reports them
+METRICS = ('hashRate', 'power', 'temp', 'vrTemp', 'fanSpeed', 'sharesAccepted', 'sharesRejected')
+
+# Columns whose AxeOS field is spelled differently (fan duty cycle in percent)
+FIELD_NAMES = {'fanSpeed': 'fanspeed'}
+
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history')
+
+# payload length, first timestamp, last timestamp, row count
+RECORD_HEADER = struct.Struct('<IddI')
+FORMAT_VERSION = 1
+
+NAN = float('nan')
+
+
+def _safe_name(miner_id):
+    return re.sub(r'[^A-Za-z0-9_.+-]', '_', miner_id)
+
+
+def _day_name(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime('%Y%m%d')
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+class _ChunkRef:
+    __slots__ = ('start', 'end', 'count', 'path', 'offset', 'length')
+
+    def __init__(self, start, end, count, path, offset, length):
+        self.start = start
+        self.end = end
+        self.count = count
+        self.path = path
+        self.offset = offset
+        self.length = length
+
+
+class HistoryStore:
+    """
+    Local time-series store for fleet metrics.
+
+    append() only touches memory. A miner's buffer is written as one chunk once
+    it holds `chunk_size` rows or has been filling for `flush_interval`
+    seconds, and everything is flushed by flush()/close(). Queries see buffered
+    rows too. Samples for a miner are expected to arrive in time order.
+    """
+
+    def __init__(self, root=HISTORY_DIR, columns=METRICS, chunk_size=3600,
+                 flush_interval=300.0, cache_chunks=64):
+        self.root = root
+        self.columns = tuple(columns)
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.cache_chunks = cache_chunks
+        self._buffers = {}   # miner -> list of rows (timestamp, *values)
+        self._buffer_started = {}  # miner -> monotonic time of the first buffered row
+        self._indexes = {}   # miner -> sorted list of _ChunkRef
+        self._decoded = OrderedDict()  # (path, offset) -> columns, LRU
+        self._repaired = set()  # segment paths whose tail was checked since start-up
+        self._lock = threading.RLock()
+        # Queries read and decompress chunks without holding self._lock
+        self._decoded_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    # --- Writing -------------------------------------------------------------
+
+    def append(self, miner_id, timestamp, values):
+        """Buffers one sample. `values` maps column name to a number (missing -> NaN)."""
+        row = (float(timestamp),) + tuple(to_float(values.get(c)) for c in self.columns)
+        with self._lock:
+            buffer = self._buffers.get(miner_id)
+            if buffer is None:
+                buffer = self._buffers[miner_id] = []
+                self._buffer_started[miner_id] = time.monotonic()
+            buffer.append(row)
+            if (len(buffer) >= self.chunk_size or
+                    time.monotonic() - self._buffer_started[miner_id] >= self.flush_interval):
+                self._flush_miner(miner_id)
+
+    def flush(self, miner_id=None):
+        with self._lock:
+            for miner in ([miner_id] if miner_id else list(self._buffers)):
+                self._flush_miner(miner)
+
+    def close(self):
+        self.flush()
+
+    def _flush_miner(self, miner_id):
+        # Caller must hold self._lock
+        rows = self._buffers.pop(miner_id, None)
+        self._buffer_started.pop(miner_id, None)
+        if not rows:
+            return
+        rows.sort(key=lambda r: r[0])
+
+        # A chunk never spans two day files, which keeps retention a file delete
+        start = 0
+        for i in range(1, len(rows) + 1):
+            if i == len(rows) or _day_name(rows[i][0]) != _day_name(rows[start][0]):
+                self._write_chunk(miner_id, rows[start:i])
+                start = i
+
+    def _write_chunk(self, miner_id, rows):
+        payload = bytearray()
+        for col in range(len(self.columns) + 1):
+            payload += array('d', (r[col] for r in rows)).tobytes()
+        payload = zlib.compress(bytes(payload), 6)
+
+        miner_dir = os.path.join(self.root, _safe_name(miner_id))
+        os.makedirs(miner_dir, exist_ok=True)
+        path = os.path.join(miner_dir, _day_name(rows[0][0]) + '.seg')
+        if path not in self._repaired:
+            self._repaired.add(path)
+            self._repair_tail(miner_id, path)
+
+        with open(path, 'ab') as f:
+            if f.tell() == 0:
+                f.write(self._segment_header())
+            offset = f.tell()
+            f.write(RECORD_HEADER.pack(len(payload), rows[0][0], rows[-1][0], len(rows)))
+            f.write(payload)
+
+        index = self._indexes.get(miner_id)
+        if index is not None:
+            ref = _ChunkRef(rows[0][0], rows[-1][0], len(rows), path, offset, len(payload))
+            bisect.insort(index, ref, key=lambda c: c.start)
+
+    def _repair_tail(self, miner_id, path):
+        """
+        Cuts a segment back to the end of its last complete record, so a write
+        torn by a crash mid-flush doesn't end up in front of the next records.
+        """
+        try:
+            f = open(path, 'r+b')
+        except FileNotFoundError:
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            header = f.readline()
+            if not header.endswith(b'\n'):
+                good = 0  # Torn before the segment header was complete
+            elif header != self._segment_header():
+                return  # Not ours to touch; _scan skips it
+            else:
+                good = previous = f.tell()
+                while True:
+                    raw = f.read(RECORD_HEADER.size)
+                    if len(raw) < RECORD_HEADER.size:
+                        break
+                    end = f.tell() + RECORD_HEADER.unpack(raw)[0]
+                    if end > size:
+                        break
+                    previous, good = good, end
+                    f.seek(end)
+                # A torn header can still give a length that fits; the payload won't inflate
+                if good > previous:
+                    f.seek(previous + RECORD_HEADER.size)
+                    try:
+                        zlib.decompress(f.read(good - f.tell()))
+                    except zlib.error:
+                        good = previous
+            if good == size:
+                return
+            print(f"Truncating {path}: {size - good} bytes after the last complete record", file=sys.stderr)
+            f.truncate(good)
+
+        index = self._indexes.get(miner_id)
+        if index is not None:
+            index[:] = [ref for ref in index if ref.path != path or ref.offset < good]
+        with self._decoded_lock:
+            for key in [key for key in self._decoded if key[0] == path and key[1] >= good]:
+                del self._decoded[key]
+
+    def _segment_header(self):
+        header = f"MHS{FORMAT_VERSION} " + ",".join(self.columns) + "\n"
+        return header.encode('ascii')
+
+    # --- Reading -------------------------------------------------------------
+
+    def miners(self):
+        with self._lock:
+            on_disk = set()
+            for name in os.listdir(self.root):
+                if os.path.isdir(os.path.join(self.root, name)):
+                    on_disk.add(name)
+            return sorted(on_disk | set(self._buffers))
+
+    def last_timestamp(self, miner_id):
+        """Timestamp of the newest stored or buffered sample, or None."""
+        with self._lock:
+            buffer = self._buffers.get(miner_id)
+            if buffer:
+                return max(row[0] for row in buffer)
+            index = self._index(miner_id)
+            return max((ref.end for ref in index), default=None)
+
+    def query(self, miner_id, start=None, end=None, columns=None):
+        """
+        Returns {'timestamp': [...], <column>: [...]} for samples with
+        start <= timestamp <= end, in time order. NaN marks missing values.
+        """
+        columns = tuple(columns or self.columns)
+        start = -math.inf if start is None else start
+        end = math.inf if end is None else end
+        positions = [self.columns.index(c) + 1 for c in columns]
+        result = {'timestamp': array('d')}
+        for c in columns:
+            result[c] = array('d')
+
+        # Only the index and buffer are read under the lock; a long range being
+        # decompressed mustn't hold up the poller's appends and flushes
+        with self._lock:
+            index = self._index(miner_id)
+            # Chunks are sorted by start; skip everything that starts after `end`
+            last = bisect.bisect_right(index, end, key=lambda c: c.start)
+            refs = [ref for ref in index[:last] if ref.end >= start]
+            buffered = sorted(self._buffers.get(miner_id, ()))
+
+        for ref in refs:
+            try:
+                data = self._load(ref)
+            except FileNotFoundError:
+                continue  # Removed by drop_before() since the index was read
+            ts = data[0]
+            lo = bisect.bisect_left(ts, start)
+            hi = bisect.bisect_right(ts, end)
+            if lo >= hi:
+                continue
+            result['timestamp'].extend(ts[lo:hi])
+            for c, pos in zip(columns, positions):
+                result[c].extend(data[pos][lo:hi])
+
+        for row in buffered:
+            if start <= row[0] <= end:
+                result['timestamp'].append(row[0])
+                for c, pos in zip(columns, positions):
+                    result[c].append(row[pos])
+
+        return result
+
+    def _index(self, miner_id):
+        # Caller must hold self._lock
+        index = self._indexes.get(miner_id)
+        if index is None:
+            index = self._scan(miner_id)
+            self._indexes[miner_id] = index
+        return index
+
+    def _scan(self, miner_id):
+        """Builds a miner's chunk index from record headers, skipping payloads."""
+        index = []
+        miner_dir = os.path.join(self.root, _safe_name(miner_id))
+        if not os.path.isdir(miner_dir):
+            return index
+
+        for name in sorted(os.listdir(miner_dir)):
+            if not name.endswith('.seg'):
+                continue
+            path = os.path.join(miner_dir, name)
+            with open(path, 'rb') as f:
+                header = f.readline().decode('ascii', errors='replace').split()
+                if len(header) != 2 or header[0] != f"MHS{FORMAT_VERSION}":
+                    print(f"Skipping {path}: unknown segment format", file=sys.stderr)
+                    continue
+                if tuple(header[1].split(',')) != self.columns:
+                    print(f"Skipping {path}: written with different columns", file=sys.stderr)
+                    continue
+                while True:
+                    offset = f.tell()
+                    raw = f.read(RECORD_HEADER.size)
+                    if len(raw) < RECORD_HEADER.size:
+                        break
+                    length, first, last, count = RECORD_HEADER.unpack(raw)
+                    # A torn write at the end of a file (crash mid-flush) is ignored
+                    if f.seek(length, os.SEEK_CUR) > os.path.getsize(path):
+                        break
+                    index.append(_ChunkRef(first, last, count, path, offset, length))
+
+        index.sort(key=lambda c: c.start)
+        return index
+
+    def _load(self, ref):
+        key = (ref.path, ref.offset)
+        with self._decoded_lock:
+            data = self._decoded.get(key)
+            if data is not None:
+                self._decoded.move_to_end(key)
+                return data
+
+        with open(ref.path, 'rb') as f:
+            f.seek(ref.offset + RECORD_HEADER.size)
+            payload = zlib.decompress(f.read(ref.length))
+
+        width = ref.count * 8
+        data = []
+        for col in range(len(self.columns) + 1):
+            values = array('d')
+            values.frombytes(payload[col * width:(col + 1) * width])
+            data.append(values)
+
+        with self._decoded_lock:
+            self._decoded[key] = data
+            while len(self._decoded) > self.cache_chunks:
+                self._decoded.popitem(last=False)
+        return data
+
+    # --- Retention -----------------------------------------------------------
+
+    def drop_before(self, cutoff):
+        """Deletes day segments that only hold samples older than `cutoff`."""
+        cutoff_day = _day_name(cutoff)
+        removed = 0
+        with self._lock:
+            for name in os.listdir(self.root):
+                miner_dir = os.path.join(self.root, name)
+                if not os.path.isdir(miner_dir):
+                    continue
+                for seg in os.listdir(miner_dir):
+                    # Segment names are UTC days, so a day before the cutoff's day is entirely older
+                    if seg.endswith('.seg') and seg[:-4] < cutoff_day:
+                        os.remove(os.path.join(miner_dir, seg))
+                        removed += 1
+
+            if removed:
+                for miner_id, index in self._indexes.items():
+                    self._indexes[miner_id] = [ref for ref in index if os.path.exists(ref.path)]
+                with self._decoded_lock:
+                    self._decoded.clear()
+        return removed
+
+    # --- Import --------------------------------------------------------------
+
+    def import_csv(self, path, miner_id):
+        """Imports a metrics CSV (see iter_csv_samples) and returns the sample count."""
+        count = 0
+        for timestamp, values in iter_csv_samples(path, self.columns):
+            self.append(miner_id, timestamp, values)
+            count += 1
+        self.flush(miner_id)
+        return count
+
+
+def iter_csv_samples(path, columns=METRICS):
+    """
+    Yields (timestamp, values) from a CSV with a `timestamp` column (ISO 8601 or
+    epoch seconds) and any metric columns, matched to `columns` case-insensitively,
+    e.g. the `timestamp,hashrate` log written by the asic-monitor skill.
+    """
+    names = {c.lower(): c for c in columns}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            raw_ts = row.get('timestamp', '')
+            try:
+                timestamp = float(raw_ts)
+            except ValueError:
+                timestamp = datetime.datetime.fromisoformat(raw_ts).timestamp()
+            values = {names[k.lower()]: v for k, v in row.items()
+                      if k and k.lower() in names}
+            yield timestamp, values
+
+
+class HistoryRecorder:
+    """Fleet poller listener that stores every online miner's metrics in `store`."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __call__(self, miners):
+        for miner_id, data in miners.items():
+            if data.get('status') == 'online':
+                values = {**data, **{column: data.get(field) for column, field in FIELD_NAMES.items()}}
+                self.store.append(miner_id, data.get('polledAt') or time.time(), values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Miner history store tools")
+    parser.add_argument("--root", default=HISTORY_DIR, help="History directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import-csv", help="Import a timestamp,metric... CSV")
+    imp.add_argument("path")
+    imp.add_argument("--miner", required=True, help="Miner id to store the samples under")
+
+    query = sub.add_parser("query", help="Print samples for one miner")
+    query.add_argument("--miner", required=True)
+    query.add_argument("--since", type=float, default=3600, help="Seconds of history to show")
+    query.add_argument("--columns", default="hashRate,power,temp")
+
+    args = parser.parse_args()
+    store = HistoryStore(args.root)
+
+    if args.command == "import-csv":
+        count = store.import_csv(args.path, args.miner)
+        print(f"Imported {count} samples for {args.miner} into {args.root}")
+    else:
+        columns = args.columns.split(',')
+        started = time.perf_counter()
+        result = store.query(args.miner, time.time() - args.since, None, columns)
+        elapsed = (time.perf_counter() - started) * 1000
+        for i, ts in enumerate(result['timestamp']):
+            stamp = datetime.datetime.fromtimestamp(ts).isoformat(timespec='seconds')
+            print(stamp, *(f"{result[c][i]:.2f}" for c in columns))
+        print(f"{len(result['timestamp'])} samples in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
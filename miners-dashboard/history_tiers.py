@@ -0,0 +1,290 @@
+"""
+Downsampled retention tiers on top of HistoryStore.
+
+    raw  every sample          kept 24 hours
+    1m   1-minute min/avg/max  kept 30 days
+    1h   1-hour min/avg/max    kept forever
+
+Rollups are built incrementally: each raw sample updates the open 1-minute
+bucket, and each finished 1-minute bucket updates the open 1-hour bucket, so
+nothing ever rescans stored history. After a restart the open buckets are
+rebuilt from the tail of the tier below.
+
+Usage:
+    python history_tiers.py import-csv ../.gemini/skills/asic-monitor/logs/miner_stats.csv --miner nerdqaxe
+"""
+import argparse
+import math
+import os
+import threading
+import time
+
+from history_store import HISTORY_DIR, METRICS, HistoryStore, iter_csv_samples, to_float
+
+NAN = float('nan')
+
+DAY = 24 * 3600
+
+
+class Tier:
+    def __init__(self, name, step, retention):
+        self.name = name
+        self.step = step            # Bucket width in seconds (0 = raw samples)
+        self.retention = retention  # Seconds kept, None = forever
+
+
+TIERS = (
+    Tier('raw', 0, DAY),
+    Tier('1m', 60, 30 * DAY),
+    Tier('1h', 3600, None),
+)
+
+# How often expired day segments are looked for
+PRUNE_INTERVAL = 3600
+
+
+def rollup_columns(metrics):
+    columns = ['count']
+    for m in metrics:
+        columns += [f'{m}_min', f'{m}_avg', f'{m}_max']
+    return tuple(columns)
+
+
+class _Bucket:
+    """Running min/avg/max for one miner in one open rollup bucket."""
+    __slots__ = ('start', 'count', 'mins', 'maxs', 'sums', 'weights')
+
+    def __init__(self, start, width):
+        self.start = start
+        self.count = 0
+        self.mins = [math.inf] * width
+        self.maxs = [-math.inf] * width
+        self.sums = [0.0] * width
+        self.weights = [0] * width
+
+    def add(self, count, mins, avgs, maxs):
+        """Folds in `count` samples summarised as min/avg/max (raw sample: all equal)."""
+        self.count += count
+        for i, avg in enumerate(avgs):
+            if avg != avg:  # NaN - metric missing from this sample
+                continue
+            if mins[i] < self.mins[i]:
+                self.mins[i] = mins[i]
+            if maxs[i] > self.maxs[i]:
+                self.maxs[i] = maxs[i]
+            self.sums[i] += avg * count
+            self.weights[i] += count
+
+    def row(self, metrics):
+        row = {'count': self.count}
+        for i, m in enumerate(metrics):
+            if self.weights[i]:
+                row[f'{m}_min'] = self.mins[i]
+                row[f'{m}_avg'] = self.sums[i] / self.weights[i]
+                row[f'{m}_max'] = self.maxs[i]
+        return row
+
+
+class TieredHistory:
+    """
+    Drop-in replacement for HistoryStore.append that also maintains the
+    rollup tiers, plus a query() that picks the right tier for a chart.
+    """
+
+    def __init__(self, root=HISTORY_DIR, metrics=METRICS, tiers=TIERS):
+        self.root = root
+        self.metrics = tuple(metrics)
+        self.tiers = tiers
+        self.raw = HistoryStore(os.path.join(root, tiers[0].name), self.metrics)
+        self.stores = {tiers[0].name: self.raw}
+        for tier in tiers[1:]:
+            # Rollups arrive at most once a minute, batch them harder than raw samples
+            self.stores[tier.name] = HistoryStore(os.path.join(root, tier.name),
+                                                  rollup_columns(self.metrics),
+                                                  chunk_size=1440, flush_interval=3600)
+        # The poller thread fills the open buckets while request threads query them
+        self._lock = threading.Lock()
+        self._open = {}        # (tier name, miner) -> _Bucket
+        self._resumed = set()  # miners whose open buckets were rebuilt after start-up
+        self._last_prune = 0.0
+
+    # --- Writing -------------------------------------------------------------
+
+    def append(self, miner_id, timestamp, values):
+        row = [to_float(values.get(m)) for m in self.metrics]
+        with self._lock:
+            if miner_id not in self._resumed:
+                self._resume(miner_id, timestamp)
+
+            self.raw.append(miner_id, timestamp, values)
+            self._feed(1, miner_id, timestamp, 1, row, row, row)
+
+        if timestamp - self._last_prune > PRUNE_INTERVAL:
+            self._last_prune = timestamp
+            self.prune(timestamp)
+
+    def _feed(self, level, miner_id, timestamp, count, mins, avgs, maxs):
+        """Adds a sample or finished bucket to the open bucket of tier `level`."""
+        if level >= len(self.tiers):
+            return
+        tier = self.tiers[level]
+        start = timestamp - timestamp % tier.step
+        key = (tier.name, miner_id)
+
+        bucket = self._open.get(key)
+        if bucket is not None and bucket.start != start:
+            self._emit(level, miner_id, bucket)
+            bucket = None
+        if bucket is None:
+            bucket = self._open[key] = _Bucket(start, len(self.metrics))
+        bucket.add(count, mins, avgs, maxs)
+
+    def _emit(self, level, miner_id, bucket, cascade=True):
+        tier = self.tiers[level]
+        row = bucket.row(self.metrics)
+        self.stores[tier.name].append(miner_id, bucket.start, row)
+        if cascade:
+            mins, avgs, maxs = _unpack(row, self.metrics)
+            self._feed(level + 1, miner_id, bucket.start, bucket.count, mins, avgs, maxs)
+
+    def _resume(self, miner_id, now):
+        """
+        Rebuilds the open buckets for a miner from the tier below, emitting any
+        bucket that was finished but not written before the last shutdown.
+        """
+        self._resumed.add(miner_id)
+        for level in range(1, len(self.tiers)):
+            tier = self.tiers[level]
+            lower = self.tiers[level - 1]
+            last = self.stores[tier.name].last_timestamp(miner_id)
+            since = -math.inf if last is None else last + tier.step
+            rows = self.stores[lower.name].query(miner_id, since, now)
+            if not len(rows['timestamp']):
+                continue
+
+            current = now - now % tier.step
+            bucket = None
+            for i, ts in enumerate(rows['timestamp']):
+                start = ts - ts % tier.step
+                if bucket is not None and bucket.start != start:
+                    # Written straight to the tier - the next level resumes from the store
+                    self._emit(level, miner_id, bucket, cascade=False)
+                    bucket = None
+                if bucket is None:
+                    bucket = _Bucket(start, len(self.metrics))
+                if lower.step == 0:
+                    sample = [rows[m][i] for m in self.metrics]
+                    bucket.add(1, sample, sample, sample)
+                else:
+                    mins, avgs, maxs = _unpack({c: rows[c][i] for c in rows}, self.metrics)
+                    bucket.add(int(rows['count'][i]), mins, avgs, maxs)
+
+            if bucket.start == current:
+                self._open[(tier.name, miner_id)] = bucket
+            else:
+                self._emit(level, miner_id, bucket, cascade=False)
+
+    def import_csv(self, path, miner_id):
+        """Replays a metrics CSV through every tier and returns the sample count."""
+        count = 0
+        for timestamp, values in iter_csv_samples(path, self.metrics):
+            self.append(miner_id, timestamp, values)
+            count += 1
+        self.flush()
+        return count
+
+    def flush(self):
+        for store in self.stores.values():
+            store.flush()
+
+    def close(self):
+        # Open buckets aren't written; _resume() rebuilds them from the raw tail
+        self.flush()
+
+    def prune(self, now=None):
+        now = time.time() if now is None else now
+        removed = 0
+        for tier in self.tiers:
+            if tier.retention is not None:
+                removed += self.stores[tier.name].drop_before(now - tier.retention)
+        return removed
+
+    # --- Reading -------------------------------------------------------------
+
+    def choose_tier(self, start, end, points=None, now=None):
+        """
+        Picks the coarsest tier whose buckets are still at least as fine as the
+        requested resolution and whose retention reaches back to `start`.
+        """
+        now = time.time() if now is None else now
+        wanted = (end - start) / points if points else 0
+        available = [t for t in self.tiers
+                     if t.retention is None or start >= now - t.retention]
+        if not available:
+            available = [self.tiers[-1]]
+        fine_enough = [t for t in available if t.step <= wanted]
+        return fine_enough[-1] if fine_enough else available[0]
+
+    def query(self, miner_id, metric, start, end, points=None, now=None):
+        """
+        Returns {'tier', 'step', 'timestamp', 'min', 'avg', 'max'} for one metric,
+        read from the tier chosen by choose_tier(). Raw samples report the same
+        array for min, avg and max.
+        """
+        tier = self.choose_tier(start, end, points, now)
+        store = self.stores[tier.name]
+        if tier.step == 0:
+            data = store.query(miner_id, start, end, [metric])
+            values = data[metric]
+            return {'tier': tier.name, 'step': tier.step, 'timestamp': data['timestamp'],
+                    'min': values, 'avg': values, 'max': values}
+
+        columns = [f'{metric}_min', f'{metric}_avg', f'{metric}_max']
+        data = store.query(miner_id, start, end, columns)
+
+        # Include the bucket still being filled so charts reach the present
+        with self._lock:
+            bucket = self._open.get((tier.name, miner_id))
+            row = bucket.row(self.metrics) if bucket is not None and start <= bucket.start <= end else {}
+        if columns[1] in row:
+            data['timestamp'].append(bucket.start)
+            for c in columns:
+                data[c].append(row[c])
+
+        return {'tier': tier.name, 'step': tier.step, 'timestamp': data['timestamp'],
+                'min': data[columns[0]], 'avg': data[columns[1]], 'max': data[columns[2]]}
+
+    def miners(self):
+        return self.raw.miners()
+
+
+def _unpack(row, metrics):
+    mins = [row.get(f'{m}_min', NAN) for m in metrics]
+    avgs = [row.get(f'{m}_avg', NAN) for m in metrics]
+    maxs = [row.get(f'{m}_max', NAN) for m in metrics]
+    return mins, avgs, maxs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiered miner history tools")
+    parser.add_argument("--root", default=HISTORY_DIR, help="History directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import-csv", help="Import a timestamp,metric... CSV into every tier")
+    imp.add_argument("path")
+    imp.add_argument("--miner", required=True, help="Miner id to store the samples under")
+
+    sub.add_parser("prune", help="Delete data older than each tier's retention")
+
+    args = parser.parse_args()
+    history = TieredHistory(args.root)
+
+    if args.command == "import-csv":
+        count = history.import_csv(args.path, args.miner)
+        print(f"Imported {count} samples for {args.miner} into {args.root}")
+    elif args.command == "prune":
+        print(f"Removed {history.prune()} expired day segments from {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,244 @@
-import urllib.request
+"""
+Snapshots the whole fleet's API into one JSONL file, and compares snapshots.
+
+`dump` fetches every endpoint of every miner concurrently (at most two
+requests in flight per board, as in probe_miner.py) and writes the result
+in a single buffered write: a header line, then one compact JSON line per
+miner. A name ending in .gz is gzip-compressed.
+
+`diff` compares two snapshots miner by miner; `drift` compares the boards
+of each model within one snapshot, to find settings that have wandered.
+Both skip the live telemetry fields (TELEMETRY) unless --all is given.
+
+Usage:
+    python inspect_miners.py dump                         # fleet-YYYYmmdd-HHMMSS.jsonl.gz
+    python inspect_miners.py dump -o before.jsonl -e /api/system/info
+    python inspect_miners.py diff before.jsonl fleet-20260101-120000.jsonl.gz
+    python inspect_miners.py drift fleet-20260101-120000.jsonl.gz
+"""
+import argparse
+import asyncio
+import gzip
 import json
-import socket
+import os
+import time
+
+from fleet_config import FLEET_FILE, load_fleet
+from fleet_poller import parse_miner_json
+from probe_miner import MINER_CONCURRENCY, TIMEOUT, Prober
+
+SNAPSHOT_VERSION = 1
 
-miners = [
-    {'name': 'nerdqaxe++', 'ip': '192.168.0.154'},
-    {'name': 'ak-bitaxe', 'ip': '192.168.0.157'}, 
-    {'name': 'ck-bitaxe', 'ip': '192.168.0.156'},
-]
+ENDPOINTS = ('/api/system/info', '/api/system/stats')
 
-output_file = "miner_dump.txt"
+# Fields that change from one poll to the next; not configuration
+TELEMETRY = frozenset((
+    'power', 'voltage', 'current', 'temp', 'temp2', 'vrTemp', 'hashRate', 'hashRate_1m',
+    'hashRate_10m', 'hashRate_1h', 'hashRate_1d', 'bestDiff', 'bestSessionDiff', 'freeHeap',
+    'coreVoltageActual', 'wifiRSSI', 'sharesAccepted', 'sharesRejected', 'uptimeSeconds',
+    'fanrpm', 'fanspeed', 'currentTimestamp', 'statistics', 'lastpingrtt', 'poolDifficulty',
+    'stratumDiff', 'foundBlocks', 'totalFoundBlocks', 'duration',
+))
 
-def log(msg):
-    with open(output_file, "a") as f:
-        f.write(msg + "\n")
+# Fields that are meant to differ between boards
+IDENTITY = frozenset(('hostname', 'macAddr', 'hostip', 'ipv4', 'ipv6', 'stratumUser',
+                      'fallbackStratumUser'))
 
-def get_json(ip, endpoint):
-    url = f"http://{ip}{endpoint}"
-    log(f"--- FETCHING {url} ---")
+# Drift lists miner ids for values held by at most this many boards, else a count
+MAX_LISTED = 5
+
+GZIP_MAGIC = b'\x1f\x8b'
+COMPRESS_LEVEL = 6
+
+
+async def fetch_fleet(miners, endpoints, timeout=TIMEOUT, per_miner=MINER_CONCURRENCY):
+    """One record per miner: {'id', 'name', 'ip', 'endpoints': {path: data}, 'errors': {path: msg}}."""
+    prober = Prober(timeout, per_miner)
     try:
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        with urllib.request.urlopen(req, timeout=3) as response:
-            data = response.read()
-            try:
-                j = json.loads(data)
-                log(json.dumps(j, indent=2))
-                return j
-            except:
-                log(f"Invalid JSON: {data}")
-    except Exception as e:
-        log(f"FAILED: {e}")
-    return None
-
-# Clear file
-open(output_file, "w").close()
-
-for miner in miners:
-    log(f"\n\n=== {miner['name']} ({miner['ip']}) ===")
-    
-    # Check info
-    info = get_json(miner['ip'], "/api/system/info")
-    
-    # Check stats
-    stats = get_json(miner['ip'], "/api/system/stats")
+        responses = await asyncio.gather(*(prober.get(m['ip'], endpoint)
+                                           for m in miners for endpoint in endpoints))
+    finally:
+        prober.close()
+
+    records = []
+    for i, miner in enumerate(miners):
+        record = {'id': miner['id'], 'name': miner['name'], 'ip': miner['ip'], 'endpoints': {}, 'errors': {}}
+        for endpoint, (status, body) in zip(endpoints, responses[i * len(endpoints):]):
+            if status is None:
+                record['errors'][endpoint] = body
+            elif status != 200:
+                record['errors'][endpoint] = f"HTTP {status}"
+            else:
+                try:
+                    record['endpoints'][endpoint] = parse_miner_json(body)
+                except ValueError:
+                    record['errors'][endpoint] = "Not JSON"
+        records.append(record)
+    return records
+
+
+def write_snapshot(path, records, endpoints):
+    """Header line + one line per miner, written (and compressed) in one go, atomically."""
+    header = {'snapshot': SNAPSHOT_VERSION, 'taken': int(time.time()), 'endpoints': list(endpoints),
+              'miners': len(records)}
+    lines = [json.dumps(header, separators=(',', ':'))]
+    lines += [json.dumps(r, separators=(',', ':'), sort_keys=True) for r in records]
+    data = ('\n'.join(lines) + '\n').encode('utf-8')
+    if path.endswith('.gz'):
+        data = gzip.compress(data, COMPRESS_LEVEL)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def read_snapshot(path):
+    """Returns (header, {miner id: record}); compressed or not, whatever the name."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data.startswith(GZIP_MAGIC):
+        data = gzip.decompress(data)
+    lines = data.splitlines()
+    header = json.loads(lines[0]) if lines else {}
+    if header.get('snapshot') != SNAPSHOT_VERSION:
+        raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} fleet snapshot")
+    records = {}
+    for line in lines[1:]:
+        if line:
+            record = json.loads(line)
+            records[record['id']] = record
+    return header, records
+
+
+def flatten(record, skip=frozenset()):
+    """{'<endpoint> <dotted.key>': value} for one miner, leaving out keys named in `skip`."""
+    flat = {}
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key not in skip:
+                    walk(f"{prefix}.{key}" if prefix else key, item)
+        else:
+            # Lists compare as a whole; json text makes them hashable for drift
+            flat[prefix] = json.dumps(value, separators=(',', ':')) if isinstance(value, list) else value
+
+    for endpoint, data in record['endpoints'].items():
+        if isinstance(data, dict):
+            for key, item in data.items():
+                if key not in skip:
+                    walk(f"{endpoint} {key}", item)
+        else:
+            walk(endpoint, data)
+    return flat
+
+
+def diff_snapshots(before, after, skip):
+    """Yields report lines for two {id: record} maps."""
+    for miner_id in sorted(before.keys() - after.keys()):
+        yield f"- {miner_id}: not in the second snapshot"
+    for miner_id in sorted(after.keys() - before.keys()):
+        yield f"+ {miner_id}: new in the second snapshot"
+    for miner_id in sorted(before.keys() & after.keys()):
+        a, b = before[miner_id], after[miner_id]
+        if a['endpoints'] == b['endpoints'] and a['errors'] == b['errors']:
+            continue
+        old, new = flatten(a, skip), flatten(b, skip)
+        changes = [f"    {key}: {old.get(key, '(missing)')!r} -> {new.get(key, '(missing)')!r}"
+                   for key in sorted(old.keys() | new.keys()) if old.get(key) != new.get(key)]
+        for endpoint in sorted(a['errors'].keys() | b['errors'].keys()):
+            if a['errors'].get(endpoint) != b['errors'].get(endpoint):
+                changes.append(f"    {endpoint} error: {a['errors'].get(endpoint)} -> {b['errors'].get(endpoint)}")
+        if changes:
+            yield f"~ {miner_id} ({b['name']})"
+            yield from changes
+
+
+def model_of(record):
+    info = record['endpoints'].get('/api/system/info')
+    if not isinstance(info, dict):
+        return None
+    return info.get('deviceModel') or info.get('boardVersion') or 'unknown'
+
+
+def drift(records, skip):
+    """Yields report lines for keys whose value differs between boards of the same model."""
+    by_model = {}
+    for record in records.values():
+        model = model_of(record)
+        if model is not None:
+            by_model.setdefault(model, []).append(record)
+
+    for model in sorted(by_model):
+        group = by_model[model]
+        if len(group) < 2:
+            continue
+        values = {}  # key -> {value: [miner ids]}
+        for record in group:
+            for key, value in flatten(record, skip).items():
+                values.setdefault(key, {}).setdefault(value, []).append(record['id'])
+        drifted = [(key, seen) for key, seen in sorted(values.items())
+                   if len(seen) > 1 or sum(map(len, seen.values())) < len(group)]
+        if not drifted:
+            continue
+        yield f"{model} ({len(group)} miners)"
+        for key, seen in drifted:
+            yield f"  {key}"
+            for value, ids in sorted(seen.items(), key=lambda item: -len(item[1])):
+                yield f"    {value!r}: {', '.join(sorted(ids)) if len(ids) <= MAX_LISTED else f'{len(ids)} miners'}"
+            missing = len(group) - sum(map(len, seen.values()))
+            if missing:
+                yield f"    (missing): {missing} miners"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Snapshot the fleet's API and compare snapshots")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    dump = commands.add_parser('dump', help="Fetch every miner and write a JSONL snapshot")
+    dump.add_argument('-o', '--output', help="Snapshot file; .gz compresses it "
+                                             "(default: fleet-<timestamp>.jsonl.gz)")
+    dump.add_argument('-e', '--endpoint', action='append',
+                      help=f"Endpoint to fetch, repeatable (default: {' '.join(ENDPOINTS)})")
+    dump.add_argument('--fleet', default=FLEET_FILE, help="Fleet inventory written by discover.py")
+    dump.add_argument('--timeout', type=float, default=TIMEOUT)
+    dump.add_argument('--per-miner', type=int, default=MINER_CONCURRENCY,
+                      help="Requests in flight per miner")
+
+    diff = commands.add_parser('diff', help="What changed between two snapshots")
+    diff.add_argument('before')
+    diff.add_argument('after')
+    diff.add_argument('--all', action='store_true', help="Include live telemetry fields")
+
+    drift_cmd = commands.add_parser('drift', help="Settings that differ between boards of the same model")
+    drift_cmd.add_argument('snapshot')
+    drift_cmd.add_argument('--all', action='store_true', help="Include live telemetry and identity fields")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == 'dump':
+        miners = load_fleet(args.fleet)
+        endpoints = tuple(args.endpoint or ENDPOINTS)
+        output = args.output or time.strftime('fleet-%Y%m%d-%H%M%S.jsonl.gz')
+        started = time.monotonic()
+        records = asyncio.run(fetch_fleet(miners, endpoints, args.timeout, args.per_miner))
+        size = write_snapshot(output, records, endpoints)
+        failed = sum(1 for r in records if r['errors'])
+        print(f"Wrote {output}: {len(records)} miners, {size} bytes, {failed} with errors, "
+              f"{time.monotonic() - started:.1f}s")
+    elif args.command == 'diff':
+        _, before = read_snapshot(args.before)
+        _, after = read_snapshot(args.after)
+        lines = list(diff_snapshots(before, after, frozenset() if args.all else TELEMETRY))
+        print('\n'.join(lines) if lines else "No differences")
+    else:
+        _, records = read_snapshot(args.snapshot)
+        lines = list(drift(records, frozenset() if args.all else TELEMETRY | IDENTITY))
+        print('\n'.join(lines) if lines else "No drift")
+
+
+if __name__ == "__main__":
+    main()
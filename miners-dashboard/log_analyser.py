@@ -0,0 +1,325 @@
+"""
+Per-miner availability, latency and failure windows from dashboard.log.
+
+server.py logs every proxied miner request ("Proxying:" at DEBUG, then
+"-> Success", "-> Failed", "-> Timeout", ...) and every failed poll. This
+reads the log in one pass: a single regex runs over the memory-mapped file,
+so nothing is copied or split into lines, and a multi-GB log costs no more
+memory than a small one. The byte offset reached and the aggregated timelines are kept in a
+checkpoint next to the log, so the next run only parses what was appended
+since. If the log has rotated in between, the rest of the previous file is
+read from dashboard.log.1.gz first.
+
+Successes are sampled in the log (1 in --log-sample) and failures never
+are, so availability is measured in time buckets: a bucket with any
+success counts as up, one with only failures as down. Lines from the old
+console-only format have no timestamp; they are counted but fall outside
+the timelines.
+
+Usage:
+    python log_analyser.py                         # dashboard.log, 5-minute buckets
+    python log_analyser.py --json timelines.json   # also write the timelines
+    python log_analyser.py --rebuild --bucket 60   # forget the checkpoint
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import re
+import time
+
+from dashboard_log import LOG_FILE
+from fleet_config import FLEET_FILE, load_fleet
+
+CHECKPOINT_SUFFIX = '.index.json'
+CHECKPOINT_VERSION = 1
+
+BUCKET_SECONDS = 300
+
+# Bytes at the start of the log that identify it, to notice rotation
+HEAD_BYTES = 256
+
+# Failure windows listed per miner in the report
+MAX_WINDOWS = 5
+
+# Per-bucket counters: [ok, failed, timeout, offline, timed successes, latency sum ms, latency max ms]
+OK, FAILED, TIMEOUT, OFFLINE, LAT_N, LAT_SUM, LAT_MAX = range(7)
+
+EVENTS = {
+    b'Success: ': OK,
+    b'Relayed: ': OK,
+    b'Failed ': FAILED,
+    b'Relay aborted ': FAILED,
+    b'Error ': FAILED,
+    b'Timeout ': TIMEOUT,
+    b'Offline ': OFFLINE,
+}
+
+# One alternation for every proxy and poller event. Threaded-era lines may
+# hold several events back to back ("...statsProxying: http://..."), so
+# nothing is anchored to the start of a line.
+EVENT = re.compile(
+    rb'-> (?:(?P<kind>Success: |Relayed: |Failed |Relay aborted |Error |Timeout |Offline )'
+    rb'http://(?P<host>[^/\s]+)/[^\s\[:]*?(?=[\s\[:]|Proxying: |$)'
+    rb'(?: \[len=\d+\](?: \[(?P<ms>\d+)ms\])?'
+    rb'|: (?P<error>.*?)(?=  -> |Proxying: |\n|$))?'
+    rb'|Poll failed [^\n(]*\((?P<poll_host>[^)\s]+)\): (?P<poll_error>.*?)(?=  -> |\n|$))'
+)
+
+# FILE_FORMAT's asctime: '2026-10-18 12:00:00,123'
+TIMESTAMP = re.compile(rb'(\d{4}-\d\d-\d\d \d\d:\d\d):(\d\d),\d{3} ')
+
+ERROR_CHARS = 80
+
+
+def checkpoint_path(log_path):
+    return log_path + CHECKPOINT_SUFFIX
+
+
+def empty_state(bucket):
+    return {'version': CHECKPOINT_VERSION, 'bucket': bucket, 'inode': None, 'offset': 0,
+            'head': None, 'head_len': 0, 'miners': {}}
+
+
+def load_state(path, bucket):
+    """The saved checkpoint, or a fresh one if it's missing or was built with another bucket size."""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return empty_state(bucket)
+    if state.get('version') != CHECKPOINT_VERSION or state.get('bucket') != bucket:
+        return empty_state(bucket)
+    return state
+
+
+def save_state(state, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _head(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+class _Clock:
+    """asctime -> epoch seconds, converting each distinct minute once."""
+
+    def __init__(self):
+        self._minutes = {}
+
+    def __call__(self, minute, seconds):
+        epoch = self._minutes.get(minute)
+        if epoch is None:
+            epoch = self._minutes[minute] = int(time.mktime(time.strptime(minute.decode(), '%Y-%m-%d %H:%M')))
+        return epoch + int(seconds)
+
+
+def scan(data, start, end, state, clock):
+    """
+    Folds the events in data[start:end] into state['miners']. `data` is
+    bytes or an mmap; `end` should fall on a line boundary.
+    """
+    bucket_size = state['bucket']
+    miners = state['miners']
+    line_start = line_end = -1
+    bucket_key = None
+
+    for match in EVENT.finditer(data, start, end):
+        pos = match.start()
+        if pos >= line_end:
+            # First event on this line: find its timestamp, if it has one
+            line_start = data.rfind(b'\n', 0, pos) + 1
+            line_end = data.find(b'\n', pos, end)
+            if line_end == -1:
+                line_end = end
+            stamp = TIMESTAMP.match(data, line_start)
+            bucket_key = str(clock(*stamp.groups()) // bucket_size * bucket_size) if stamp else None
+
+        kind = match.group('kind')
+        if kind is None:
+            host, kind, error = match.group('poll_host'), FAILED, match.group('poll_error')
+        else:
+            host, kind, error = match.group('host'), EVENTS[kind], match.group('error')
+        host = host.decode('latin-1')
+        miner = miners.get(host)
+        if miner is None:
+            miner = miners[host] = {'buckets': {}, 'untimed': [0] * 7, 'errors': {}}
+        if bucket_key is None:
+            counters = miner['untimed']
+        else:
+            counters = miner['buckets'].get(bucket_key)
+            if counters is None:
+                counters = miner['buckets'][bucket_key] = [0] * 7
+
+        counters[kind] += 1
+        ms = match.group('ms')
+        if ms is not None:
+            ms = int(ms)
+            counters[LAT_N] += 1
+            counters[LAT_SUM] += ms
+            if ms > counters[LAT_MAX]:
+                counters[LAT_MAX] = ms
+        if kind == TIMEOUT:
+            miner['errors']['timed out'] = miner['errors'].get('timed out', 0) + 1
+        elif kind != OK:
+            error = (error or b'').strip()[:ERROR_CHARS].decode('utf-8', errors='replace') or 'unknown'
+            miner['errors'][error] = miner['errors'].get(error, 0) + 1
+
+
+def _complete(data, start, size):
+    """End of the last complete line; the server may be halfway through writing one."""
+    return data.rfind(b'\n', start, size) + 1 or start
+
+
+def update(log_path, state):
+    """
+    Scans what's new in log_path since the checkpoint in `state`. Returns
+    the number of bytes parsed.
+    """
+    clock = _Clock()
+    parsed = 0
+    with open(log_path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        head = f.read(HEAD_BYTES)
+        head_len = state['head_len']
+        rotated = state['head'] is not None and (
+            st.st_ino != state['inode'] or st.st_size < state['offset']
+            or _head(head[:head_len]) != state['head'])
+
+        if rotated:
+            # The tail we hadn't read yet went into the newest rotated file
+            previous = log_path + '.1.gz'
+            try:
+                with gzip.open(previous, 'rb') as g:
+                    old = g.read()
+            except OSError:
+                old = b''
+            if _head(old[:head_len]) == state['head'] and len(old) > state['offset']:
+                end = _complete(old, state['offset'], len(old))
+                scan(old, state['offset'], end, state, clock)
+                parsed += end - state['offset']
+            state['offset'] = 0
+
+        state['head'] = _head(head) if head else None
+        state['head_len'] = len(head)
+        state['inode'] = st.st_ino
+
+        if st.st_size > state['offset']:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                end = _complete(data, state['offset'], st.st_size)
+                scan(data, state['offset'], end, state, clock)
+                parsed += end - state['offset']
+                state['offset'] = end
+    return parsed
+
+
+def summarise(miner, bucket_size):
+    """Totals, availability and failure windows for one miner's timeline."""
+    totals = list(miner['untimed'])
+    up = down = 0
+    windows = []
+    window = None
+    for key in sorted(miner['buckets'], key=int):
+        counters = miner['buckets'][key]
+        for i in (OK, FAILED, TIMEOUT, OFFLINE, LAT_N, LAT_SUM):
+            totals[i] += counters[i]
+        totals[LAT_MAX] = max(totals[LAT_MAX], counters[LAT_MAX])
+
+        start = int(key)
+        failures = counters[FAILED] + counters[TIMEOUT] + counters[OFFLINE]
+        if counters[OK]:
+            up += 1
+            window = None
+        elif failures:
+            down += 1
+            # Consecutive down buckets make one window; a quiet gap ends it
+            if window is not None and window['end'] == start:
+                window['end'] = start + bucket_size
+                window['failures'] += failures
+            else:
+                window = {'start': start, 'end': start + bucket_size, 'failures': failures}
+                windows.append(window)
+    return {
+        'ok': totals[OK], 'failed': totals[FAILED], 'timeouts': totals[TIMEOUT],
+        'offline': totals[OFFLINE],
+        'availability': up / (up + down) if up + down else None,
+        'latency_avg_ms': totals[LAT_SUM] / totals[LAT_N] if totals[LAT_N] else None,
+        'latency_max_ms': totals[LAT_MAX] if totals[LAT_N] else None,
+        'windows': windows,
+        'errors': dict(sorted(miner['errors'].items(), key=lambda item: -item[1])),
+    }
+
+
+def _when(epoch):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(epoch))
+
+
+def _duration(seconds):
+    return f"{seconds // 60} min" if seconds >= 120 else f"{seconds}s"
+
+
+def report(state, names):
+    lines = []
+    for host in sorted(state['miners']):
+        s = summarise(state['miners'][host], state['bucket'])
+        label = f"{host} ({names[host]})" if host in names else host
+        availability = f"{s['availability']:.1%}" if s['availability'] is not None else "n/a"
+        lines.append(f"{label}: up {availability}  ok={s['ok']} failed={s['failed']} "
+                     f"timeouts={s['timeouts']} offline={s['offline']}")
+        if s['latency_avg_ms'] is not None:
+            lines.append(f"    latency avg {s['latency_avg_ms']:.0f}ms, max {s['latency_max_ms']}ms")
+        for window in s['windows'][-MAX_WINDOWS:]:
+            lines.append(f"    down {_when(window['start'])} for {_duration(window['end'] - window['start'])} "
+                         f"({window['failures']} failures)")
+        for error, count in list(s['errors'].items())[:3]:
+            lines.append(f"    {count} x {error}")
+    return lines
+
+
+def timelines(state):
+    """The --json document: per-miner summary plus the raw buckets."""
+    fields = ('ok', 'failed', 'timeouts', 'offline', 'latency_n', 'latency_sum_ms', 'latency_max_ms')
+    return {
+        'bucket': state['bucket'],
+        'fields': fields,
+        'miners': {host: {**summarise(miner, state['bucket']),
+                          'buckets': {key: miner['buckets'][key] for key in sorted(miner['buckets'], key=int)}}
+                   for host, miner in state['miners'].items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-miner availability, latency and failures from dashboard.log")
+    parser.add_argument("--log-file", default=LOG_FILE)
+    parser.add_argument("--checkpoint", help=f"Offset and timelines kept between runs "
+                                             f"(default: <log-file>{CHECKPOINT_SUFFIX})")
+    parser.add_argument("--bucket", type=int, default=BUCKET_SECONDS, help="Timeline resolution in seconds")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the checkpoint and reparse the whole log")
+    parser.add_argument("--fleet", default=FLEET_FILE, help="Fleet inventory, for miner names")
+    parser.add_argument("--json", help="Also write the per-miner timelines here")
+    args = parser.parse_args()
+
+    state_path = args.checkpoint or checkpoint_path(args.log_file)
+    state = empty_state(args.bucket) if args.rebuild else load_state(state_path, args.bucket)
+    started = time.monotonic()
+    parsed = update(args.log_file, state)
+    elapsed = time.monotonic() - started
+    save_state(state, state_path)
+
+    names = {m['ip']: m['name'] for m in load_fleet(args.fleet)}
+    print('\n'.join(report(state, names)) or "No proxy events in the log")
+    print(f"Parsed {parsed} new bytes in {elapsed:.2f}s (checkpoint at {state['offset']})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(timelines(state), f, indent=2)
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
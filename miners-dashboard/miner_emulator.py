@@ -0,0 +1,341 @@
+"""
+Fake AxeOS miners for developing and benchmarking without the real boards.
+
+Every emulated miner listens on its own port on 127.0.0.1 and answers
+/api/system/info and /api/system/stats with payloads shaped like the real
+firmware's (see the previews in dashboard.log): Bitaxe builds send
+tab-indented cJSON, NerdQAxe builds send compact JSON and gzip their stats.
+/ and /main.js stand in for the web UI, a few hundred KB served gzipped
+with an ETag like the firmware's flash filesystem.
+Latency, jitter, stray binary bytes after the JSON and outages are all
+configurable, and one process can run hundreds of miners.
+
+Usage:
+    python miner_emulator.py --count 3
+    python miner_emulator.py --count 200 --latency 150 --jitter 100 --junk 0.1 \\
+        --down 0.05 --fleet-out /tmp/fleet.json
+    python server.py --fleet /tmp/fleet.json
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import math
+import random
+import time
+
+from async_http import MAX_HEADER_BYTES
+from fleet_config import save_fleet
+
+BASE_PORT = 9100
+
+# How long to keep a connection that doesn't answer during a 'hang' outage
+HANG_SECONDS = 30
+
+# Size of the emulated web UI bundle before compression
+WEB_BUNDLE_BYTES = 512 * 1024
+
+REASONS = {200: 'OK', 304: 'Not Modified', 404: 'Not Found'}
+
+# What the ESP32's httpd appends after the JSON now and then
+JUNK = (b'\x00', b'\x00\x00\x1f', b'\xff\xfe', b'\x1f')
+
+MODELS = {
+    'bitaxe': {
+        'deviceModel': 'Gamma', 'ASICModel': 'BM1370', 'asicCount': 1, 'smallCoreCount': 2040,
+        'frequency': 525, 'coreVoltage': 1150, 'boardVersion': '601', 'version': 'v2.5.0',
+        'hashRate': 1070.0, 'power': 14.0, 'pretty': True, 'gzip_stats': False,
+    },
+    'nerdqaxe': {
+        'deviceModel': 'NerdQAxe++', 'ASICModel': 'BM1370', 'asicCount': 4, 'smallCoreCount': 2040,
+        'frequency': 600, 'coreVoltage': 1150, 'boardVersion': '501', 'version': 'v1.0.29',
+        'hashRate': 4900.0, 'power': 78.0, 'pretty': False, 'gzip_stats': True,
+    },
+}
+
+
+class Behaviour:
+    """Knobs shared by every emulated miner."""
+
+    def __init__(self, latency=0.1, jitter=0.05, junk=0.0, gzip_stats=None, down=0.0,
+                 down_period=60.0, outage='reset', max_conns=0, seed=None):
+        self.latency = latency          # Seconds before answering
+        self.jitter = jitter            # +/- uniform seconds on top of latency
+        self.junk = junk                # Probability of stray bytes after the JSON
+        self.gzip_stats = gzip_stats    # None = per model, True/False = force
+        self.down = down                # Fraction of miners offline at any time
+        self.down_period = down_period  # Seconds before a new set of miners goes down
+        self.outage = outage            # 'reset' closes connections, 'hang' never answers
+        self.max_conns = max_conns      # Open sockets per miner before refusing (ESP32 httpd ~7)
+        self.random = random.Random(seed)
+
+
+class EmulatedMiner:
+    def __init__(self, index, port, model, behaviour):
+        self.index = index
+        self.port = port
+        self.model = MODELS[model]
+        self.behaviour = behaviour
+        self.hostname = f"{model}-{index:03d}"
+        self.mac = f"02:00:00:00:{index >> 8:02X}:{index & 0xff:02X}"
+        self.started = time.time()
+        self.shares = 0
+        self.best_diff = 0
+        self.open_conns = 0
+        self.requests = 0
+        # Spread the phases so the fleet doesn't move in lockstep
+        self.phase = behaviour.random.random() * 2 * math.pi
+        self.history = []
+
+    def is_down(self, now):
+        b = self.behaviour
+        if b.down <= 0:
+            return False
+        # A fresh random set of miners every down_period, the same for the whole period
+        epoch = int(now // b.down_period)
+        return random.Random(epoch * 1_000_003 + self.index).random() < b.down
+
+    def info(self, now):
+        m = self.model
+        wave = math.sin(now / 60 + self.phase)
+        hashrate = m['hashRate'] * (1 + 0.04 * wave) * (0.98 + 0.04 * self.behaviour.random.random())
+        power = m['power'] * (1 + 0.02 * wave)
+        temp = 52 + 6 * wave
+        self.shares += self.behaviour.random.randint(0, 2)
+        self.best_diff = max(self.best_diff, int(self.behaviour.random.paretovariate(1.2) * 1e6))
+        data = {
+            'power': round(power, 7),
+            'voltage': 5367.1875,
+            'current': round(power / 5.367 * 1000, 4),
+            'temp': round(temp, 3),
+            'temp2': -1,
+            'vrTemp': round(temp + 8, 1),
+            'maxPower': 25 if m['asicCount'] == 1 else 100,
+            'nominalVoltage': 5,
+            'hashRate': round(hashrate, 6),
+            'expectedHashrate': round(m['frequency'] * m['smallCoreCount'] * m['asicCount'] / 1000, 3),
+            'bestDiff': self.best_diff,
+            'bestSessionDiff': self.best_diff,
+            'stratumDiff': 4096,
+            'isUsingFallbackStratum': 0,
+            'freeHeap': 142000 + self.behaviour.random.randint(0, 4000),
+            'coreVoltage': m['coreVoltage'],
+            'coreVoltageActual': m['coreVoltage'] - 12,
+            'frequency': m['frequency'],
+            'ssid': 'miners',
+            'macAddr': self.mac,
+            'hostname': self.hostname,
+            'wifiStatus': 'Connected!',
+            'wifiRSSI': -55,
+            'sharesAccepted': self.shares,
+            'sharesRejected': self.shares // 400,
+            'uptimeSeconds': int(now - self.started),
+            'asicCount': m['asicCount'],
+            'smallCoreCount': m['smallCoreCount'],
+            'ASICModel': m['ASICModel'],
+            'stratumURL': 'public-pool.io',
+            'stratumPort': 21496,
+            'stratumUser': 'bc1qexampleexampleexampleexampleexample.' + self.hostname,
+            'fallbackStratumURL': 'solo.ckpool.org',
+            'fallbackStratumPort': 3333,
+            'version': m['version'],
+            'idfVersion': 'v5.4.1',
+            'boardVersion': m['boardVersion'],
+            'runningPartition': 'factory',
+            'flipscreen': 1,
+            'overheat_mode': 0,
+            'invertscreen': 0,
+            'autofanspeed': 1,
+            'fanspeed': 55,
+            'fanrpm': 4100 + int(300 * wave),
+        }
+        if not m['pretty']:
+            # NerdQAxe puts the identity fields first
+            head = {'asicCount': m['asicCount'], 'smallCoreCount': m['smallCoreCount'],
+                    'deviceModel': m['deviceModel'], 'hostip': f"127.0.0.1:{self.port}",
+                    'macAddr': self.mac}
+            data = {**head, **data}
+        return data
+
+    def stats(self, now):
+        # Rolling hashrate/temp/power history like the firmware's statistics endpoint
+        if not self.history or now - self.history[-1][-1] >= 5:
+            info = self.info(now)
+            self.history.append([round(info['hashRate'], 2), info['temp'], round(info['power'], 2),
+                                 round(now, 3)])
+            del self.history[:-40]
+        return {'currentTimestamp': int(now * 1000),
+                'labels': ['hashrate', 'asicTemp', 'power', 'timestamp'],
+                'statistics': self.history}
+
+    def encode(self, data):
+        if self.model['pretty']:
+            return json.dumps(data, indent='\t', separators=(',', ':\t')).encode()
+        return json.dumps(data, separators=(',', ':')).encode()
+
+    def respond(self, path, headers=None):
+        """Returns (status, headers, body) for one request path."""
+        now = time.time()
+        if path in ('/', '/index.html', '/main.js'):
+            return web_ui(path, headers or {})
+        if path == '/api/system/info':
+            body = self.encode(self.info(now))
+        elif path == '/api/system/stats':
+            body = self.encode(self.stats(now))
+            use_gzip = self.model['gzip_stats'] if self.behaviour.gzip_stats is None else self.behaviour.gzip_stats
+            if use_gzip:
+                # The NerdQAxe firmware sends its stats gzipped whatever the client says
+                return 200, {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}, gzip.compress(body)
+        else:
+            return 404, {'Content-Type': 'text/html'}, b'<html><body>Not found</body></html>'
+
+        if self.behaviour.junk and self.behaviour.random.random() < self.behaviour.junk:
+            body += self.behaviour.random.choice(JUNK)
+        return 200, {'Content-Type': 'application/json'}, body
+
+    async def handle(self, reader, writer):
+        b = self.behaviour
+        if b.max_conns and self.open_conns >= b.max_conns:
+            writer.close()
+            return
+        self.open_conns += 1
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+
+                if self.is_down(time.time()):
+                    if b.outage == 'hang':
+                        await asyncio.sleep(HANG_SECONDS)
+                    return
+
+                lines = head.decode('latin-1').split('\r\n')
+                parts = lines[0].split(' ')
+                path = parts[1].split('?', 1)[0] if len(parts) > 1 else '/'
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip().lower()
+                keep_alive = headers.get('connection') != 'close'
+
+                delay = b.latency + b.random.uniform(-b.jitter, b.jitter)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                self.requests += 1
+                status, resp_headers, body = self.respond(path, headers)
+                out = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+                out += [f"{k}: {v}" for k, v in resp_headers.items()]
+                out.append(f"Content-Length: {len(body)}")
+                out.append("Connection: keep-alive" if keep_alive else "Connection: close")
+                writer.write(("\r\n".join(out) + "\r\n\r\n").encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            self.open_conns -= 1
+            writer.close()
+
+
+_web_ui = None
+
+
+def web_ui(path, headers):
+    """The fake web UI: a small index page and one large gzipped bundle."""
+    global _web_ui
+    if _web_ui is None:
+        lines = []
+        i = 0
+        while sum(map(len, lines)) < WEB_BUNDLE_BYTES:
+            lines.append(f"function m{i}(t){{return fetch('/api/system/info').then(r=>r.json())"
+                         f".then(d=>d.hashRate*{i % 97}+t.v{i % 13})}}\n")
+            i += 1
+        bundle = ''.join(lines).encode('utf-8')
+        index = b'<!doctype html><html><head><script src="/main.js"></script></head><body></body></html>'
+        _web_ui = (index, gzip.compress(bundle, 9), '"%s"' % hashlib.sha1(bundle).hexdigest()[:16])
+
+    index, bundle, etag = _web_ui
+    if path != '/main.js':
+        return 200, {'Content-Type': 'text/html'}, index
+    if headers.get('if-none-match') == etag:
+        return 304, {'ETag': etag}, b''
+    return 200, {'Content-Type': 'application/javascript', 'Content-Encoding': 'gzip',
+                 'ETag': etag, 'Cache-Control': 'max-age=2592000'}, bundle
+
+
+async def run(miners, host='127.0.0.1'):
+    servers = []
+    for miner in miners:
+        servers.append(await asyncio.start_server(miner.handle, host, miner.port,
+                                                  limit=MAX_HEADER_BYTES))
+    try:
+        await asyncio.gather(*(s.serve_forever() for s in servers))
+    finally:
+        for s in servers:
+            s.close()
+
+
+def build_fleet(count, base_port=BASE_PORT, nerdqaxe_every=3, behaviour=None):
+    """Every `nerdqaxe_every`-th miner is a 4-chip NerdQAxe, the rest are Bitaxes."""
+    behaviour = behaviour or Behaviour()
+    miners = []
+    for i in range(count):
+        model = 'nerdqaxe' if nerdqaxe_every and i % nerdqaxe_every == 0 else 'bitaxe'
+        miners.append(EmulatedMiner(i, base_port + i, model, behaviour))
+    return miners
+
+
+def fleet_entries(miners, host='127.0.0.1'):
+    """The fleet.json entries for server.py --fleet."""
+    return [{'name': m.hostname, 'ip': f"{host}:{m.port}", 'id': m.hostname,
+             'chips': m.model['asicCount'], 'useStats': m.model['gzip_stats'],
+             'deviceModel': m.model['deviceModel'], 'asicModel': m.model['ASICModel'],
+             'version': m.model['version'], 'mac': m.mac} for m in miners]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate AxeOS miners on local ports")
+    parser.add_argument("--count", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=BASE_PORT, help="First miner's port")
+    parser.add_argument("--latency", type=float, default=100, help="Response delay in ms")
+    parser.add_argument("--jitter", type=float, default=50, help="Random +/- ms added to the delay")
+    parser.add_argument("--junk", type=float, default=0.0,
+                        help="Probability of stray binary bytes after the JSON (0-1)")
+    parser.add_argument("--gzip", choices=("model", "always", "never"), default="model",
+                        help="Gzip /api/system/stats like the NerdQAxe firmware does")
+    parser.add_argument("--down", type=float, default=0.0, help="Fraction of miners offline (0-1)")
+    parser.add_argument("--down-period", type=float, default=60.0,
+                        help="Seconds before a different set of miners goes offline")
+    parser.add_argument("--outage", choices=("reset", "hang"), default="reset",
+                        help="Offline miners drop the connection or never answer")
+    parser.add_argument("--max-conns", type=int, default=0,
+                        help="Refuse connections past this many per miner (0 = unlimited)")
+    parser.add_argument("--nerdqaxe-every", type=int, default=3,
+                        help="Make every Nth miner a NerdQAxe (0 = all Bitaxe)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--fleet-out", help="Write a fleet.json for server.py --fleet")
+    args = parser.parse_args()
+
+    behaviour = Behaviour(args.latency / 1000, args.jitter / 1000, args.junk,
+                          {'model': None, 'always': True, 'never': False}[args.gzip],
+                          args.down, args.down_period, args.outage, args.max_conns, args.seed)
+    miners = build_fleet(args.count, args.base_port, args.nerdqaxe_every, behaviour)
+    if args.fleet_out:
+        save_fleet(fleet_entries(miners), args.fleet_out)
+        print(f"Wrote {len(miners)} miners to {args.fleet_out}")
+
+    print(f"Emulating {len(miners)} miners on 127.0.0.1:{args.base_port}-{args.base_port + len(miners) - 1}")
+    try:
+        asyncio.run(run(miners))
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,249 @@
-import urllib.request
-import urllib.error
+"""
+Maps the HTTP API of every firmware in the fleet and writes capabilities.json.
 
-# NerdQaxe++ IP
-MINER_IP = "192.168.0.154"
-# Using the proxy port
-PROXY_URL = "http://localhost:8000/proxy/" + MINER_IP
+Each miner's /api/system/info says which firmware it runs (device model +
+version). For every firmware not already in capabilities.json, the web UI's
+index page and scripts are fetched and scanned for the API paths they use,
+then those paths and COMMON_ENDPOINTS are probed. Everything runs
+concurrently, spread across all the miners on that firmware and capped at
+MINER_CONCURRENCY requests per board. A firmware that has been probed once
+is never probed again (--refresh forces it), so rerunning after adding
+boards costs one info request per miner.
 
-COMMON_ENDPOINTS = [
+server.py and the dashboard read the map to turn on useStats for boards
+whose firmware serves /api/system/stats.
+
+Usage:
+    python probe_miner.py                        # every miner in fleet.json
+    python probe_miner.py 192.168.0.154          # just these addresses
+    python probe_miner.py --refresh --show-keys
+"""
+import argparse
+import asyncio
+import re
+import time
+
+from async_http import HTTPResponseError
+from capabilities import CAPABILITIES_FILE, firmware_key, load_capabilities, save_capabilities
+from content_coding import DecodingError
+from fleet_config import FLEET_FILE, load_fleet
+from fleet_poller import parse_miner_json
+from upstream_pool import AsyncConnectionPool
+
+# Probed on every firmware; /api/system/stats decides useStats
+COMMON_ENDPOINTS = (
+    "/api/system/info",
+    "/api/system/stats",
+    "/api/system/asic",
+    "/api/system/statistics",
+    "/api/swarm/info",
     "/api/stats",
     "/api/v1/stats",
     "/stats",
     "/api/miner/stats",
     "/api/status",
     "/info",
-    "/api/info" # We know api/system/info works, checking if others do
-]
+    "/api/info",
+)
+
+STATS_ENDPOINT = "/api/system/stats"
+
+# The ESP32 web server falls over with more than a couple of requests at once
+MINER_CONCURRENCY = 2
+TIMEOUT = 4.0
+
+SCRIPT_SRC = re.compile(rb'<script[^>]+src=["\']([^"\']+)["\']', re.IGNORECASE)
+
+# One pass per script for API paths, quoted with or without the leading slash
+API_REFERENCE = re.compile(rb'["\'`]/?(api/[A-Za-z0-9_./-]*[A-Za-z0-9_])')
+
+# Never GET anything that sounds like it changes the board
+UNSAFE = re.compile(r'restart|reboot|reset|update|ota|firmware|identify|pause|resume|wifi|scan',
+                    re.IGNORECASE)
+
+
+def classify(status, body):
+    """Summarises one probe response for the capability map."""
+    result = {'status': status, 'bytes': len(body)}
+    stripped = body.lstrip()
+    if stripped[:1] in (b'{', b'['):
+        try:
+            data = parse_miner_json(body)
+        except ValueError:
+            result['kind'] = 'text'
+        else:
+            result['kind'] = 'json'
+            if isinstance(data, dict):
+                result['keys'] = sorted(data)
+    elif stripped[:1] == b'<':
+        # AxeOS answers unknown paths with the web UI
+        result['kind'] = 'html'
+    else:
+        result['kind'] = 'text' if stripped else 'empty'
+    result['supported'] = status == 200 and result['kind'] == 'json'
+    return result
+
+
+class Prober:
+    """Keep-alive GETs to miners, at most `per_miner` in flight per board."""
+
+    def __init__(self, timeout=TIMEOUT, per_miner=MINER_CONCURRENCY):
+        self.pool = AsyncConnectionPool(per_miner, timeout=timeout)
+        self.per_miner = per_miner
+        self._limits = {}
+
+    async def get(self, host, path):
+        """Returns (status, body), or (None, error message) when the miner didn't answer."""
+        limit = self._limits.get(host)
+        if limit is None:
+            limit = self._limits[host] = asyncio.Semaphore(self.per_miner)
+        async with limit:
+            try:
+                status, _, body = await self.pool.request(host, path.lstrip('/'))
+            except (OSError, asyncio.TimeoutError, HTTPResponseError, DecodingError) as e:
+                return None, str(e) or type(e).__name__
+        return status, body
+
+    async def info(self, host):
+        status, body = await self.get(host, '/api/system/info')
+        if status != 200:
+            return None
+        try:
+            info = parse_miner_json(body)
+        except ValueError:
+            return None
+        return info if isinstance(info, dict) else None
+
+    async def scan_scripts(self, hosts):
+        """
+        Fetches the web UI from the first host and its scripts from all of
+        them. Returns (script paths, sorted API paths referenced).
+        """
+        status, index = await self.get(hosts[0], '/')
+        if status != 200:
+            return [], []
+        scripts = [src.decode('latin-1') for src in dict.fromkeys(SCRIPT_SRC.findall(index))
+                   if not src.startswith((b'http:', b'https:', b'//'))]
+        bodies = await asyncio.gather(*(self.get(hosts[i % len(hosts)], '/' + src.lstrip('./'))
+                                        for i, src in enumerate(scripts)))
+        found = set(API_REFERENCE.findall(index))
+        for status, body in bodies:
+            if status == 200:
+                found.update(API_REFERENCE.findall(body))
+        return scripts, sorted('/' + ref.decode('latin-1') for ref in found)
+
+    async def probe_firmware(self, hosts, info):
+        """Probes one firmware, spreading requests over every host running it."""
+        scripts, references = await self.scan_scripts(hosts)
+        endpoints = list(COMMON_ENDPOINTS)
+        endpoints += [ref for ref in references if ref not in endpoints and not UNSAFE.search(ref)]
 
-print(f"Probing {MINER_IP} via proxy...")
+        responses = await asyncio.gather(*(self.get(hosts[i % len(hosts)], endpoint)
+                                           for i, endpoint in enumerate(endpoints)))
+        results = {}
+        for endpoint, (status, body) in zip(endpoints, responses):
+            results[endpoint] = ({'status': None, 'error': body, 'supported': False} if status is None
+                                 else classify(status, body))
 
-for endpoint in COMMON_ENDPOINTS:
-    url = f"{PROXY_URL}{endpoint}"
-    print(f"Checking {endpoint}...", end=" ")
+        return {
+            'deviceModel': info.get('deviceModel') or info.get('boardVersion'),
+            'asicModel': info.get('ASICModel'),
+            'version': info.get('version'),
+            'probedAt': int(time.time()),
+            'probedOn': hosts,
+            'scripts': scripts,
+            'scriptReferences': references,
+            'endpoints': results,
+            'useStats': results[STATS_ENDPOINT]['supported'],
+        }
+
+    def close(self):
+        self.pool.close()
+
+
+async def probe_fleet(miners, capabilities, refresh=False, timeout=TIMEOUT, per_miner=MINER_CONCURRENCY):
+    """
+    Updates `capabilities` in place for `miners` (fleet entries). Returns
+    (firmware keys probed now, ids of miners that didn't answer).
+    """
+    prober = Prober(timeout, per_miner)
     try:
-        req = urllib.request.Request(
-            url, 
-            headers={'User-Agent': 'miners-dashboard-probe'}
-        )
-        with urllib.request.urlopen(req, timeout=2) as response:
-            content = response.read()
-            # Check if it looks like JSON (starts with {) and not HTML (<)
-            if content.strip().startswith(b'{'):
-                print(f"SUCCESS! Found JSON response.")
-                print(f"Preview: {content[:100]}")
-            elif content.strip().startswith(b'<'):
-                print("Failed (Returned HTML)")
-            else:
-                print(f"Unknown Content: {content[:20]}")
-    except Exception as e:
-        print(f"Error: {e}")
+        infos = await asyncio.gather(*(prober.info(m['ip']) for m in miners))
+
+        by_firmware = {}
+        offline = []
+        for miner, info in zip(miners, infos):
+            if info is None:
+                offline.append(miner['id'])
+                continue
+            key = firmware_key(info.get('deviceModel') or info.get('boardVersion'), info.get('version'))
+            capabilities['miners'][miner['id']] = key
+            by_firmware.setdefault(key, ([], info))[0].append(miner['ip'])
+
+        todo = {key: group for key, group in by_firmware.items()
+                if refresh or key not in capabilities['firmware']}
+        probed = await asyncio.gather(*(prober.probe_firmware(hosts, info) for hosts, info in todo.values()))
+        capabilities['firmware'].update(zip(todo, probed))
+    finally:
+        prober.close()
+
+    capabilities['models'] = summarise(capabilities['firmware'])
+    capabilities['updated'] = int(time.time())
+    return list(todo), offline
+
+
+def summarise(firmware):
+    """{deviceModel: {version: {'useStats': bool, 'endpoints': [supported paths]}}}"""
+    models = {}
+    for entry in firmware.values():
+        supported = sorted(path for path, r in entry['endpoints'].items() if r.get('supported'))
+        models.setdefault(entry['deviceModel'] or 'unknown', {})[entry['version'] or 'unknown'] = {
+            'useStats': entry['useStats'],
+            'endpoints': supported,
+        }
+    return models
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Map the API of every firmware in the fleet")
+    parser.add_argument("hosts", nargs="*", help="Miner addresses (default: every miner in the fleet)")
+    parser.add_argument("--fleet", default=FLEET_FILE, help="Fleet inventory written by discover.py")
+    parser.add_argument("--output", default=CAPABILITIES_FILE,
+                        help="Capability map to update (also the cache of probed firmware)")
+    parser.add_argument("--refresh", action="store_true", help="Reprobe firmware already in the map")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT)
+    parser.add_argument("--per-miner", type=int, default=MINER_CONCURRENCY,
+                        help="Requests in flight per miner")
+    parser.add_argument("--show-keys", action="store_true", help="Print the JSON keys of each endpoint")
+    args = parser.parse_args()
+
+    miners = load_fleet(args.fleet)
+    if args.hosts:
+        by_ip = {m['ip']: m for m in miners}
+        miners = [by_ip.get(host, {'id': host, 'name': host, 'ip': host}) for host in args.hosts]
+
+    capabilities = load_capabilities(args.output)
+    started = time.monotonic()
+    probed, offline = asyncio.run(probe_fleet(miners, capabilities, args.refresh,
+                                              args.timeout, args.per_miner))
+    elapsed = time.monotonic() - started
+
+    for key in sorted({capabilities['miners'][m['id']] for m in miners if m['id'] in capabilities['miners']}):
+        entry = capabilities['firmware'][key]
+        count = sum(1 for m in miners if capabilities['miners'].get(m['id']) == key)
+        state = "probed" if key in probed else "cached"
+        print(f"{key}  ({count} miners, {state})  useStats={entry['useStats']}")
+        for path, result in sorted(entry['endpoints'].items()):
+            if result.get('supported'):
+                keys = f"  {', '.join(result.get('keys', []))}" if args.show_keys else ""
+                print(f"    {path:<28} {result['bytes']} bytes{keys}")
+    if offline:
+        print(f"No answer from: {', '.join(offline)}")
+    print(f"Probed {len(probed)} new firmware in {elapsed:.1f}s")
+
+    save_capabilities(capabilities, args.output)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+?fields= support for /proxy/ and /api/fleet.
+
+A client that asks for ?fields=hashRate,power,temp gets compact JSON with
+only those keys, already stripped of the binary junk some AxeOS builds
+append. The upstream body is sanitised and parsed once per cached response
+and each projection is encoded once, however many tabs ask for it.
+"""
+import json
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+from fleet_poller import parse_miner_json
+
+# Added to every miner in a projected /api/fleet so clients can still tell
+# offline miners apart
+FLEET_META_FIELDS = ('status', 'error', 'polledAt')
+
+# Distinct (response, field set) pairs remembered
+MAX_ENTRIES = 512
+
+
+def split_fields(query_string):
+    """
+    Pulls `fields` out of a query string. Returns (fields, remaining_query):
+    fields is None when not requested, () for fields=* (every field), else a
+    tuple of names.
+    """
+    if not query_string:
+        return None, ''
+    params = urllib.parse.parse_qsl(query_string, keep_blank_values=True)
+    fields = None
+    rest = []
+    for name, value in params:
+        if name == 'fields':
+            names = tuple(f.strip() for f in value.split(',') if f.strip())
+            fields = () if names in ((), ('*',)) else names
+        else:
+            rest.append((name, value))
+    return fields, urllib.parse.urlencode(rest)
+
+
+def project(data, fields):
+    if not fields or not isinstance(data, dict):
+        return data
+    return {f: data[f] for f in fields if f in data}
+
+
+def encode(data):
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+class ProjectionCache:
+    """
+    Memoises projected bodies. Entries are keyed on the identity of the
+    source object (the cached upstream bytes or the poller's snapshot), so a
+    new upstream response or poll round naturally misses; the source is kept
+    in the entry so its id can't be reused while the entry lives.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key, source, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is source:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        body = build()
+        with self._lock:
+            self._entries[key] = (source, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+    def miner(self, key, content, fields):
+        """
+        Projected body for one upstream response. Raises ValueError when the
+        miner didn't send JSON.
+        """
+        return self._get(('miner', key, fields), content,
+                         lambda: encode(project(parse_miner_json(content), fields)))
+
+    def fleet(self, snapshot, fields):
+        """Projected /api/fleet document for a FleetPoller snapshot."""
+        def build():
+            keep = fields and tuple(dict.fromkeys(fields + FLEET_META_FIELDS))
+            miners = {miner_id: project(data, keep) for miner_id, data in snapshot['miners'].items()}
+            return encode({**snapshot, 'miners': miners})
+        return self._get(('fleet', fields), snapshot, build)
@@ -0,0 +1,156 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Pending:
+    """An upstream fetch that is currently running for one cache key."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class _AsyncPending:
+    """An upstream fetch running as its own task, and how many callers await it."""
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class ResponseCache:
+    """
+    Short-TTL cache for proxied miner responses, keyed by (ip, path).
+
+    Every dashboard tab polls the same endpoints, so identical requests that
+    arrive within `ttl` seconds are answered from memory. When a key is missing
+    and a fetch for it is already running, later callers wait for that fetch
+    instead of starting their own. Upstream load therefore stays at one request
+    per key per TTL no matter how many clients are connected.
+    """
+
+    def __init__(self, ttl=4.0, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}            # key -> _Pending
+        self._inflight_async = {}      # key -> _AsyncPending (asyncio engine)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Returns the cached value for `key`, or calls `fetch()` to produce it.
+        Exceptions raised by `fetch` are passed to every waiting caller and
+        are never cached.
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                pending = _Pending()
+                self._inflight[key] = pending
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = fetch()
+        except BaseException as e:
+            pending.error = e
+            raise
+        else:
+            self.put(key, pending.value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.event.set()
+
+        return pending.value
+
+    async def get_or_fetch_async(self, key, fetch):
+        """
+        Coroutine version of get_or_fetch for the asyncio engine. `fetch` is an
+        async callable, run as a task of its own that every concurrent miss
+        awaits. A caller disconnecting only cancels the fetch when nobody else
+        is still waiting for it.
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+
+            pending = self._inflight_async.get(key)
+            if pending is not None:
+                self.coalesced += 1
+            else:
+                pending = _AsyncPending(asyncio.ensure_future(self._fetch_async(key, fetch)))
+                self._inflight_async[key] = pending
+                self.misses += 1
+            pending.waiters += 1
+
+        try:
+            # Shielded: cancelling one caller must not cancel the shared task
+            return await asyncio.shield(pending.task)
+        finally:
+            with self._lock:
+                pending.waiters -= 1
+                abandoned = pending.waiters == 0 and not pending.task.done()
+            if abandoned:
+                pending.task.cancel()
+
+    async def _fetch_async(self, key, fetch):
+        try:
+            value = await fetch()
+        finally:
+            with self._lock:
+                self._inflight_async.pop(key, None)
+        self.put(key, value)
+        return value
+
+    def _lookup(self, key):
+        # Caller must hold self._lock
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            del self._entries[key]
+        return False, None
+
+    def put(self, key, value):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            # Drop least recently used entries once we're over budget
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'inflight': len(self._inflight) + len(self._inflight_async),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+            }
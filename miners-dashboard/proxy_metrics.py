@@ -0,0 +1,288 @@
+"""
+Proxy instrumentation and the Prometheus text exposition for /metrics.
+
+Each miner gets its own small stats object with its own lock, so requests to
+different miners never contend and the per-request cost is one bisect plus a
+handful of integer increments. Rendering snapshots the counters under those
+same locks and is only paid by the scraper.
+"""
+import bisect
+import threading
+import time
+
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upstream latency buckets in seconds; ESP32s answer in 50-500 ms when healthy
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0)
+
+# Response sizes in bytes; AxeOS info is 2-3 KB, stats can be much larger
+SIZE_BUCKETS = (512, 1024, 2048, 4096, 8192, 16384, 65536, 262144)
+
+# Proxy status code -> result label
+RESULTS = {504: 'timeout', 503: 'offline', 502: 'failed', 500: 'error'}
+
+# Fleet poller field -> (metric name, type, help)
+TELEMETRY = (
+    ('hashRate', 'miner_hashrate_ghs', 'gauge', "Reported hashrate in GH/s"),
+    ('power', 'miner_power_watts', 'gauge', "Reported power draw"),
+    ('temp', 'miner_asic_temp_celsius', 'gauge', "ASIC temperature"),
+    ('vrTemp', 'miner_vr_temp_celsius', 'gauge', "Voltage regulator temperature"),
+    ('fanrpm', 'miner_fan_rpm', 'gauge', "Fan speed"),
+    ('frequency', 'miner_frequency_mhz', 'gauge', "ASIC frequency"),
+    ('sharesAccepted', 'miner_shares_accepted_total', 'counter', "Accepted shares since boot"),
+    ('sharesRejected', 'miner_shares_rejected_total', 'counter', "Rejected shares since boot"),
+    ('uptimeSeconds', 'miner_uptime_seconds', 'gauge', "Seconds since the miner booted"),
+    # Derived by analytics.derive in the poller
+    ('expectedHashRate', 'miner_expected_hashrate_ghs', 'gauge', "Hashrate expected from frequency and chip count"),
+    ('efficiency', 'miner_efficiency_percent', 'gauge', "Hashrate as a percentage of expected"),
+    ('jPerTh', 'miner_joules_per_terahash', 'gauge', "Energy per TH of work (W per TH/s)"),
+)
+
+CACHE_COUNTERS = ('hits', 'misses', 'coalesced')
+POOL_COUNTERS = ('hits', 'misses', 'retries', 'evicted_idle', 'evicted_unhealthy', 'discarded')
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class _MinerStats:
+    """Counters for one upstream host. Only touched with `lock` held."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.upstream_inflight = 0
+        self.upstream = {}  # outcome ('ok', 'timeout', 'error') -> count
+        self.status = {}    # upstream HTTP status -> count
+        self.results = {}   # proxy result label -> count
+        self.proxy_inflight = 0
+
+
+class ProxyMetrics:
+    """
+    Collects proxy hot-path counters per miner.
+
+    `upstream(ip)` wraps a fetch from the miner (timing, size, outcome);
+    `proxy_started(ip)` / `proxy_finished(ip, status)` bracket a /proxy
+    request, which may be answered from the cache without any upstream fetch.
+    """
+
+    def __init__(self):
+        self._miners = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def _stats(self, ip):
+        stats = self._miners.get(ip)
+        if stats is None:
+            with self._lock:
+                stats = self._miners.setdefault(ip, _MinerStats())
+        return stats
+
+    def upstream(self, ip):
+        return _UpstreamTimer(self._stats(ip))
+
+    def proxy_started(self, ip):
+        stats = self._stats(ip)
+        with stats.lock:
+            stats.proxy_inflight += 1
+
+    def proxy_finished(self, ip, status):
+        stats = self._stats(ip)
+        result = RESULTS.get(status, 'ok')
+        with stats.lock:
+            stats.proxy_inflight -= 1
+            stats.results[result] = stats.results.get(result, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            miners = list(self._miners.items())
+        out = {}
+        for ip, s in miners:
+            with s.lock:
+                out[ip] = {
+                    'latency': (list(s.latency.counts), s.latency.sum),
+                    'size': (list(s.size.counts), s.size.sum),
+                    'upstream_inflight': s.upstream_inflight,
+                    'upstream': dict(s.upstream),
+                    'status': dict(s.status),
+                    'results': dict(s.results),
+                    'proxy_inflight': s.proxy_inflight,
+                }
+        return out
+
+
+class _UpstreamTimer:
+    """
+    Context manager around one upstream fetch. Set `status` and `size` before
+    leaving; an exception is counted as a timeout or error outcome. `elapsed`
+    holds the fetch time in seconds afterwards.
+    """
+    __slots__ = ('stats', 'started', 'status', 'size', 'elapsed')
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.status = None
+        self.size = 0
+
+    def __enter__(self):
+        with self.stats.lock:
+            self.stats.upstream_inflight += 1
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = self.elapsed = time.perf_counter() - self.started
+        # socket.timeout and asyncio.TimeoutError are both TimeoutError
+        if exc_type is None:
+            outcome = 'ok'
+        elif issubclass(exc_type, TimeoutError):
+            outcome = 'timeout'
+        else:
+            outcome = 'error'
+
+        s = self.stats
+        with s.lock:
+            s.upstream_inflight -= 1
+            s.upstream[outcome] = s.upstream.get(outcome, 0) + 1
+            s.latency.observe(elapsed)
+            if exc_type is None:
+                s.size.observe(self.size)
+                s.status[self.status] = s.status.get(self.status, 0) + 1
+        return False
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return 1 if value else 0
+    if value != value:
+        return 'NaN'
+    return value
+
+
+class _Writer:
+    def __init__(self):
+        self.lines = []
+        self._declared = set()
+
+    def declare(self, name, kind, help_text):
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f"# HELP {name} {help_text}")
+            self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name, value, labels=''):
+        self.lines.append(f"{name}{labels} {_number(value)}")
+
+    def histogram(self, name, help_text, bounds, counts, total, **labels):
+        self.declare(name, 'histogram', help_text)
+        cumulative = 0
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            self.sample(f"{name}_bucket", cumulative, _labels(**labels, le=bound))
+        cumulative += counts[-1]
+        self.sample(f"{name}_bucket", cumulative, _labels(**labels, le='+Inf'))
+        self.sample(f"{name}_sum", round(total, 6), _labels(**labels))
+        self.sample(f"{name}_count", cumulative, _labels(**labels))
+
+    def text(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+def render(metrics, cache_stats=None, pool_stats=None, fleet=None, breaker_states=None, poller_pool_stats=None):
+    """
+    Returns the Prometheus text exposition (version 0.0.4) for the proxy
+    counters, the cache and pool statistics and the latest fleet telemetry.
+    `fleet` is a FleetPoller snapshot ({'miners': {id: data}}) and
+    `breaker_states` is CircuitBreaker.states(). `poller_pool_stats` is for
+    the fleet poller's own pool when it isn't the proxy's (asyncio engine).
+    """
+    w = _Writer()
+
+    snapshot = sorted(metrics.snapshot().items())
+    for ip, s in snapshot:
+        w.histogram('proxy_upstream_latency_seconds', "Time to fetch a response from the miner",
+                    LATENCY_BUCKETS, *s['latency'], miner=ip)
+    for ip, s in snapshot:
+        w.histogram('proxy_upstream_response_bytes', "Size of miner responses",
+                    SIZE_BUCKETS, *s['size'], miner=ip)
+
+    w.declare('proxy_upstream_requests_total', 'counter', "Upstream fetches by outcome (ok, timeout, error)")
+    for ip, s in snapshot:
+        for outcome, count in sorted(s['upstream'].items()):
+            w.sample('proxy_upstream_requests_total', count, _labels(miner=ip, outcome=outcome))
+    w.declare('proxy_upstream_responses_total', 'counter', "Upstream responses by HTTP status")
+    for ip, s in snapshot:
+        for status, count in sorted(s['status'].items(), key=lambda kv: str(kv[0])):
+            w.sample('proxy_upstream_responses_total', count, _labels(miner=ip, code=status))
+    w.declare('proxy_upstream_inflight', 'gauge', "Upstream fetches currently in progress")
+    for ip, s in snapshot:
+        w.sample('proxy_upstream_inflight', s['upstream_inflight'], _labels(miner=ip))
+    w.declare('proxy_requests_total', 'counter',
+              "Proxied requests by result (ok, timeout = 504, offline = 503, failed = 502, error = 500)")
+    for ip, s in snapshot:
+        for result, count in sorted(s['results'].items()):
+            w.sample('proxy_requests_total', count, _labels(miner=ip, result=result))
+    w.declare('proxy_requests_inflight', 'gauge', "Proxied requests currently being served")
+    for ip, s in snapshot:
+        w.sample('proxy_requests_inflight', s['proxy_inflight'], _labels(miner=ip))
+
+    for prefix, stats, counters in (('proxy_cache', cache_stats, CACHE_COUNTERS),
+                                    ('proxy_pool', pool_stats, POOL_COUNTERS),
+                                    ('poller_pool', poller_pool_stats, POOL_COUNTERS)):
+        for key, value in (stats or {}).items():
+            if not isinstance(value, (int, float)):
+                continue
+            if key in counters:
+                name = f"{prefix}_{key}_total"
+                w.declare(name, 'counter', f"{prefix.replace('_', ' ')} {key.replace('_', ' ')}")
+            else:
+                name = f"{prefix}_{key}"
+                w.declare(name, 'gauge', f"{prefix.replace('_', ' ')} {key.replace('_', ' ')}")
+            w.sample(name, value)
+
+    if breaker_states:
+        w.declare('proxy_circuit_open', 'gauge', "1 while a miner is treated as offline and failed fast")
+        for ip, state in sorted(breaker_states.items()):
+            w.sample('proxy_circuit_open', state['state'] != 'closed', _labels(miner=ip))
+        w.declare('proxy_circuit_trips_total', 'counter', "Times a miner was marked offline")
+        for ip, state in sorted(breaker_states.items()):
+            w.sample('proxy_circuit_trips_total', state['trips'], _labels(miner=ip))
+
+    if fleet is not None:
+        miners = sorted((fleet.get('miners') or {}).items())
+        w.declare('miner_up', 'gauge', "1 if the last poll of the miner succeeded")
+        for miner_id, data in miners:
+            w.sample('miner_up', data.get('status') == 'online', _labels(miner=miner_id))
+        for field, name, kind, help_text in TELEMETRY:
+            w.declare(name, kind, help_text)
+            for miner_id, data in miners:
+                value = data.get(field)
+                if isinstance(value, (int, float)):
+                    w.sample(name, value, _labels(miner=miner_id))
+        if fleet.get('updated'):
+            w.declare('miner_poll_timestamp_seconds', 'gauge', "When the fleet was last polled")
+            w.sample('miner_poll_timestamp_seconds', round(fleet['updated'], 3))
+
+    w.declare('proxy_start_time_seconds', 'gauge', "When the server started")
+    w.sample('proxy_start_time_seconds', round(metrics.started, 3))
+    return w.text()
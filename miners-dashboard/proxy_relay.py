@@ -0,0 +1,51 @@
+"""
+Streaming relay for non-API proxy paths.
+
+/proxy/<ip>/api/... answers are small JSON documents polled by every tab,
+so they are read whole and go through the response cache. Anything else
+(the AxeOS web UI that fetch_miner_js.py walks, its JS bundles, firmware
+files) is relayed chunk by chunk: each request holds one CHUNK_SIZE buffer
+whatever the size of the file, and nothing is cached.
+"""
+from content_coding import Decoder, accepts
+
+# Upstream headers passed through to the browser on relayed responses
+RELAY_HEADERS = ('content-type', 'etag', 'last-modified', 'cache-control', 'content-disposition')
+
+# Browser headers passed upstream, so an unchanged bundle comes back as a 304
+CONDITIONAL_HEADERS = ('if-none-match', 'if-modified-since')
+
+# Bytes the asyncio engine lets pile up for a slow browser before pausing the upstream read
+RELAY_BUFFER = 64 * 1024
+
+PREVIEW_CHARS = 100
+
+
+def is_relayed(path):
+    """True for proxy paths that are streamed rather than cached."""
+    return not path.lstrip('/').startswith('api/')
+
+
+def relay_plan(upstream_headers, accept_encoding):
+    """
+    Decides how to pass an upstream body on. Returns (decoder, headers):
+    decoder is None when the raw bytes can be forwarded as they are, in
+    which case Content-Length and Content-Encoding are forwarded too;
+    otherwise the body is decoded on the fly and its length is unknown.
+    """
+    headers = [(name.title(), upstream_headers[name]) for name in RELAY_HEADERS if name in upstream_headers]
+    encoding = upstream_headers.get('content-encoding', '')
+    codings = [c.strip() for c in encoding.split(',') if c.strip() and c.strip().lower() != 'identity']
+    if not all(accepts(accept_encoding, c) for c in codings):
+        return Decoder(encoding), headers
+
+    if encoding:
+        headers.append(('Content-Encoding', encoding))
+    if 'content-length' in upstream_headers:
+        headers.append(('Content-Length', upstream_headers['content-length']))
+    return None, headers
+
+
+def preview(chunk):
+    """Log preview from the first chunk only; encoded bodies aren't worth decoding for it."""
+    return chunk[:PREVIEW_CHARS].decode('utf-8', errors='ignore').replace('\n', ' ')
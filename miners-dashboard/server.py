@@ -1,80 +1,368 @@
 
+import argparse
+import asyncio
+import contextlib
+import http.client
 import http.server
 import socketserver
-import urllib.request
-import urllib.error
+import urllib.parse
 import json
+import logging
+import queue
 import re
 import socket
+import threading
+
+from alerting import ALERTS_LOG, RULES_FILE, AlertEngine, alerts_response, load_rules
+from capabilities import CAPABILITIES_FILE, apply_capabilities, load_capabilities
+from circuit_breaker import BASE_BACKOFF, FAILURE_THRESHOLD, MAX_BACKOFF, CircuitBreaker, CircuitOpenError
+from content_coding import CHUNK_SIZE, COMPRESS_LEVEL, DecodingError, ResponseEncoder, compressible
+from dashboard_log import LOG_FILE, LOG_SAMPLE_EVERY, setup_logging
+from federation import SYNC_PATH, Federation, SyncLog, federation_response, parse_collector, sync_response
+from fleet_config import FLEET_FILE, load_fleet
+from fleet_poller import FleetPoller
+from fleet_stream import FleetBroadcaster, PING_EVENT, PING_INTERVAL
+from history_api import history_response
+from history_store import HISTORY_DIR, HistoryRecorder
+from history_tiers import TieredHistory
+from projection import ProjectionCache, split_fields
+from proxy_cache import ResponseCache
+from proxy_metrics import METRICS_CONTENT_TYPE, ProxyMetrics, render as render_metrics
+from proxy_relay import CONDITIONAL_HEADERS, is_relayed, preview, relay_plan
+from upstream_pool import ConnectionPool
 
 PORT = 8000
 
+# Fleet inventory shared with src/main.js; regenerate it with discover.py,
+# and capabilities.json with probe_miner.py to set useStats per firmware
+MINERS = apply_capabilities(load_fleet(), load_capabilities())
+
+# Upstream requests allowed in flight per miner in asyncio mode
+MINER_CONCURRENCY = 2
+
+# How often the background poller refreshes every miner (same as the dashboard tick)
+POLL_INTERVAL = 5.0
+
+# Miners are polled every 5s by every open tab, so anything younger than this
+# is served from memory instead of hitting the ESP32 again
+CACHE_TTL = 4.0
+CACHE_MAX_ENTRIES = 256
+
+# Keep-alive sockets per miner, and how long one may sit unused before closing
+POOL_MAX_IDLE = 4
+POOL_IDLE_TIMEOUT = 30.0
+
+# 3 second timeout - miners should reply fast
+UPSTREAM_TIMEOUT = 3.0
+
+connection_pool = ConnectionPool(POOL_MAX_IDLE, POOL_IDLE_TIMEOUT, UPSTREAM_TIMEOUT)
+
+# Shared by both engines and the poller, served at /metrics
+proxy_metrics = ProxyMetrics()
+
+# ?fields= bodies, parsed and encoded once per upstream response or poll round
+projections = ProjectionCache()
+
+# gzip/deflate/br for browsers that accept it, memoised per shared body
+response_encoder = ResponseEncoder(COMPRESS_LEVEL)
+
+# Fails fast for miners that stopped answering instead of waiting out the timeout
+circuit_breaker = CircuitBreaker(FAILURE_THRESHOLD, BASE_BACKOFF, MAX_BACKOFF)
+
+log = logging.getLogger('dashboard.proxy')
+
 # Use ThreadingTCPServer to handle multiple requests simultaneously
 # This prevents one slow/offline miner from blocking the entire dashboard
 class ThreadingHTTPServer(socketserver.ThreadingTCPServer):
     allow_reuse_address = True
+    # Event stream threads live as long as the tab, don't wait on them at shutdown
+    daemon_threads = True
+
+def fetch_upstream(target_ip, target_path):
+    """
+    Fetches a single path from a miner and returns (status_code, content).
+    Network errors are left for the caller to turn into JSON error responses;
+    CircuitOpenError means the miner is offline and wasn't contacted.
+    """
+    target_url = f"http://{target_ip}/{target_path}"
+    circuit_breaker.before(target_ip)
+
+    # Reuses a keep-alive socket to the miner when one is idle in the pool.
+    # The pool sends a custom UA to avoid getting served the HTML dashboard by accident.
+    try:
+        with proxy_metrics.upstream(target_ip) as timer:
+            status_code, headers, content = connection_pool.request(target_ip, target_path)
+            timer.status, timer.size = status_code, len(content)
+    except (OSError, http.client.HTTPException, DecodingError) as e:
+        circuit_breaker.failure(target_ip, e)
+        raise
+    circuit_breaker.success(target_ip)
+    # Any gzip/deflate/br Content-Encoding was undone by the pool as the body arrived
+    
+    preview = content[:100].decode('utf-8', errors='ignore').replace('\n', ' ')
+    log.info("  -> Success: %s [len=%d] [%.0fms] Preview: %s", target_url, len(content),
+             timer.elapsed * 1000, preview, extra={'sample': True})
+    
+    return status_code, content
+
+@contextlib.contextmanager
+def stream_upstream(target_ip, target_path, headers=None):
+    """
+    connection_pool.stream() behind the circuit breaker: only failing to get
+    a response head counts against the miner, not a browser that goes away
+    mid-body.
+    """
+    circuit_breaker.before(target_ip)
+    opened = False
+    try:
+        with connection_pool.stream(target_ip, target_path, headers) as response:
+            opened = True
+            circuit_breaker.success(target_ip)
+            yield response
+    except (OSError, http.client.HTTPException) as e:
+        if not opened:
+            circuit_breaker.failure(target_ip, e)
+        raise
+
+def fetch_miner(ip, path):
+    """Fetches /<path> from a miner through the shared response cache."""
+    target_path = urllib.parse.quote(path)
+    return CORSProxyRequestHandler.response_cache.get_or_fetch(
+        (ip, target_path),
+        lambda: fetch_upstream(ip, target_path)
+    )
+
+def proxy_stats(response_cache, pool, breaker):
+    """Cache, connection pool and circuit breaker state, for checking the socket reuse rate."""
+    return {'cache': response_cache.stats(), 'pool': pool.stats_dict(), 'breaker': breaker.states()}
 
 class CORSProxyRequestHandler(http.server.SimpleHTTPRequestHandler):
+    response_cache = ResponseCache(CACHE_TTL, CACHE_MAX_ENTRIES)
+    fleet_poller = None
+    fleet_stream = None
+    history = None
+    alerts = None
+    sync_log = None
+    federation = None
+
     def do_GET(self):
-        # Regex to match /proxy/<ip>/<endpoint>
-        match = re.match(r'^/proxy/([^/]+)/(.*)', self.path)
+        route = self.path.split('?', 1)[0]
+        if route == '/api/fleet':
+            fields, _ = split_fields(self.path.partition('?')[2])
+            return self.send_fleet(fields)
+        if route == '/api/fleet/stream':
+            return self.send_fleet_stream()
+        if route == '/api/history':
+            query = self.path.split('?', 1)[1] if '?' in self.path else ''
+            return self.send_json(*history_response(self.history, query))
+        if route == '/api/alerts':
+            return self.send_json(*alerts_response(self.alerts))
+        if route == SYNC_PATH:
+            return self.send_json(*sync_response(self.sync_log, self.path.partition('?')[2]))
+        if route == '/api/federation':
+            return self.send_json(*federation_response(self.federation))
+        if route == '/api/proxy/stats':
+            return self.send_json(200, proxy_stats(self.response_cache, connection_pool, circuit_breaker))
+        if route == '/metrics':
+            return self.send_metrics()
+        if route == '/fleet.json' and self.fleet_poller is not None:
+            # The inventory actually being polled, which --fleet may have moved,
+            # plus any miners synced from collectors
+            return self.send_json(200, {'miners': self.fleet_poller.inventory()})
+
+        # Regex to match /proxy/<ip>/<endpoint>[?query]
+        match = re.match(r'^/proxy/([^/]+)/([^?]*)\??(.*)', self.path)
         
         if match:
             target_ip = match.group(1)
-            target_path = match.group(2)
+            # ?fields= is ours, anything else in the query goes to the miner
+            fields, query = split_fields(match.group(3))
             # Encode spaces in path just in case, though unlikely for API
-            target_path = urllib.parse.quote(target_path)
+            target_path = urllib.parse.quote(match.group(2)) + (f"?{query}" if query else "")
             target_url = f"http://{target_ip}/{target_path}"
             
-            print(f"Proxying: {target_url}")
-            
+            log.debug("Proxying: %s", target_url)
+            if is_relayed(match.group(2)):
+                # Web UI files and the like: streamed, never buffered whole or cached
+                return self.relay(target_ip, target_path, target_url)
+
+            proxy_metrics.proxy_started(target_ip)
+            status_code = 500
             try:
-                # Set a strict timeout so we don't hang forever
-                # Use a custom UA to avoid getting served the HTML dashboard by accident
-                req = urllib.request.Request(
-                    target_url, 
-                    headers={'User-Agent': 'miners-dashboard-proxy'}
+                # Identical requests from other tabs share one upstream fetch
+                status_code, content = self.response_cache.get_or_fetch(
+                    (target_ip, target_path),
+                    lambda: fetch_upstream(target_ip, target_path)
                 )
-                
-                # 3 second timeout - miners should reply fast
-                with urllib.request.urlopen(req, timeout=3) as response:
-                    content = response.read()
-                    status_code = response.getcode()
-                    
-                    # Debug: Check for compression
-                    encoding = response.info().get('Content-Encoding')
-                    if encoding == 'gzip':
-                        print(f"  -> {target_url} Decompressing GZIP...")
-                        import gzip
-                        content = gzip.decompress(content)
-                    elif encoding:
-                        print(f"  -> {target_url} Encoding: {encoding} (Not handled)")
-                    
-                    self.send_response(status_code)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(content)
-                    try:
-                        scan_text = content.decode('utf-8', errors='ignore')
-                        preview = scan_text[:100].replace('\n', ' ')
-                        print(f"  -> Success: {target_url} [len={len(content)}] Preview: {preview}")
-                    except:
-                        print(f"  -> Success: {target_url} [len={len(content)}] (Binary/Unprintable)")
+                if fields is not None and status_code == 200:
+                    content = projections.miner((target_ip, target_path), content, fields)
+
+                self.send_body(status_code, 'application/json', content, no_store=False)
                     
-            except urllib.error.URLError as e:
-                error_msg = str(e.reason) if hasattr(e, 'reason') else str(e)
-                print(f"  -> Failed {target_url}: {error_msg}")
-                self.send_error_json(502, f"Connection Failed: {error_msg}")
+            except DecodingError as e:
+                status_code = 502
+                log.warning("  -> Failed %s: %s", target_url, e)
+                self.send_error_json(502, str(e))
+            except ValueError:
+                status_code = 502
+                log.warning("  -> Failed %s: response is not JSON", target_url)
+                self.send_error_json(502, "Miner sent invalid JSON")
+            except CircuitOpenError as e:
+                status_code = 503
+                log.debug("  -> Offline %s: %s", target_url, e)
+                self.send_error_json(503, str(e))
             except socket.timeout:
-                print(f"  -> Timeout {target_url}")
+                status_code = 504
+                log.warning("  -> Timeout %s", target_url)
                 self.send_error_json(504, "Connection Timed Out")
+            except (OSError, http.client.HTTPException) as e:
+                status_code = 502
+                error_msg = str(e) or type(e).__name__
+                log.warning("  -> Failed %s: %s", target_url, error_msg)
+                self.send_error_json(502, f"Connection Failed: {error_msg}")
             except Exception as e:
-                print(f"  -> Error {target_url}: {str(e)}")
+                status_code = 500
+                log.error("  -> Error %s: %s", target_url, e)
                 self.send_error_json(500, f"Proxy Error: {str(e)}")
+            finally:
+                proxy_metrics.proxy_finished(target_ip, status_code)
         else:
             super().do_GET()
 
+    def relay(self, target_ip, target_path, target_url):
+        """
+        Streams an upstream response to the browser through one CHUNK_SIZE
+        buffer, forwarding Content-Length, ETag and friends. Once the headers
+        have gone out a failure can only be reported by closing the connection.
+        """
+        proxy_metrics.proxy_started(target_ip)
+        status_code = 500
+        started = False
+        try:
+            request_headers = {name: self.headers[name] for name in CONDITIONAL_HEADERS if self.headers.get(name)}
+            with proxy_metrics.upstream(target_ip) as timer, \
+                    stream_upstream(target_ip, target_path, request_headers) as (status_code, headers, response):
+                decoder, relay_headers = relay_plan(headers, self.headers.get('Accept-Encoding'))
+                self.send_response(status_code)
+                for name, value in relay_headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                started = True
+
+                first, size = b'', 0
+                while chunk := response.read(CHUNK_SIZE):
+                    size += len(chunk)
+                    if decoder is not None:
+                        chunk = decoder.feed(chunk)
+                    first = first or chunk
+                    self.wfile.write(chunk)
+                if decoder is not None:
+                    self.wfile.write(decoder.flush())
+                timer.status, timer.size = status_code, size
+
+            encoded = any(name == 'Content-Encoding' for name, _ in relay_headers)
+            log.info("  -> Relayed: %s [len=%d] Preview: %s", target_url, size,
+                     '(encoded)' if encoded else preview(first), extra={'sample': True})
+        except CircuitOpenError as e:
+            status_code = 503
+            log.debug("  -> Offline %s: %s", target_url, e)
+            self.send_error_json(503, str(e))
+        except (OSError, http.client.HTTPException, DecodingError) as e:
+            error_msg = str(e) or type(e).__name__
+            if started:
+                # Too late for an error response, the browser sees a truncated body
+                status_code = 502
+                self.close_connection = True
+                log.warning("  -> Relay aborted %s: %s", target_url, error_msg)
+            elif isinstance(e, socket.timeout):
+                status_code = 504
+                log.warning("  -> Timeout %s", target_url)
+                self.send_error_json(504, "Connection Timed Out")
+            else:
+                status_code = 502
+                log.warning("  -> Failed %s: %s", target_url, error_msg)
+                self.send_error_json(502, f"Connection Failed: {error_msg}")
+        finally:
+            proxy_metrics.proxy_finished(target_ip, status_code)
+
+    def send_fleet(self, fields=None):
+        if self.fleet_poller is None:
+            return self.send_error_json(503, "Fleet poller is disabled")
+
+        if fields is None:
+            content = self.fleet_poller.document()
+        else:
+            content = projections.fleet(self.fleet_poller.snapshot(), fields)
+        self.send_body(200, 'application/json', content)
+
+    def send_fleet_stream(self):
+        """Server-Sent Events: a full snapshot, then per-miner deltas after each poll."""
+        if self.fleet_stream is None:
+            return self.send_error_json(503, "Fleet poller is disabled")
+
+        # Bounded so a stalled tab gets dropped instead of buffering forever
+        events = queue.Queue(maxsize=64)
+        dropped = threading.Event()
+
+        def send(event):
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                # The broadcaster unsubscribes us; end the response so the tab reconnects
+                dropped.set()
+                raise
+
+        initial = self.fleet_stream.subscribe(send)
+        try:
+            self.send_response(200)
+            self.send_header('Content-type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(initial)
+            self.wfile.flush()
+
+            while not dropped.is_set():
+                try:
+                    event = events.get(timeout=PING_INTERVAL)
+                except queue.Empty:
+                    event = PING_EVENT
+                if dropped.is_set():
+                    break
+                self.wfile.write(event)
+                self.wfile.flush()
+            # EventSource reconnects by itself and gets a fresh snapshot
+            self.close_connection = True
+        except (ConnectionError, OSError):
+            pass  # Tab closed
+        finally:
+            self.fleet_stream.unsubscribe(send)
+
+    def send_metrics(self):
+        fleet = self.fleet_poller.snapshot() if self.fleet_poller is not None else None
+        content = render_metrics(proxy_metrics, self.response_cache.stats(),
+                                 connection_pool.stats_dict(), fleet,
+                                 circuit_breaker.states()).encode('utf-8')
+        self.send_body(200, METRICS_CONTENT_TYPE, content)
+
+    def send_json(self, code, payload):
+        self.send_body(code, 'application/json', json.dumps(payload).encode('utf-8'))
+
+    def send_body(self, code, content_type, content, no_store=True):
+        """Sends a complete response, compressed if the browser's Accept-Encoding allows."""
+        content, encoding = response_encoder.encode(content, content_type,
+                                                    self.headers.get('Accept-Encoding'))
+        self.send_response(code)
+        self.send_header('Content-type', content_type)
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if compressible(content_type):
+            self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Content-Length', str(len(content)))
+        if no_store:
+            self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(content)
+
     def send_error_json(self, code, message):
         try:
             self.send_response(code)
@@ -89,49 +377,145 @@ class CORSProxyRequestHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Origin', '*')
         super().end_headers()
 
-    def log_message(self, format, *args):
-        # Only log errors (4xx, 5xx) to reduce noise, we print our own proxy logs
-        if int(args[1]) >= 400:
-             sys.stderr.write("%s - - [%s] %s\n" %
-                             (self.address_string(),
-                              self.log_date_time_string(),
-                              format%args))
-
-import sys
-class Tee:
-    def __init__(self, stream, file):
-        self.stream = stream
-        self.file = file
-
-    def write(self, data):
-        self.stream.write(data)
-        self.file.write(data)
-        self.file.flush()  # Ensure it is written immediately
-
-    def flush(self):
-        self.stream.flush()
-        self.file.flush()
+    def log_request(self, code='-', size='-'):
+        # Only log errors (4xx, 5xx) to reduce noise, we log our own proxy lines.
+        # 503 is an offline miner failing fast, already logged when its circuit opened.
+        if isinstance(code, int) and code >= 400 and code != 503:
+            log.warning('%s - - "%s" %s', self.address_string(), self.requestline, code)
+
+    def log_error(self, format, *args):
+        log.warning("%s - - %s", self.address_string(), format % args)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Miner dashboard server and CORS proxy")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--cache-ttl", type=float, default=CACHE_TTL,
+                        help="Seconds to reuse a proxied miner response (0 disables caching)")
+    parser.add_argument("--cache-size", type=int, default=CACHE_MAX_ENTRIES,
+                        help="Maximum number of cached (ip, path) responses")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL,
+                        help="Seconds between background polls of every miner (0 disables /api/fleet)")
+    parser.add_argument("--engine", choices=("asyncio", "threaded"), default="threaded",
+                        help="threaded is the original thread-per-request handler; "
+                             "asyncio serves every connection from one event loop")
+    parser.add_argument("--miner-concurrency", type=int, default=MINER_CONCURRENCY,
+                        help="Maximum simultaneous upstream requests per miner (asyncio engine)")
+    parser.add_argument("--pool-size", type=int, default=POOL_MAX_IDLE,
+                        help="Idle keep-alive connections kept per miner (0 disables reuse)")
+    parser.add_argument("--pool-idle-timeout", type=float, default=POOL_IDLE_TIMEOUT,
+                        help="Seconds an idle miner connection is kept before closing")
+    parser.add_argument("--breaker-failures", type=int, default=FAILURE_THRESHOLD,
+                        help="Consecutive failures before a miner is treated as offline (0 disables)")
+    parser.add_argument("--breaker-max-backoff", type=float, default=MAX_BACKOFF,
+                        help="Longest wait in seconds between probes of an offline miner")
+    parser.add_argument("--compress-level", type=int, default=COMPRESS_LEVEL,
+                        help="gzip/deflate level for responses to browsers (0 disables compression)")
+    parser.add_argument("--fleet", default=FLEET_FILE,
+                        help="Fleet inventory written by discover.py")
+    parser.add_argument("--capabilities", default=CAPABILITIES_FILE,
+                        help="Per-firmware capability map written by probe_miner.py")
+    parser.add_argument("--history-dir", default=HISTORY_DIR,
+                        help="Where polled metrics are stored (empty string disables history)")
+    parser.add_argument("--alert-rules", default=RULES_FILE,
+                        help="Alert rules (JSON); the built-in rules are used when the file doesn't exist")
+    parser.add_argument("--alerts-log", default=ALERTS_LOG,
+                        help="Where alert notifications are appended (empty string disables alerting)")
+    parser.add_argument("--collector", action="append", default=[], type=parse_collector, metavar="NAME=URL",
+                        help="Merge the fleet of another server.py (a collector at another site) "
+                             "into this one; repeatable")
+    parser.add_argument("--log-file", default=LOG_FILE,
+                        help="Rotating, gzip-compressed log file (empty string logs to the console only)")
+    parser.add_argument("--log-level", default="INFO", choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+                        help="DEBUG adds a 'Proxying:' line for every proxied request")
+    parser.add_argument("--log-sample", type=int, default=LOG_SAMPLE_EVERY,
+                        help="Log 1 in N successful proxy responses (1 logs all of them)")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    # Setup logging to both console and file
-    log_file = open("dashboard.log", "a", buffering=1)
-    original_stdout = sys.stdout
-    original_stderr = sys.stderr
-    
-    sys.stdout = Tee(sys.stdout, log_file)
-    sys.stderr = Tee(sys.stderr, log_file)
+    args = parse_args()
+    capabilities = load_capabilities(args.capabilities)
+    MINERS = apply_capabilities(load_fleet(args.fleet), capabilities)
+    CORSProxyRequestHandler.response_cache = ResponseCache(args.cache_ttl, args.cache_size)
+    connection_pool = ConnectionPool(args.pool_size, args.pool_idle_timeout, UPSTREAM_TIMEOUT)
+    circuit_breaker = CircuitBreaker(args.breaker_failures, BASE_BACKOFF, args.breaker_max_backoff)
+    response_encoder = ResponseEncoder(args.compress_level)
+
+    # Console and dashboard.log, written from a background thread
+    log_listener = setup_logging(args.log_file or None, args.log_level, args.log_sample)
+    server_log = logging.getLogger('dashboard')
+
+    engine_name = "Async" if args.engine == "asyncio" else "Multi-Threaded"
+    server_log.info("Starting %s Miner Console on port %d...", engine_name, args.port)
+    server_log.info("Open http://localhost:%d", args.port)
+    server_log.info("Proxy cache: ttl=%ss, max entries=%d", args.cache_ttl, args.cache_size)
 
-    print(f"Starting Multi-Threaded Miner Console on port {PORT}...")
-    print(f"Open http://localhost:{PORT}")
+    history_store = None
+    if args.poll_interval > 0:
+        CORSProxyRequestHandler.fleet_poller = FleetPoller(MINERS, fetch_miner, args.poll_interval,
+                                                           capabilities=capabilities)
+        CORSProxyRequestHandler.fleet_stream = FleetBroadcaster()
+        CORSProxyRequestHandler.fleet_poller.add_listener(CORSProxyRequestHandler.fleet_stream.publish)
+        # Every server can be a collector for a central one
+        CORSProxyRequestHandler.sync_log = SyncLog(CORSProxyRequestHandler.fleet_poller.inventory)
+        CORSProxyRequestHandler.fleet_poller.add_listener(CORSProxyRequestHandler.sync_log.publish)
+        if args.collector:
+            CORSProxyRequestHandler.federation = Federation(args.collector, args.poll_interval)
+            CORSProxyRequestHandler.fleet_poller.add_source(CORSProxyRequestHandler.federation)
+            CORSProxyRequestHandler.federation.start()
+            server_log.info("Syncing %d collectors every %ss: %s", len(args.collector), args.poll_interval,
+                            ', '.join(f"{name}={url}" for name, url in args.collector))
+        if args.history_dir:
+            history_store = TieredHistory(args.history_dir)
+            CORSProxyRequestHandler.history = history_store
+            CORSProxyRequestHandler.fleet_poller.add_listener(HistoryRecorder(history_store))
+            server_log.info("Recording miner history to %s", args.history_dir)
+        if args.alerts_log:
+            rules, repeat = load_rules(args.alert_rules)
+            CORSProxyRequestHandler.alerts = AlertEngine(rules, args.alerts_log, repeat)
+            CORSProxyRequestHandler.fleet_poller.add_listener(CORSProxyRequestHandler.alerts)
+            server_log.info("Evaluating %d alert rules, notifications to %s", len(rules), args.alerts_log)
+        CORSProxyRequestHandler.fleet_poller.start()
+        server_log.info("Polling %d miners every %ss for /api/fleet", len(MINERS), args.poll_interval)
 
-    with ThreadingHTTPServer(("", PORT), CORSProxyRequestHandler) as httpd:
+    if args.engine == "asyncio":
+        from async_server import AsyncProxyServer
+
+        async_server = AsyncProxyServer(
+            CORSProxyRequestHandler.response_cache,
+            CORSProxyRequestHandler.fleet_poller,
+            CORSProxyRequestHandler.fleet_stream,
+            history=history_store,
+            alerts=CORSProxyRequestHandler.alerts,
+            sync_log=CORSProxyRequestHandler.sync_log,
+            federation=CORSProxyRequestHandler.federation,
+            miner_concurrency=args.miner_concurrency,
+            upstream_timeout=UPSTREAM_TIMEOUT,
+            pool_size=args.pool_size,
+            pool_idle_timeout=args.pool_idle_timeout,
+            metrics=proxy_metrics,
+            breaker=circuit_breaker,
+            encoder=response_encoder,
+            # The poller still fetches through the threaded pool
+            poller_pool=connection_pool if CORSProxyRequestHandler.fleet_poller is not None else None,
+        )
         try:
-            httpd.serve_forever()
+            asyncio.run(async_server.serve("", args.port))
         except KeyboardInterrupt:
-            print("\nShutting down...")
-            httpd.shutdown()
+            server_log.info("Shutting down...")
         except Exception as e:
-            print(f"\nCRITICAL SERVER ERROR: {e}")
-            import traceback
-            traceback.print_exc()
+            server_log.critical("CRITICAL SERVER ERROR: %s", e, exc_info=True)
+    else:
+        with ThreadingHTTPServer(("", args.port), CORSProxyRequestHandler) as httpd:
+            try:
+                httpd.serve_forever()
+            except KeyboardInterrupt:
+                server_log.info("Shutting down...")
+                httpd.shutdown()
+            except Exception as e:
+                server_log.critical("CRITICAL SERVER ERROR: %s", e, exc_info=True)
 
+    if history_store is not None:
+        # Write out samples still buffered in memory
+        history_store.close()
+    # Drain whatever is still queued for the console and log file
+    log_listener.stop()
@@ -1,9 +1,70 @@
-const miners = [
+// Used only when fleet.json (written by discover.py) can't be loaded
+const DEFAULT_MINERS = [
   { name: 'nerdqaxe++', ip: '192.168.0.154', id: 'nerdqaxe', chips: 4, useStats: false },
   { name: 'ak-bitaxe', ip: '192.168.0.157', id: 'ak-bitaxe', chips: 1, useStats: false },
   { name: 'ck-bitaxe', ip: '192.168.0.156', id: 'ck-bitaxe', chips: 1, useStats: false },
 ];
 
+let miners = DEFAULT_MINERS;
+
+// Everything updateMinerCard reads. The proxy trims responses to these
+// (?fields=) and strips the binary junk server-side, so cards download a
+// few hundred bytes instead of the full AxeOS document.
+const CARD_FIELDS = [
+  'hashRate', 'hashrate', 'power', 'temp', 'temperature', 'asicTemp', 'vrTemp', 'temp2', 'pcb_temp',
+  'voltage', 'volts', 'inputVoltage', 'asicVoltage', 'coreVoltage', 'vCore', 'frequency', 'freq',
+  'bestShare', 'best_share', 'bestDiff', 'bestEver', 'best_ever', 'bestType',
+  'sharesAccepted', 'accepted', 'sharesRejected', 'rejected',
+  // Added by the server's fleet poller (analytics.py)
+  'expectedHashRate', 'jPerTh',
+].join(',');
+
+// GH/s per MHz per ASIC; same as EXPECTED_GHS_PER_MHZ in analytics.py. The
+// fleet poller sends expectedHashRate itself, so this is only for data that
+// fetchMinerData gets straight from /proxy.
+const EXPECTED_GHS_PER_MHZ = 2.06666;
+
+async function loadFleet() {
+  try {
+    const r = await fetch('/fleet.json', { cache: 'no-cache', signal: AbortSignal.timeout(5000) });
+    if (!r.ok) return DEFAULT_MINERS;
+    const fleet = await r.json();
+    const list = Array.isArray(fleet) ? fleet : fleet.miners;
+    if (!Array.isArray(list) || list.length === 0) return DEFAULT_MINERS;
+    const capabilities = await loadCapabilities();
+    return list.filter((m) => m.ip).map((m) => {
+      const miner = {
+        name: m.name || m.ip,
+        id: m.id || (m.name || m.ip).toLowerCase().replace(/[^a-z0-9-]+/g, '-').replace(/^-+|-+$/g, ''),
+        chips: 1,
+        useStats: false,
+        ...m,
+      };
+      // Same rule as capabilities.apply_capabilities in server.py: the fleet
+      // entry's version first, the id recorded at probe time only without one
+      const key = miner.version
+        ? `${miner.deviceModel || 'unknown'}@${miner.version}`
+        : capabilities.miners?.[miner.id];
+      const firmware = key && capabilities.firmware?.[key];
+      if (firmware && 'useStats' in firmware) miner.useStats = firmware.useStats;
+      return miner;
+    });
+  } catch (e) {
+    console.warn('Fleet inventory unavailable, using built-in miner list:', e);
+    return DEFAULT_MINERS;
+  }
+}
+
+// Per-firmware endpoint map written by probe_miner.py; optional
+async function loadCapabilities() {
+  try {
+    const r = await fetch('/capabilities.json', { cache: 'no-cache', signal: AbortSignal.timeout(5000) });
+    return r.ok ? await r.json() : {};
+  } catch (e) {
+    return {};
+  }
+}
+
 async function fetchMinerData(miner) {
   try {
     // Revert to Proxy as Direct Connection failed for some miners
@@ -15,7 +76,8 @@ async function fetchMinerData(miner) {
         if (!r.ok) return {};
         let text = await r.text();
 
-        // Aggressive Sanitize: Keep only printable ASCII (x20-x7E) and whitespace (x09, x0A, x0D)
+        // Aggressive Sanitize (server.py already does this for ?fields= requests; kept as a fallback):
+        // Keep only printable ASCII (x20-x7E) and whitespace (x09, x0A, x0D)
         // This removes \0 (null), \x1F (unit separator), and other binary junk
         text = text.replace(/[^\x20-\x7E\t\n\r]/g, "");
 
@@ -33,13 +95,13 @@ async function fetchMinerData(miner) {
     };
 
     // Fetch Info
-    const infoPromise = safeFetch(`/proxy/${miner.ip}/api/system/info`);
+    const infoPromise = safeFetch(`/proxy/${miner.ip}/api/system/info?fields=${CARD_FIELDS}`);
 
     // Fetch Stats (for extra fields like fan, detail uptime, etc.)
     // Skip valid stats for miners that don't support it to avoid 404s
     let statsPromise = Promise.resolve({});
     if (miner.useStats !== false) {
-      statsPromise = safeFetch(`/proxy/${miner.ip}/api/system/stats`);
+      statsPromise = safeFetch(`/proxy/${miner.ip}/api/system/stats?fields=${CARD_FIELDS}`);
     }
 
     const [infoData, statsData] = await Promise.all([infoPromise, statsPromise]);
@@ -51,6 +113,12 @@ async function fetchMinerData(miner) {
       throw new Error('No data received');
     }
 
+    // What analytics.derive adds on the server; the cards only read expectedHashRate
+    const freq = Number(data.frequency || data.freq || 0);
+    if (data.expectedHashRate == null && freq > 0) {
+      data.expectedHashRate = freq * EXPECTED_GHS_PER_MHZ * (miner.chips || 1);
+    }
+
     console.log(`Success ${miner.name}:`, data);
     return { ...data, status: 'online' };
   } catch (error) {
@@ -59,69 +127,89 @@ async function fetchMinerData(miner) {
   }
 }
 
-function createMinerCard(miner) {
+// Fleets at least this large get the virtualised grid: a card's contents
+// only exist while it is on (or near) the screen
+const LARGE_FLEET = 40;
+
+// Per miner: latest data, the element it renders into, and what is on screen
+const entries = new Map();
+
+let currentView = 'cards';
+
+// Names and addresses come from fleet.json, which includes whatever a
+// federated collector reported; keep them text
+function escapeHtml(value) {
+  return String(value).replace(/[&<>"']/g, (c) => `&#${c.charCodeAt(0)};`);
+}
+
+function cardBody(miner) {
   return `
-    <div class="miner-card" id="card-${miner.id}">
-      <div class="loading-overlay" id="loading-${miner.id}">
+      <div class="loading-overlay" data-f="loading">
           <div class="spinner"></div>
       </div>
       <div class="card-header">
         <div>
-          <h2 class="miner-name">${miner.name}</h2>
-          <div class="miner-ip">${miner.ip}</div>
+          <h2 class="miner-name">${escapeHtml(miner.name)}</h2>
+          <div class="miner-ip">${escapeHtml(miner.ip)}</div>
         </div>
-        <div class="miner-status status-active" id="status-${miner.id}">Connecting</div>
+        <div class="miner-status status-active" data-f="status">Connecting</div>
       </div>
       
       <div class="stats-grid">
         <div class="stat-item">
           <span class="stat-label">Hashrate</span>
-          <div class="stat-value" id="hash-${miner.id}">-- <span class="unit">GH/s</span></div>
+          <div class="stat-value"><span data-f="hash">--</span> <span class="unit">GH/s</span>
+            <div class="stat-sub" data-f="hashExp"></div>
+          </div>
         </div>
         
         <div class="stat-item">
           <span class="stat-label">Power</span>
-          <div class="stat-value" id="power-${miner.id}">-- <span class="unit">W</span></div>
+          <div class="stat-value"><span data-f="power">--</span> <span class="unit">W</span></div>
         </div>
         
         <div class="stat-item">
           <span class="stat-label">ASIC Temp</span>
-          <div class="stat-value" id="asic-temp-${miner.id}">-- <span class="unit">°C</span></div>
+          <div class="stat-value"><span data-f="asicTemp">--</span> <span class="unit">°C</span></div>
         </div>
 
         <div class="stat-item">
           <span class="stat-label">VR Temp</span>
-          <div class="stat-value" id="vr-temp-${miner.id}">-- <span class="unit">°C</span></div>
+          <div class="stat-value"><span data-f="vrTemp">--</span> <span class="unit">°C</span></div>
         </div>
         
         <div class="stat-item">
           <span class="stat-label">Efficiency</span>
-          <div class="stat-value" id="eff-${miner.id}">-- <span class="unit">J/TH</span></div>
+          <div class="stat-value"><span data-f="eff">--</span> <span class="unit">J/TH</span></div>
         </div>
       </div>
 
+      <div class="history-chart" title="Hashrate, last 6 hours (min/avg/max)">
+        <svg data-f="spark" viewBox="0 0 300 40" preserveAspectRatio="none"></svg>
+      </div>
+
       <div class="extended-stats">
         <div class="ext-stat-item">
             <span class="ext-stat-label">Input Voltage</span>
-            <span class="ext-stat-value" id="volts-${miner.id}">--</span>
+            <span class="ext-stat-value" data-f="volts">--</span>
         </div>
         <div class="ext-stat-item">
             <span class="ext-stat-label">ASIC Voltage</span>
-            <span class="ext-stat-value" id="asic-volts-${miner.id}">--</span>
+            <span class="ext-stat-value" data-f="asicVolts">--</span>
         </div>
         <div class="ext-stat-item">
             <span class="ext-stat-label">Frequency</span>
-            <span class="ext-stat-value" id="freq-${miner.id}">--</span>
+            <span class="ext-stat-value" data-f="freq">--</span>
         </div>
         <div class="ext-stat-item" style="grid-column: span 2;">
             <span class="ext-stat-label">Best Difficulty</span>
             <div style="display: flex; flex-direction: column; gap: 0.25rem;">
                 <div style="display: flex; align-items: baseline; gap: 0.5rem;">
-                    <span class="ext-stat-value" id="best-all-time-${miner.id}" style="color: var(--primary);">--</span>
+                    <span class="ext-stat-value" data-f="bestAllTime" style="color: var(--primary);">--</span>
                     <span style="font-size: 0.75rem; color: var(--text-secondary);">all-time best</span>
                 </div>
                 <div style="display: flex; align-items: baseline; gap: 0.5rem;">
-                    <span class="ext-stat-value" id="best-session-${miner.id}" style="font-size: 0.9rem;">--</span>
+                    <span class="ext-stat-value" data-f="bestSession" style="font-size: 0.9rem;">--</span>
                     <span style="font-size: 0.75rem; color: var(--text-secondary);">since system boot</span>
                 </div>
             </div>
@@ -129,15 +217,32 @@ function createMinerCard(miner) {
         <div class="ext-stat-item">
             <span class="ext-stat-label">Shares</span>
             <div style="display: flex; flex-direction: column; gap: 0.25rem;">
-                 <span class="ext-stat-value" id="shares-acc-${miner.id}">--</span>
+                 <span class="ext-stat-value" data-f="sharesAcc">--</span>
                  <div style="font-size: 0.75rem; color: var(--error-color);">
-                    <span id="shares-rej-${miner.id}">--</span> Rejected 
-                    <span id="shares-rej-pct-${miner.id}"></span>
+                    <span data-f="sharesRej">--</span> Rejected 
+                    <span data-f="sharesRejPct"></span>
                  </div>
             </div>
         </div>
       </div>
-    </div>
+  `;
+}
+
+function tableRow(miner) {
+  return `
+    <tr>
+      <td><div class="miner-name">${escapeHtml(miner.name)}</div><div class="miner-ip">${escapeHtml(miner.ip)}</div></td>
+      <td><span class="miner-status status-active" data-f="status">Connecting</span></td>
+      <td data-f="hash">--</td>
+      <td data-f="power">--</td>
+      <td data-f="asicTemp">--</td>
+      <td data-f="vrTemp">--</td>
+      <td data-f="eff">--</td>
+      <td data-f="freq">--</td>
+      <td data-f="bestAllTime">--</td>
+      <td data-f="sharesAcc">--</td>
+      <td data-f="rejPct">--</td>
+    </tr>
   `;
 }
 
@@ -157,46 +262,24 @@ function formatLargeNumber(num) {
   return num.toLocaleString();
 }
 
-function updateMinerCard(miner, data) {
-  const card = document.getElementById(`card-${miner.id}`);
-  const statusEl = document.getElementById(`status-${miner.id}`);
-  const loadingEl = document.getElementById(`loading-${miner.id}`);
-
-  // Debug Data to find correct fields
-  console.log(`Miner ${miner.id} Data:`, data);
-
-  // Hide loading
-  if (loadingEl) loadingEl.style.display = 'none';
+const OFFLINE_VIEW = {
+  offline: true, hash: '--', hashExp: '', power: '--', asicTemp: '--', vrTemp: '--', eff: '--',
+  volts: '--', asicVolts: '--', freq: '--', bestAllTime: '--', bestSession: '--',
+  sharesAcc: '--', sharesRej: '--', sharesRejPct: '', rejPct: '--',
+};
 
+// Everything a card or table row shows for one miner, as strings. Rendering
+// compares this with what is already on screen and only writes what changed.
+function minerView(miner, data) {
   if (data.status === 'offline') {
-    card.classList.add('offline');
-    statusEl.className = 'miner-status status-offline';
-    // Show specific error if available or generic OFFLINE
-    statusEl.textContent = data.error ? data.error.substring(0, 15) : 'OFFLINE';
-    statusEl.title = data.error || 'Connection Failed'; // Tooltip for full error
-
-    // Clear stats
-    document.getElementById(`hash-${miner.id}`).innerHTML = `-- <span class="unit">GH/s</span>`;
-    document.getElementById(`power-${miner.id}`).innerHTML = `-- <span class="unit">W</span>`;
-    document.getElementById(`asic-temp-${miner.id}`).innerHTML = `-- <span class="unit">°C</span>`;
-    document.getElementById(`vr-temp-${miner.id}`).innerHTML = `-- <span class="unit">°C</span>`;
-    document.getElementById(`eff-${miner.id}`).innerHTML = `-- <span class="unit">J/TH</span>`;
-
-    document.getElementById(`volts-${miner.id}`).textContent = '--';
-    document.getElementById(`asic-volts-${miner.id}`).textContent = '--';
-    document.getElementById(`freq-${miner.id}`).textContent = '--';
-    document.getElementById(`best-all-time-${miner.id}`).textContent = '--';
-    document.getElementById(`best-session-${miner.id}`).textContent = '--';
-    document.getElementById(`shares-acc-${miner.id}`).textContent = '--';
-    document.getElementById(`shares-rej-${miner.id}`).textContent = '--';
-    document.getElementById(`shares-rej-pct-${miner.id}`).textContent = '';
-    return;
+    return {
+      ...OFFLINE_VIEW,
+      // Show specific error if available or generic OFFLINE
+      status: data.error ? data.error.substring(0, 15) : 'OFFLINE',
+      statusTitle: data.error || 'Connection Failed', // Tooltip for full error
+    };
   }
 
-  card.classList.remove('offline');
-  statusEl.className = 'miner-status status-active';
-  statusEl.textContent = 'ACTIVE';
-
   const hashrate = Number(data.hashRate || data.hashrate || 0);
   const power = Number(data.power || 0);
 
@@ -206,7 +289,9 @@ function updateMinerCard(miner, data) {
   // If undefined, default to 0.
   const vrTemp = Number(data.vrTemp || data.temp2 || data.pcb_temp || 0);
 
-  const efficiency = hashrate > 0 ? (power / (hashrate / 1000)).toFixed(2) : 0; // W / (TH/s)
+  const efficiency = data.jPerTh != null
+    ? data.jPerTh.toFixed(2)
+    : (hashrate > 0 ? (power / (hashrate / 1000)).toFixed(2) : 0); // W / (TH/s)
 
   // Input Voltage (was 'volts' or 'voltage') - typically in mV, sometimes V
   const inputVoltsRaw = data.voltage || data.volts || data.inputVoltage || 0;
@@ -215,23 +300,9 @@ function updateMinerCard(miner, data) {
   const asicVoltsRaw = data.asicVoltage || data.coreVoltage || data.vCore || 0;
 
   const freq = data.frequency || data.freq || 0;
-  const bestShare = data.bestShare || data.best_share || data.bestDiff || 0;
-  const rejected = data.sharesRejected || data.rejected || 0;
-
-  // Expected Hashrate Calculation
-  const chips = miner.chips || 1;
-  const expectedHashrate = freq > 0 ? (freq * 2.04 * chips).toFixed(0) : 0;
-
-  document.getElementById(`hash-${miner.id}`).innerHTML = `
-    <div>${Math.round(hashrate)} <span class="unit">GH/s</span></div>
-    ${expectedHashrate > 0 ? `<div style="font-size: 0.75rem; color: var(--text-secondary); margin-top: 0.25rem;">Exp: ${expectedHashrate} GH/s</div>` : ''}
-  `;
-  document.getElementById(`power-${miner.id}`).innerHTML = `${Math.round(power)} <span class="unit">W</span>`;
 
-  document.getElementById(`asic-temp-${miner.id}`).innerHTML = `${Math.round(asicTemp)} <span class="unit">°C</span>`;
-  document.getElementById(`vr-temp-${miner.id}`).innerHTML = `${Math.round(vrTemp)} <span class="unit">°C</span>`;
-
-  document.getElementById(`eff-${miner.id}`).innerHTML = `${efficiency} <span class="unit">J/TH</span>`;
+  // From the poller (analytics.derive) or fetchMinerData
+  const expectedHashrate = data.expectedHashRate != null ? data.expectedHashRate.toFixed(0) : 0;
 
   // Formatting Input Voltage
   // If > 1000, assumes mV => convert to V. If < 20, assume V.
@@ -240,7 +311,6 @@ function updateMinerCard(miner, data) {
     const v = inputVoltsRaw > 100 ? inputVoltsRaw / 1000 : inputVoltsRaw;
     displayInputV = `${v.toFixed(3)} V`;
   }
-  document.getElementById(`volts-${miner.id}`).textContent = displayInputV;
 
   // Formatting ASIC Voltage
   // Typically small value (1.x). If > 100, assume mV.
@@ -249,9 +319,6 @@ function updateMinerCard(miner, data) {
     const v = asicVoltsRaw > 100 ? asicVoltsRaw / 1000 : asicVoltsRaw;
     displayAsicV = `${v.toFixed(3)} V`;
   }
-  document.getElementById(`asic-volts-${miner.id}`).textContent = displayAsicV;
-
-  document.getElementById(`freq-${miner.id}`).textContent = freq ? `${freq} MHz` : '--';
 
   // Best Difficulty
   // Session: bestShare (or best_share, bestDiff as fallbacks)
@@ -260,40 +327,382 @@ function updateMinerCard(miner, data) {
   // All-time: bestEver (or best_ever, bestType as fallbacks)
   const bestAllTime = data.bestEver || data.best_ever || data.bestType || 0;
 
-  document.getElementById(`best-session-${miner.id}`).textContent = bestSession > 0 ? formatLargeNumber(bestSession) : '--';
-  document.getElementById(`best-all-time-${miner.id}`).textContent = bestAllTime > 0 ? formatLargeNumber(bestAllTime) : '--';
-
-  document.getElementById(`best-session-${miner.id}`).textContent = bestSession > 0 ? formatLargeNumber(bestSession) : '--';
-  document.getElementById(`best-all-time-${miner.id}`).textContent = bestAllTime > 0 ? formatLargeNumber(bestAllTime) : '--';
-
   // Shares Logic
   const sharesAccepted = data.sharesAccepted || data.accepted || 0;
   const sharesRejected = data.sharesRejected || data.rejected || 0;
   const sharesTotal = sharesAccepted + sharesRejected;
   const rejPct = sharesTotal > 0 ? ((sharesRejected / sharesTotal) * 100).toFixed(2) : '0.00';
 
-  document.getElementById(`shares-acc-${miner.id}`).textContent = formatLargeNumber(sharesAccepted);
-  document.getElementById(`shares-rej-${miner.id}`).textContent = sharesRejected;
-  document.getElementById(`shares-rej-pct-${miner.id}`).textContent = `(${rejPct}%)`;
+  return {
+    offline: false,
+    status: 'ACTIVE',
+    statusTitle: '',
+    hash: String(Math.round(hashrate)),
+    hashExp: expectedHashrate > 0 ? `Exp: ${expectedHashrate} GH/s` : '',
+    power: String(Math.round(power)),
+    asicTemp: String(Math.round(asicTemp)),
+    vrTemp: String(Math.round(vrTemp)),
+    eff: String(efficiency),
+    volts: displayInputV,
+    asicVolts: displayAsicV,
+    freq: freq ? `${freq} MHz` : '--',
+    bestAllTime: bestAllTime > 0 ? formatLargeNumber(bestAllTime) : '--',
+    bestSession: bestSession > 0 ? formatLargeNumber(bestSession) : '--',
+    sharesAcc: formatLargeNumber(sharesAccepted),
+    sharesRej: String(sharesRejected),
+    sharesRejPct: `(${rejPct}%)`,
+    rejPct: `${rejPct}%`,
+  };
 }
 
-async function init() {
+function collectSlots(el) {
+  const slots = {};
+  el.querySelectorAll('[data-f]').forEach((node) => { slots[node.dataset.f] = node; });
+  return slots;
+}
+
+// Writes the fields of `view` that differ from what the element last showed
+function applyView(entry, view) {
+  const { slots, shown } = entry;
+  if (slots.loading) {
+    slots.loading.remove();
+    slots.loading = null;
+  }
+  for (const key in view) {
+    const value = view[key];
+    if (shown[key] === value) continue;
+    shown[key] = value;
+    if (key === 'offline') {
+      entry.el.classList.toggle('offline', value);
+      slots.status.className = `miner-status ${value ? 'status-offline' : 'status-active'}`;
+    } else if (key === 'statusTitle') {
+      slots.status.title = value;
+    } else if (slots[key]) {
+      slots[key].textContent = value;
+    }
+  }
+}
+
+// Updates are queued and applied together in the next animation frame, so a
+// burst of responses (or a whole fleet snapshot) costs one layout, and none
+// at all while the tab is hidden
+const dirty = new Set();
+let frame = 0;
+
+function updateMinerCard(miner, data) {
+  const entry = entries.get(miner.id);
+  if (!entry) return;
+  entry.data = data;
+  dirty.add(entry);
+  if (!frame) frame = requestAnimationFrame(flushUpdates);
+}
+
+function flushUpdates() {
+  frame = 0;
+  for (const entry of dirty) {
+    // Cards scrolled out of a large fleet have no elements; they catch up when mounted
+    if (entry.slots) applyView(entry, minerView(entry.miner, entry.data));
+  }
+  dirty.clear();
+}
+
+function mountCard(entry) {
+  entry.el.innerHTML = cardBody(entry.miner);
+  entry.el.style.minHeight = '';
+  entry.slots = collectSlots(entry.el);
+  entry.shown = {};
+  if (entry.data) applyView(entry, minerView(entry.miner, entry.data));
+  if (entry.history) renderSparkline(entry.slots.spark, entry.history);
+  if (Date.now() - entry.historyFetched > HISTORY_REFRESH) refreshHistory(entry);
+}
+
+function unmountCard(entry, height) {
+  // Keep the space it took so the scroll position doesn't jump
+  entry.el.style.minHeight = `${height}px`;
+  entry.el.innerHTML = '';
+  entry.slots = null;
+}
+
+let cardObserver = null;
+
+function renderCards(container) {
+  container.className = 'grid';
+  container.innerHTML = '';
+  const large = miners.length >= LARGE_FLEET;
+  const cards = document.createDocumentFragment();
+  entries.forEach((entry) => {
+    const el = document.createElement('div');
+    el.className = 'miner-card';
+    el.id = `card-${entry.miner.id}`;
+    entry.el = el;
+    entry.slots = null;
+    cards.append(el);
+    if (!large) mountCard(entry);
+  });
+  container.append(cards);
+
+  if (large) {
+    cardObserver = new IntersectionObserver((observed) => {
+      observed.forEach(({ target, isIntersecting, boundingClientRect }) => {
+        const entry = entries.get(target.dataset.miner);
+        if (isIntersecting && !entry.slots) mountCard(entry);
+        else if (!isIntersecting && entry.slots) unmountCard(entry, boundingClientRect.height);
+      });
+    }, { rootMargin: '600px 0px' });
+    entries.forEach((entry, id) => {
+      entry.el.dataset.miner = id;
+      cardObserver.observe(entry.el);
+    });
+  }
+}
+
+function renderTable(container) {
+  container.className = 'fleet-table-wrap';
+  container.innerHTML = `
+    <table class="fleet-table">
+      <thead>
+        <tr>
+          <th>Miner</th><th>Status</th><th>GH/s</th><th>W</th><th>ASIC °C</th><th>VR °C</th>
+          <th>J/TH</th><th>Frequency</th><th>Best</th><th>Shares</th><th>Rejected</th>
+        </tr>
+      </thead>
+      <tbody>${miners.map(tableRow).join('')}</tbody>
+    </table>
+  `;
+  // Rows are matched up by position; ids are set on the element, not templated
+  const rows = container.querySelectorAll('tbody tr');
+  miners.forEach((miner, i) => {
+    const entry = entries.get(miner.id);
+    entry.el = rows[i];
+    entry.el.id = `row-${miner.id}`;
+    entry.slots = collectSlots(entry.el);
+    entry.shown = {};
+    if (entry.data) applyView(entry, minerView(entry.miner, entry.data));
+  });
+}
+
+function render() {
+  if (cardObserver) {
+    cardObserver.disconnect();
+    cardObserver = null;
+  }
   const container = document.getElementById('miners-grid');
-  container.innerHTML = miners.map(createMinerCard).join('');
+  if (currentView === 'table') renderTable(container);
+  else renderCards(container);
+
+  document.querySelectorAll('#view-toggle [data-view]').forEach((button) => {
+    button.classList.toggle('active', button.dataset.view === currentView);
+  });
+}
+
+// ?view=table on a wall display, otherwise whatever was picked last
+function setupViewToggle() {
+  const requested = new URLSearchParams(location.search).get('view') || localStorage.getItem('minerView');
+  if (requested === 'table' || requested === 'cards') currentView = requested;
+
+  document.querySelectorAll('#view-toggle [data-view]').forEach((button) => {
+    button.addEventListener('click', () => {
+      if (button.dataset.view === currentView) return;
+      currentView = button.dataset.view;
+      localStorage.setItem('minerView', currentView);
+      render();
+    });
+  });
+}
+
+// Fetch the whole fleet from the server-side poller in one request.
+// Returns null when /api/fleet isn't available (e.g. under the Vite dev server
+// or with the poller disabled) so the caller can fall back to per-miner proxying.
+async function fetchFleet() {
+  try {
+    const r = await fetch(`/api/fleet?fields=${CARD_FIELDS}`, { signal: AbortSignal.timeout(5000) });
+    if (!r.ok) return null;
+    const fleet = await r.json();
+    return fleet && fleet.miners ? fleet : null;
+  } catch (e) {
+    console.warn('Fleet fetch failed, falling back to proxy polling:', e);
+    return null;
+  }
+}
+
+async function refreshMiners() {
+  const fleet = await fetchFleet();
+
+  if (fleet) {
+    checkInventory(Object.keys(fleet.miners));
+    miners.forEach((miner) => {
+      const data = fleet.miners[miner.id];
+      // Miner not polled yet (server just started) - keep the loading state
+      if (data) updateMinerCard(miner, data);
+    });
+    return;
+  }
 
-  // Initial fetch
   miners.forEach(async (miner) => {
     const data = await fetchMinerData(miner);
     updateMinerCard(miner, data);
   });
+}
+
+// Hashrate sparkline: the server aggregates history into a fixed number of
+// min/avg/max buckets, so the payload stays the same size for any range
+const HISTORY_RANGE = 6 * 3600;
+const HISTORY_POINTS = 120;
+const HISTORY_REFRESH = 60000;
+
+async function refreshHistory(entry) {
+  const { miner } = entry;
+  const to = Math.floor(Date.now() / 1000);
+  const from = to - HISTORY_RANGE;
+  entry.historyFetched = Date.now();
+  try {
+    const r = await fetch(`/api/history?miner=${encodeURIComponent(miner.id)}&metric=hashRate&from=${from}&to=${to}&points=${HISTORY_POINTS}`);
+    // History disabled or not served by this server (e.g. Vite dev) - leave the chart empty
+    if (!r.ok) return;
+    entry.history = await r.json();
+    if (entry.slots) renderSparkline(entry.slots.spark, entry.history);
+  } catch (e) {
+    console.warn(`History fetch failed for ${miner.name}:`, e);
+  }
+}
+
+function renderSparkline(svg, series) {
+  if (!svg) return;
+  const peak = Math.max(0, ...series.max.filter((v) => v !== null));
+  if (peak <= 0) {
+    svg.innerHTML = '';
+    return;
+  }
+
+  const width = 300;
+  const height = 40;
+  const n = series.avg.length;
+  const x = (i) => ((i / Math.max(n - 1, 1)) * width).toFixed(1);
+  const y = (v) => (height - (v / peak) * (height - 2)).toFixed(1);
+
+  // Vertical strokes for each bucket's min-max range, plus the average line.
+  // Empty buckets (miner offline) break the line.
+  let band = '';
+  let line = '';
+  let penDown = false;
+  for (let i = 0; i < n; i++) {
+    const avg = series.avg[i];
+    if (avg === null) {
+      penDown = false;
+      continue;
+    }
+    band += `M${x(i)} ${y(series.max[i])}V${y(series.min[i])}`;
+    line += `${penDown ? 'L' : 'M'}${x(i)} ${y(avg)}`;
+    penDown = true;
+  }
+
+  svg.innerHTML = `<path class="spark-band" d="${band}"/><path class="spark-line" d="${line}"/>`;
+}
+
+function startHistory() {
+  // Only the cards on screen; the rest fetch theirs when they're scrolled to
+  // (mounting a card already fetched its first series)
+  setInterval(() => entries.forEach((entry) => {
+    if (entry.slots && entry.slots.spark) refreshHistory(entry);
+  }), HISTORY_REFRESH);
+}
+
+function startPolling() {
+  // Initial fetch
+  refreshMiners();
 
   // Poll every 5 seconds
-  setInterval(() => {
-    miners.forEach(async (miner) => {
-      const data = await fetchMinerData(miner);
-      updateMinerCard(miner, data);
+  setInterval(refreshMiners, 5000);
+}
+
+// A collector federated after the page loaded brings miners fleet.json
+// didn't list yet; look again (at most every INVENTORY_RECHECK ms) and add
+// their cards
+const INVENTORY_RECHECK = 30000;
+let inventoryChecked = 0;
+
+async function checkInventory(ids) {
+  if (!ids.some((id) => !entries.has(id)) || Date.now() - inventoryChecked < INVENTORY_RECHECK) return;
+  inventoryChecked = Date.now();
+  const added = (await loadFleet()).filter((miner) => !entries.has(miner.id));
+  if (added.length === 0) return;
+  added.forEach(addEntry);
+  miners = miners.concat(added);
+  render();
+  added.forEach((miner) => {
+    if (fleetState[miner.id]) updateMinerCard(miner, fleetState[miner.id]);
+  });
+}
+
+function addEntry(miner) {
+  entries.set(miner.id, { miner, data: null, el: null, slots: null, shown: {}, history: null, historyFetched: 0 });
+}
+
+// Latest merged data per miner id, built from the stream's snapshot + deltas
+const fleetState = {};
+
+function applyDelta(minerId, delta) {
+  const state = fleetState[minerId] || (fleetState[minerId] = {});
+  for (const [key, value] of Object.entries(delta)) {
+    // null marks a field that's no longer reported (e.g. `error` once back online)
+    if (value === null) delete state[key];
+    else state[key] = value;
+  }
+  return state;
+}
+
+// Subscribe to the server's Server-Sent Events stream. The server sends one
+// snapshot, then only the fields that changed after each poll.
+// Returns false if the browser can't do SSE so the caller can poll instead.
+function startFleetStream() {
+  if (!window.EventSource) return false;
+
+  const source = new EventSource('/api/fleet/stream');
+  let connected = false;
+
+  source.addEventListener('snapshot', (e) => {
+    connected = true;
+    const snapshot = JSON.parse(e.data).miners;
+    Object.keys(fleetState).forEach((id) => delete fleetState[id]);
+    Object.assign(fleetState, snapshot);
+    checkInventory(Object.keys(snapshot));
+    miners.forEach((miner) => {
+      if (fleetState[miner.id]) updateMinerCard(miner, fleetState[miner.id]);
+    });
+  });
+
+  source.addEventListener('delta', (e) => {
+    const deltas = JSON.parse(e.data).miners;
+    Object.entries(deltas).forEach(([id, delta]) => {
+      if (delta) applyDelta(id, delta);
     });
-  }, 5000);
+    checkInventory(Object.keys(deltas).filter((id) => deltas[id]));
+    miners.forEach((miner) => {
+      if (deltas[miner.id]) updateMinerCard(miner, fleetState[miner.id]);
+    });
+  });
+
+  source.onerror = () => {
+    // Never connected (e.g. Vite dev server or poller disabled) - fall back to polling.
+    // Once connected, EventSource reconnects by itself and gets a fresh snapshot.
+    if (!connected) {
+      console.warn('Fleet stream unavailable, falling back to polling');
+      source.close();
+      startPolling();
+    }
+  };
+
+  return true;
+}
+
+async function init() {
+  miners = await loadFleet();
+  miners.forEach(addEntry);
+  setupViewToggle();
+  render();
+
+  if (!startFleetStream()) startPolling();
+  startHistory();
 
   loadSecurityReport();
 }
@@ -0,0 +1,368 @@
+import asyncio
+import contextlib
+import http.client
+import select
+import threading
+import time
+
+import async_http
+from content_coding import ACCEPT_ENCODING, CHUNK_SIZE, Decoder
+
+USER_AGENT = 'miners-dashboard-proxy'
+
+# Errors that mean a reused keep-alive socket was closed by the miner while it
+# sat idle. The request never reached the board, so it's safe to retry once.
+STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                ConnectionResetError, BrokenPipeError)
+
+
+class PoolStats:
+    """Counters shared by the threaded and asyncio pools."""
+
+    def __init__(self):
+        self.hits = 0          # Request served on a reused socket
+        self.misses = 0        # Had to open a new connection
+        self.retries = 0       # Reused socket turned out stale and was replaced
+        self.evicted_idle = 0  # Closed after sitting idle too long
+        self.evicted_unhealthy = 0  # Closed by the peer or had unread junk
+        self.discarded = 0     # Closed after an error or "Connection: close"
+
+    def as_dict(self, idle):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'retries': self.retries,
+            'evicted_idle': self.evicted_idle,
+            'evicted_unhealthy': self.evicted_unhealthy,
+            'discarded': self.discarded,
+            'idle': idle,
+        }
+
+
+class ConnectionPool:
+    """
+    Per-host pool of persistent HTTP/1.1 connections for the threaded proxy.
+
+    TCP setup is a large share of each request's latency on the ESP32 boards,
+    and a fresh connection per request leaves TIME_WAIT sockets behind on the
+    proxy host. Idle connections are reused LIFO, closed after `idle_timeout`
+    seconds, and checked for a peer close before being handed out.
+    """
+
+    def __init__(self, max_idle_per_host=4, idle_timeout=30.0, timeout=3.0):
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.stats = PoolStats()
+        self._idle = {}  # host -> [(HTTPConnection, last_used)]
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def request(self, host, path, headers=None):
+        """
+        GETs http://<host>/<path> on a pooled connection.
+        Returns (status_code, headers, body) with header names lower-cased and
+        the body's Content-Encoding already undone (and dropped from headers).
+        """
+        conn, response, response_headers = self._open(host, path, headers)
+        try:
+            body = _read_decoded(response, response_headers.pop('content-encoding', None))
+        except BaseException:
+            self._discard(conn)
+            raise
+
+        self._finish(host, conn, response)
+        return response.status, response_headers, body
+
+    @contextlib.contextmanager
+    def stream(self, host, path, headers=None):
+        """
+        Like request(), but yields (status_code, headers, response) before the
+        body is read, so the caller can relay it with response.read(n). The
+        body is left encoded. The connection goes back to the pool only if
+        the body was read to the end.
+        """
+        conn, response, response_headers = self._open(host, path, headers)
+        try:
+            yield response.status, response_headers, response
+        except BaseException:
+            self._discard(conn)
+            raise
+
+        if response.isclosed():
+            self._finish(host, conn, response)
+        else:
+            self._discard(conn)
+
+    def _open(self, host, path, headers):
+        """Sends the request and reads the response head, retrying once on a stale socket."""
+        conn, reused = self._acquire(host)
+        try:
+            response = self._send(conn, path, headers)
+        except STALE_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            with self._lock:
+                self.stats.retries += 1
+            conn, reused = self._new_connection(host), False
+            try:
+                response = self._send(conn, path, headers)
+            except BaseException:
+                conn.close()
+                raise
+        except BaseException:
+            self._discard(conn)
+            raise
+        return conn, response, {name.lower(): value for name, value in response.getheaders()}
+
+    def _finish(self, host, conn, response):
+        if response.will_close:
+            self._discard(conn)
+        else:
+            self._release(host, conn)
+
+    def _discard(self, conn):
+        conn.close()
+        # Counters are shared by every request thread; keep them exact
+        with self._lock:
+            self.stats.discarded += 1
+
+    def _send(self, conn, path, headers):
+        request_headers = {'User-Agent': USER_AGENT, 'Connection': 'keep-alive',
+                           'Accept-Encoding': ACCEPT_ENCODING}
+        request_headers.update(headers or {})
+        conn.request('GET', '/' + path.lstrip('/'), headers=request_headers)
+        return conn.getresponse()
+
+    def _new_connection(self, host):
+        return http.client.HTTPConnection(host, timeout=self.timeout)
+
+    def _acquire(self, host):
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(host)
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used > self.idle_timeout:
+                    conn.close()
+                    self.stats.evicted_idle += 1
+                elif not _socket_healthy(conn.sock):
+                    conn.close()
+                    self.stats.evicted_unhealthy += 1
+                else:
+                    self.stats.hits += 1
+                    return conn, True
+            self.stats.misses += 1
+        return self._new_connection(host), False
+
+    def _release(self, host, conn):
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.setdefault(host, [])
+            if len(idle) >= self.max_idle_per_host:
+                conn.close()
+                self.stats.discarded += 1
+            else:
+                idle.append((conn, now))
+
+            if now - self._last_sweep > self.idle_timeout:
+                self._last_sweep = now
+                self._sweep(now)
+
+    def _sweep(self, now):
+        # Caller must hold self._lock
+        for host, idle in list(self._idle.items()):
+            keep = []
+            for conn, last_used in idle:
+                if now - last_used > self.idle_timeout:
+                    conn.close()
+                    self.stats.evicted_idle += 1
+                else:
+                    keep.append((conn, last_used))
+            if keep:
+                self._idle[host] = keep
+            else:
+                del self._idle[host]
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+    def stats_dict(self):
+        with self._lock:
+            return self.stats.as_dict(sum(len(conns) for conns in self._idle.values()))
+
+
+class AsyncConnectionPool:
+    """Keep-alive connection pool for the asyncio engine, with the same policy."""
+
+    def __init__(self, max_idle_per_host=4, idle_timeout=30.0, timeout=3.0):
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.stats = PoolStats()
+        self._idle = {}  # host -> [(reader, writer, last_used)]
+
+    async def request(self, host, path, headers=None):
+        """Async counterpart of ConnectionPool.request, bounded by `timeout`."""
+        return await asyncio.wait_for(self._request(host, path, headers), self.timeout)
+
+    async def _request(self, host, path, headers):
+        reader, writer, status_code, response_headers = await self._open(host, path, headers)
+        try:
+            body = await async_http.read_body(reader, response_headers, status_code)
+        except BaseException:
+            writer.close()
+            self.stats.discarded += 1
+            raise
+
+        response_headers.pop('content-encoding', None)
+        self._finish(host, reader, writer, response_headers)
+        return status_code, response_headers, body
+
+    @contextlib.asynccontextmanager
+    async def stream(self, host, path, headers=None):
+        """
+        Async counterpart of ConnectionPool.stream. Yields (status_code,
+        headers, body) where `await body.read()` returns the next raw chunk,
+        or b'' at the end; `timeout` applies to the head and to each read.
+        """
+        reader, writer, status_code, response_headers = await asyncio.wait_for(
+            self._open(host, path, headers), self.timeout)
+        body = StreamedBody(async_http.iter_body(reader, response_headers, status_code=status_code),
+                            self.timeout)
+        try:
+            yield status_code, response_headers, body
+        except BaseException:
+            writer.close()
+            self.stats.discarded += 1
+            raise
+
+        if body.done:
+            self._finish(host, reader, writer, response_headers)
+        else:
+            writer.close()
+            self.stats.discarded += 1
+
+    async def _open(self, host, path, headers):
+        reader, writer, reused = await self._acquire(host)
+        try:
+            try:
+                status_code, response_headers = await self._send(reader, writer, host, path, headers)
+            except (async_http.HTTPResponseError, ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                # The miner dropped the idle socket - retry once on a fresh one
+                writer.close()
+                self.stats.retries += 1
+                reader, writer = await self._connect(host)
+                status_code, response_headers = await self._send(reader, writer, host, path, headers)
+        except BaseException:
+            writer.close()
+            self.stats.discarded += 1
+            raise
+        return reader, writer, status_code, response_headers
+
+    def _finish(self, host, reader, writer, response_headers):
+        if response_headers.get('connection', '').lower() == 'close' or reader.at_eof():
+            writer.close()
+            self.stats.discarded += 1
+        else:
+            self._release(host, reader, writer)
+
+    async def _send(self, reader, writer, host, path, headers):
+        writer.write(async_http.build_request(host, path, headers, keep_alive=True))
+        await writer.drain()
+        return await async_http.read_head(reader)
+
+    async def _connect(self, host):
+        hostname, port = async_http.split_host(host)
+        return await asyncio.open_connection(hostname, port)
+
+    async def _acquire(self, host):
+        now = time.monotonic()
+        idle = self._idle.get(host)
+        while idle:
+            reader, writer, last_used = idle.pop()
+            if now - last_used > self.idle_timeout:
+                writer.close()
+                self.stats.evicted_idle += 1
+            elif reader.at_eof() or writer.is_closing():
+                writer.close()
+                self.stats.evicted_unhealthy += 1
+            else:
+                self.stats.hits += 1
+                return reader, writer, True
+        self.stats.misses += 1
+        reader, writer = await self._connect(host)
+        return reader, writer, False
+
+    def _release(self, host, reader, writer):
+        idle = self._idle.setdefault(host, [])
+        if len(idle) >= self.max_idle_per_host:
+            writer.close()
+            self.stats.discarded += 1
+        else:
+            idle.append((reader, writer, time.monotonic()))
+
+    def close(self):
+        for idle in self._idle.values():
+            for _, writer, _ in idle:
+                writer.close()
+        self._idle.clear()
+
+    def stats_dict(self):
+        return self.stats.as_dict(sum(len(conns) for conns in self._idle.values()))
+
+
+class StreamedBody:
+    """Raw body of a streamed asyncio response, read one chunk at a time."""
+
+    def __init__(self, chunks, timeout):
+        self._chunks = chunks
+        self.timeout = timeout
+        self.done = False
+
+    async def read(self):
+        if self.done:
+            return b''
+        chunk = await asyncio.wait_for(anext(self._chunks, b''), self.timeout)
+        if not chunk:
+            self.done = True
+        return chunk
+
+
+def _read_decoded(response, content_encoding):
+    """Reads an http.client response in chunks, decoding each as it arrives."""
+    decoder = Decoder(content_encoding)
+    parts = []
+    while chunk := response.read(CHUNK_SIZE):
+        parts.append(decoder.feed(chunk))
+    parts.append(decoder.flush())
+    return b''.join(parts)
+
+
+def _socket_healthy(sock):
+    """
+    An idle keep-alive socket should have nothing to read. If select() says
+    it's readable, the miner has closed it (EOF) or sent junk we can't use.
+    """
+    if sock is None:
+        return False
+    try:
+        if hasattr(select, 'poll'):
+            # select() can't take descriptors >= 1024, which a busy server reaches
+            poller = select.poll()
+            poller.register(sock, select.POLLIN)
+            return not poller.poll(0)
+        # Windows has no poll(), and its select() has no such limit
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable